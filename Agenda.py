@@ -0,0 +1,84 @@
+# Agenda.py
+"""Agenda de eventos do relógio da partida.
+
+O tempo é contado em horas de jogo desde o início do dia 1. Os eventos ficam
+numa fila de prioridade pelo horário; avancar() leva o relógio adiante e
+executa, em ordem, os eventos que vencem no caminho, com o relógio parado no
+horário de cada um. Avançar muitas horas custa o número de eventos no
+intervalo, não o número de horas.
+"""
+import heapq
+import itertools
+
+
+class Evento:
+    """Um evento agendado. cancelar() o tira da agenda."""
+    __slots__ = ("tempo", "nome", "acao", "cancelado")
+
+    def __init__(self, tempo, nome, acao):
+        self.tempo = tempo
+        self.nome = nome
+        self.acao = acao
+        self.cancelado = False
+
+    def cancelar(self):
+        self.cancelado = True
+
+    def __repr__(self):
+        return f"Evento({self.tempo!r}, {self.nome!r})"
+
+
+class Agenda:
+    def __init__(self, agora=0):
+        self.agora = agora
+        self._fila = []
+        self._ordem = itertools.count() # Desempate: mesmo horário, ordem de agendamento
+
+    def agendar(self, tempo, acao, nome=""):
+        """Agenda acao() para o horário `tempo` (não antes de agora)."""
+        evento = Evento(max(tempo, self.agora), nome, acao)
+        heapq.heappush(self._fila, (evento.tempo, next(self._ordem), evento))
+        return evento
+
+    def agendar_em(self, horas, acao, nome=""):
+        """Agenda acao() para daqui a `horas` horas."""
+        return self.agendar(self.agora + horas, acao, nome)
+
+    def proximo(self):
+        """O próximo evento pendente, ou None."""
+        while self._fila and self._fila[0][2].cancelado:
+            heapq.heappop(self._fila)
+        return self._fila[0][2] if self._fila else None
+
+    def marcar(self):
+        """Estado da agenda agora, para voltar a ele com voltar()."""
+        ordem = next(self._ordem)
+        self._ordem = itertools.count(ordem)
+        return self.agora, list(self._fila), [evento.cancelado for _, _, evento in self._fila], ordem
+
+    def voltar(self, marca):
+        """Volta ao ponto de marcar(): relógio, eventos pendentes e ordem de agendamento."""
+        self.agora, fila, cancelados, ordem = marca
+        self._fila = list(fila)
+        for (_, _, evento), cancelado in zip(fila, cancelados):
+            evento.cancelado = cancelado
+        self._ordem = itertools.count(ordem)
+
+    def avancar(self, horas):
+        """Avança o relógio `horas` horas, executando os eventos que vencem até lá.
+
+        Eventos agendados durante o avanço também são executados se vencerem
+        antes do fim. Retorna o número de eventos executados.
+        """
+        fim = self.agora + horas
+        executados = 0
+        while True:
+            evento = self.proximo()
+            if evento is None or evento.tempo > fim:
+                break
+            heapq.heappop(self._fila)
+            self.agora = evento.tempo
+            evento.acao()
+            executados += 1
+        self.agora = fim
+        return executados
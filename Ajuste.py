@@ -0,0 +1,273 @@
+# Ajuste.py
+"""Ajuste do balanceamento: configurações (Balanceamento.Configuracao) avaliadas com partidas simuladas.
+
+Cada configuração é avaliada com partidas jogadas por um bot do Simulador, em
+blocos de TAMANHO_BLOCO seeds espalhados num pool de processos. O resumo de
+cada bloco fica num banco SQLite pela chave da configuração, o bot, o limite
+de ações, a seed e o número do bloco: repetir um ajuste, ou pedir mais
+partidas de uma configuração já avaliada, só joga os blocos que faltam.
+Depois de mudar as regras do jogo, apague o banco.
+
+busca_grade() avalia todas as combinações de valores dos parâmetros.
+busca_eliminacao() (successive halving) começa com poucas partidas por
+configuração e a cada rodada fica com a melhor fração delas, jogando mais
+partidas com as que sobraram. A nota de uma configuração é o quão perto a taxa
+de vitórias ficou do alvo.
+
+    python Ajuste.py -p energia_andar=3.5,4.5,5.5 -p custo_cabana.Madeira=30,50 --busca eliminacao --alvo 0.3
+"""
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+import itertools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import Balanceamento
+import Simulador
+
+ARQUIVO_CACHE = "ajuste.db"
+TAMANHO_BLOCO = 50 # Partidas por tarefa do pool e por resumo guardado
+ALVO_VITORIAS = 0.3 # Fração das partidas que o bot deveria vencer
+BOT_PADRAO = "explorador" # O bot aleatório quase nunca vence: não distingue as configurações
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS avaliacoes (
+    chave TEXT PRIMARY KEY,
+    resumo TEXT NOT NULL
+);
+"""
+
+
+class CacheAvaliacoes:
+    """Resumos de blocos de partidas já jogados, num banco SQLite. Use com `with`."""
+    def __init__(self, caminho=ARQUIVO_CACHE):
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho, timeout=60, isolation_level=None)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.executescript(ESQUEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.fechar()
+
+    def obter(self, chave):
+        linha = self.conexao.execute("SELECT resumo FROM avaliacoes WHERE chave = ?", (chave,)).fetchone()
+        return None if linha is None else json.loads(linha[0])
+
+    def guardar(self, chave, resumo):
+        self.conexao.execute("INSERT OR REPLACE INTO avaliacoes (chave, resumo) VALUES (?, ?)",
+                             (chave, json.dumps(resumo, ensure_ascii=False)))
+
+    def fechar(self):
+        self.conexao.close()
+
+
+# --- Avaliação ---
+
+def _jogar_bloco(config, bot, max_acoes, seed, indice):
+    # Resumo somável das partidas do bloco `indice` (seeds seguidas de seed_partida)
+    inicio = indice * TAMANHO_BLOCO
+    seeds = [Simulador.seed_partida(seed, i) for i in range(inicio, inicio + TAMANHO_BLOCO)]
+    status = Counter()
+    motivos = Counter()
+    total_dias = total_acoes = 0
+    for seed_bloco in seeds:
+        resultado = Simulador.jogar_partida(seed_bloco, Simulador.BOTS[bot], max_acoes, config)
+        status[resultado["status"]] += 1
+        if resultado["motivo"]:
+            motivos[resultado["motivo"]] += 1
+        total_dias += resultado["dias_sobrevividos"]
+        total_acoes += resultado["acoes"]
+    return {"partidas": len(seeds), "status": dict(status), "motivos": dict(motivos),
+            "total_dias": total_dias, "total_acoes": total_acoes}
+
+
+def juntar(resumos):
+    """Soma resumos de blocos num só, com a taxa de vitórias e as médias."""
+    status = Counter()
+    motivos = Counter()
+    partidas = total_dias = total_acoes = 0
+    for resumo in resumos:
+        partidas += resumo["partidas"]
+        status.update(resumo["status"])
+        motivos.update(resumo["motivos"])
+        total_dias += resumo["total_dias"]
+        total_acoes += resumo["total_acoes"]
+    return {
+        "partidas": partidas,
+        "status": dict(status),
+        "motivos": dict(motivos),
+        "total_dias": total_dias,
+        "total_acoes": total_acoes,
+        "taxa_vitoria": status["vitória"] / partidas if partidas else 0,
+        "media_dias": total_dias / partidas if partidas else 0,
+    }
+
+
+class Avaliador:
+    """Joga as partidas das configurações, reaproveitando os blocos do cache.
+
+    Todas as configurações usam as mesmas seeds (a partida i é a
+    seed_partida(seed, i) do Simulador), então as diferenças entre elas vêm
+    da configuração e não da sorte dos mapas.
+    """
+    def __init__(self, bot=BOT_PADRAO, max_acoes=Simulador.MAX_ACOES, seed=0, processos=None, cache=None):
+        if bot not in Simulador.BOTS:
+            raise ValueError(f"Bot desconhecido: {bot}")
+        self.bot = bot
+        self.max_acoes = max_acoes
+        self.seed = seed
+        self.processos = processos
+        self.cache = cache
+        self.blocos_jogados = 0
+        self.blocos_reaproveitados = 0
+
+    def _chave(self, config, indice):
+        return f"{config.chave()}:{self.bot}:{self.max_acoes}:{self.seed}:{TAMANHO_BLOCO}:{indice}"
+
+    def _jogar(self, tarefas):
+        # (chave, resumo) de cada tarefa (chave, config, indice), na ordem em que terminam
+        argumentos = [(config, self.bot, self.max_acoes, self.seed, indice) for _, config, indice in tarefas]
+        if self.processos == 1:
+            for (chave, _, _), args in zip(tarefas, argumentos):
+                yield chave, _jogar_bloco(*args)
+            return
+        with ProcessPoolExecutor(max_workers=self.processos) as executor:
+            futuros = {executor.submit(_jogar_bloco, *args): chave for (chave, _, _), args in zip(tarefas, argumentos)}
+            for futuro in as_completed(futuros):
+                yield futuros[futuro], futuro.result()
+
+    def avaliar(self, configs, partidas):
+        """Resumo (de juntar) de cada configuração, na ordem, com `partidas` partidas.
+
+        As partidas são arredondadas para cima até um número inteiro de blocos.
+        """
+        blocos = max(1, math.ceil(partidas / TAMANHO_BLOCO))
+        resumos = {}
+        tarefas = []
+        for config in configs:
+            for indice in range(blocos):
+                chave = self._chave(config, indice)
+                if chave in resumos:
+                    continue
+                resumos[chave] = self.cache.obter(chave) if self.cache is not None else None
+                if resumos[chave] is None:
+                    tarefas.append((chave, config, indice))
+                else:
+                    self.blocos_reaproveitados += 1
+
+        for chave, resumo in self._jogar(tarefas):
+            resumos[chave] = resumo
+            self.blocos_jogados += 1
+            if self.cache is not None:
+                self.cache.guardar(chave, resumo)
+        return [juntar(resumos[self._chave(config, indice)] for indice in range(blocos)) for config in configs]
+
+
+# --- Buscas ---
+
+def combinacoes(parametros, base=Balanceamento.PADRAO):
+    """Configurações com todas as combinações dos valores de `parametros` (nome -> lista de valores)."""
+    nomes = list(parametros)
+    return [base.com(dict(zip(nomes, valores))) for valores in itertools.product(*(parametros[nome] for nome in nomes))]
+
+
+def nota(resumo, alvo=ALVO_VITORIAS):
+    """Quanto maior, melhor: zero quando a taxa de vitórias bate com o alvo."""
+    return -abs(resumo["taxa_vitoria"] - alvo)
+
+
+def classificar(configs, resumos, alvo=ALVO_VITORIAS):
+    """Lista (nota, config, resumo) da melhor para a pior; empates ficam na ordem dada."""
+    notas = [(nota(resumo, alvo), config, resumo) for config, resumo in zip(configs, resumos)]
+    return sorted(notas, key=lambda item: -item[0])
+
+
+def busca_grade(avaliador, configs, partidas, alvo=ALVO_VITORIAS):
+    """Avalia todas as configurações com o mesmo número de partidas e as classifica."""
+    return classificar(configs, avaliador.avaliar(configs, partidas), alvo)
+
+
+def busca_eliminacao(avaliador, configs, partidas_iniciais, partidas_max, alvo=ALVO_VITORIAS, fator=2, rodada=None):
+    """Successive halving: a cada rodada fica 1/`fator` das configurações, com `fator` vezes mais partidas.
+
+    Termina quando sobra uma configuração ou as partidas chegam a
+    `partidas_max`, e retorna a classificação da última rodada.
+    `rodada(partidas, classificacao)`, se dada, é chamada ao fim de cada
+    rodada. As partidas de uma rodada incluem as da anterior (as mesmas seeds),
+    que vêm do cache.
+    """
+    vivas = list(configs)
+    partidas = partidas_iniciais
+    while True:
+        classificacao = busca_grade(avaliador, vivas, partidas, alvo)
+        if rodada is not None:
+            rodada(partidas, classificacao)
+        if len(vivas) == 1 or partidas >= partidas_max:
+            return classificacao
+        vivas = [config for _, config, _ in classificacao[:max(1, len(vivas) // fator)]]
+        partidas = min(partidas * fator, partidas_max)
+
+
+def _parametro(texto):
+    # "nome=v1,v2,..." -> (nome, [valores]); os valores são lidos como JSON (números, na prática)
+    nome, _, valores = texto.partition("=")
+    if not nome or not valores:
+        raise argparse.ArgumentTypeError(f"Use nome=valor1,valor2,...: {texto}")
+    try:
+        return nome, [json.loads(valor) for valor in valores.split(",")]
+    except json.JSONDecodeError as erro:
+        raise argparse.ArgumentTypeError(f"Valor inválido em {texto}: {erro}")
+
+
+def _linha(item):
+    valor, config, resumo = item
+    return (f"nota {valor:+.3f} | vitórias {resumo['taxa_vitoria']:.1%} | dias {resumo['media_dias']:.2f} | "
+            f"{resumo['partidas']} partidas | {config.diferencas() or 'padrão'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajusta o balanceamento do jogo com partidas simuladas.")
+    parser.add_argument("-p", "--parametro", type=_parametro, action="append", default=[],
+                        help="nome=valor1,valor2,... (nomes de Balanceamento.Configuracao, com pontos nos dicionários)")
+    parser.add_argument("--busca", choices=("grade", "eliminacao"), default="grade")
+    parser.add_argument("--partidas", type=int, default=400, help="partidas por configuração (na eliminação, o máximo)")
+    parser.add_argument("--partidas-iniciais", type=int, default=TAMANHO_BLOCO, help="partidas na primeira rodada da eliminação")
+    parser.add_argument("--fator", type=int, default=2, help="na eliminação, fica 1/fator das configurações por rodada")
+    parser.add_argument("--alvo", type=float, default=ALVO_VITORIAS, help="taxa de vitórias desejada")
+    parser.add_argument("--bot", choices=sorted(Simulador.BOTS), default=BOT_PADRAO)
+    parser.add_argument("--max-acoes", type=int, default=Simulador.MAX_ACOES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--cache", default=ARQUIVO_CACHE, help="banco SQLite dos blocos já jogados")
+    parser.add_argument("--mostrar", type=int, default=10, help="quantas configurações listar")
+    args = parser.parse_args()
+
+    try:
+        configs = combinacoes(dict(args.parametro))
+    except ValueError as erro:
+        parser.error(str(erro))
+
+    inicio = time.perf_counter()
+    with CacheAvaliacoes(args.cache) as cache:
+        avaliador = Avaliador(args.bot, args.max_acoes, args.seed, args.processos, cache)
+        if args.busca == "grade":
+            classificacao = busca_grade(avaliador, configs, args.partidas, args.alvo)
+        else:
+            def rodada(partidas, classificacao):
+                print(f"--- {len(classificacao)} configurações com {partidas} partidas: "
+                      f"melhor {_linha(classificacao[0])}", file=sys.stderr)
+            classificacao = busca_eliminacao(avaliador, configs, args.partidas_iniciais, args.partidas, args.alvo,
+                                             args.fator, rodada)
+    duracao = time.perf_counter() - inicio
+
+    for item in classificacao[:args.mostrar]:
+        print(_linha(item))
+    print(f"{len(configs)} configurações em {duracao:.1f}s | blocos de {TAMANHO_BLOCO} partidas: "
+          f"{avaliador.blocos_jogados} jogados, {avaliador.blocos_reaproveitados} do cache")
@@ -0,0 +1,296 @@
+# Ambiente.py
+"""Ambiente no estilo Gym para bots: várias partidas andando juntas, passo a passo.
+
+reset(seeds) começa uma partida por seed e step(acoes) executa uma ação em cada
+uma, devolvendo observações, recompensas, fins de partida e máscaras de ações
+como arrays NumPy (uma linha por partida). As ações são os índices de ACOES:
+as ações do menu do hud, já com as respostas das perguntas delas (direção,
+horas de descanso, quantidade de comida). Abrir a mochila e ver o mapa não
+mudam a partida e ficam de fora: a mochila e a posição da saída (com o mapa)
+já vêm na observação.
+
+A máscara de uma partida marca as ações que o hud ofereceria agora, mais a
+validade das respostas (não sair do mapa, não comer mais do que se tem).
+Partidas que terminam recomeçam sozinhas no mesmo step, com uma seed nova;
+o resultado da que terminou e a seed da nova vêm em `info`.
+
+Com AmbienteParalelo as partidas são divididas entre processos, cada um com
+o próprio Ambiente.
+
+    python Ambiente.py --partidas 256 --passos 200 --processos 4
+"""
+import time
+import random
+import argparse
+import multiprocessing
+
+import numpy as np
+
+import GeradorMapa
+from Forest import montar_resultado
+from Simulador import Motor, recusar, MAX_ACOES
+
+# nome, ação do menu, respostas
+ACOES = (
+    ("andar_norte", "andar", (1,)),
+    ("andar_sul", "andar", (2,)),
+    ("andar_leste", "andar", (3,)),
+    ("andar_oeste", "andar", (4,)),
+    ("explorar", "explorar", ()),
+    ("descansar_2", "descansar", (2,)),
+    ("descansar_4", "descansar", (4,)),
+    ("descansar_8", "descansar", (8,)),
+    ("comer_1", "comer", (1,)),
+    ("comer_5", "comer", (5,)),
+    ("construir_cabana", "construir_cabana", ()),
+    ("construir_pa", "construir_pa", ()),
+    ("cavar", "cavar", ()),
+)
+NOMES_ACOES = [nome for nome, _, _ in ACOES]
+DIRECOES = {1: (0, -1), 2: (0, 1), 3: (1, 0), 4: (-1, 0)} # resposta de andar -> (dx, dy)
+
+CAMPOS_ESTADO = ("vida", "energia", "fome", "dia", "hora", "madeira", "pedra", "comida",
+                 "tem_pa", "tem_mapa", "tem_cabana", "x", "y", "saida_dx", "saida_dy")
+RAIO_VISAO = 2 # A observação do terreno é a janela de (2 * RAIO_VISAO + 1)² células em volta do jogador
+
+RECOMPENSA_DIA = 1.0 # Por dia sobrevivido (proporcional às horas que a ação levou)
+RECOMPENSA_VITORIA = 10.0
+RECOMPENSA_DERROTA = -1.0
+
+
+class Ambiente:
+    """`num_partidas` partidas no mesmo processo, avançadas juntas por step().
+
+    `mapas`, se dado, é de onde vêm os mapas das partidas recomeçadas (um
+    PoolMapas, com obter()); sem ele cada partida gera o próprio mapa.
+    `responder` responde as perguntas dos eventos aleatórios.
+    """
+    def __init__(self, num_partidas, seed=None, responder=recusar, max_acoes=MAX_ACOES, mapas=None,
+                 largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA):
+        self.num_partidas = num_partidas
+        self.rng = random.Random(seed) # Seeds das partidas recomeçadas
+        self.responder = responder
+        self.max_acoes = max_acoes
+        self.mapas = mapas
+        self.largura, self.altura = largura, altura
+        self.motores = [None] * num_partidas
+        self._bordas = [None] * num_partidas # Tipos de cada mapa com RAIO_VISAO células de 0 em volta
+        lado = 2 * RAIO_VISAO + 1
+        self.estado = np.zeros((num_partidas, len(CAMPOS_ESTADO)), dtype=np.float32)
+        self.terreno = np.zeros((num_partidas, lado, lado), dtype=np.uint8) # Ids de GeradorMapa.ID_TIPO; 0 fora do mapa
+        self.explorado = np.zeros((num_partidas, altura, largura), dtype=bool) # Células vistas (a neblina da partida)
+        self.mascaras = np.zeros((num_partidas, len(ACOES)), dtype=bool)
+
+    # --- API ---
+
+    def reset(self, seeds=None):
+        """Começa uma partida nova em cada posição. Retorna (observacao, info)."""
+        if seeds is None:
+            seeds = [None] * self.num_partidas
+        if len(seeds) != self.num_partidas:
+            raise ValueError(f"Esperadas {self.num_partidas} seeds, recebidas {len(seeds)}.")
+        for indice, seed in enumerate(seeds):
+            self._comecar(indice, seed)
+        return self.observacao(), {"seeds": [motor.seed for motor in self.motores]}
+
+    def step(self, acoes):
+        """Executa a ação acoes[i] (índice de ACOES) na partida i.
+
+        Retorna (observacao, recompensas, terminados, truncados, info). Uma
+        partida terminada (vitória ou derrota) ou truncada (max_acoes) já volta
+        recomeçada; info["resultados"] tem o registro do resultado de cada uma
+        e info["seeds"] a seed da partida que começou no lugar dela (None nas
+        que continuam).
+        """
+        recompensas = np.zeros(self.num_partidas, dtype=np.float32)
+        terminados = np.zeros(self.num_partidas, dtype=bool)
+        truncados = np.zeros(self.num_partidas, dtype=bool)
+        resultados = [None] * self.num_partidas
+        seeds = [None] * self.num_partidas
+        for indice, acao in enumerate(acoes):
+            motor = self.motores[indice]
+            _, metodo, respostas = ACOES[acao]
+            antes = motor.partida.agenda.agora
+            resultado = motor.executar(metodo, *respostas)
+            recompensas[indice] = (motor.partida.agenda.agora - antes) / 24 * RECOMPENSA_DIA
+            if resultado is not None:
+                terminados[indice] = True
+                recompensas[indice] += RECOMPENSA_VITORIA if resultado["status"] == "vitória" else RECOMPENSA_DERROTA
+            elif motor.num_acoes >= self.max_acoes:
+                truncados[indice] = True
+                resultado = montar_resultado(motor.jogador, motor.partida, "limite")
+            if resultado is not None:
+                resultado["acoes"] = motor.num_acoes
+                resultados[indice] = resultado
+                self._comecar(indice)
+                seeds[indice] = self.motores[indice].seed
+            else:
+                self._observar(indice)
+        return self.observacao(), recompensas, terminados, truncados, {"resultados": resultados, "seeds": seeds}
+
+    def observacao(self):
+        """Dicionário de arrays: estado (CAMPOS_ESTADO), terreno, explorado e mascara.
+
+        Os arrays são do ambiente e mudam no próximo step (copie para guardar).
+        """
+        return {"estado": self.estado, "terreno": self.terreno, "explorado": self.explorado, "mascara": self.mascaras}
+
+    def close(self):
+        pass
+
+    # --- Partidas ---
+
+    def _comecar(self, indice, seed=None):
+        mapa = None
+        if seed is None and self.mapas is not None:
+            seed, mapa = self.mapas.obter()
+        elif seed is None:
+            seed = self.rng.getrandbits(63)
+        motor = Motor(seed, self.responder, mapa)
+        if (motor.partida.largura, motor.partida.altura) != (self.largura, self.altura):
+            raise ValueError("Todas as partidas de um Ambiente precisam ter o mapa do mesmo tamanho.")
+        self.motores[indice] = motor
+        self._bordas[indice] = np.pad(motor.partida.mapa.tipos, RAIO_VISAO)
+        self._observar(indice)
+
+    def _observar(self, indice):
+        motor = self.motores[indice]
+        jogador = motor.jogador
+        partida = motor.partida
+        mochila = jogador.mochila
+        x, y = jogador.terreno_atual.posicao
+        self.explorado[indice] = partida.neblina.mascara(partida.mapa.origem, self.largura, self.altura)
+
+        estado = self.estado[indice]
+        estado[:] = (jogador.vida, jogador.energia, jogador.fome, partida.dia, partida.hora,
+                     mochila.get("Madeira", 0), mochila.get("Pedra", 0), mochila.get("Comida", 0),
+                     "Pá" in mochila, jogador.tem_mapa, jogador.tem_cabana, x, y,
+                     partida.saida_pos[0] - x if jogador.tem_mapa else 0,
+                     partida.saida_pos[1] - y if jogador.tem_mapa else 0)
+
+        # Janela de tipos em volta do jogador, recortada da grade com borda de zeros
+        lado = 2 * RAIO_VISAO + 1
+        self.terreno[indice] = self._bordas[indice][y:y + lado, x:x + lado]
+
+        # Máscara: as ações que o hud ofereceria, com respostas válidas
+        disponiveis = set(motor.acoes())
+        comida = mochila.get("Comida", 0)
+        validas = []
+        for _, acao, respostas in ACOES:
+            if acao not in disponiveis:
+                validas.append(False)
+            elif acao == "andar":
+                dx, dy = DIRECOES[respostas[0]]
+                validas.append(0 <= x + dx < self.largura and 0 <= y + dy < self.altura)
+            elif acao == "comer":
+                validas.append(comida >= respostas[0])
+            else:
+                validas.append(True)
+        self.mascaras[indice] = validas
+
+
+# --- Vários processos ---
+
+def _trabalhador(conexao, num_partidas, seed, responder, max_acoes):
+    ambiente = Ambiente(num_partidas, seed, responder, max_acoes)
+    while True:
+        comando, argumento = conexao.recv()
+        if comando == "reset":
+            conexao.send(ambiente.reset(argumento))
+        elif comando == "step":
+            conexao.send(ambiente.step(argumento))
+        else:
+            conexao.close()
+            return
+
+
+class AmbienteParalelo:
+    """A mesma API do Ambiente, com as partidas divididas entre `processos` processos.
+
+    Cada processo avança a sua parte das partidas a cada step; as observações
+    voltam juntas, na ordem das partidas.
+    """
+    def __init__(self, num_partidas, processos=None, seed=None, responder=recusar, max_acoes=MAX_ACOES):
+        processos = min(processos or multiprocessing.cpu_count(), num_partidas)
+        self.num_partidas = num_partidas
+        self.fatias = np.array_split(np.arange(num_partidas), processos)
+        self.conexoes = []
+        self.processos = []
+        for numero, fatia in enumerate(self.fatias):
+            nossa, deles = multiprocessing.Pipe()
+            # Cada processo sorteia as próprias seeds, derivadas da seed do ambiente
+            seed_processo = None if seed is None else f"{seed}:{numero}"
+            processo = multiprocessing.Process(target=_trabalhador, daemon=True,
+                                               args=(deles, len(fatia), seed_processo, responder, max_acoes))
+            processo.start()
+            deles.close()
+            self.conexoes.append(nossa)
+            self.processos.append(processo)
+
+    def reset(self, seeds=None):
+        for conexao, fatia in zip(self.conexoes, self.fatias):
+            conexao.send(("reset", None if seeds is None else [seeds[i] for i in fatia]))
+        respostas = [conexao.recv() for conexao in self.conexoes]
+        observacao = _juntar([observacao for observacao, _ in respostas])
+        return observacao, {"seeds": [seed for _, info in respostas for seed in info["seeds"]]}
+
+    def step(self, acoes):
+        acoes = np.asarray(acoes)
+        for conexao, fatia in zip(self.conexoes, self.fatias):
+            conexao.send(("step", acoes[fatia]))
+        respostas = [conexao.recv() for conexao in self.conexoes]
+        observacao = _juntar([resposta[0] for resposta in respostas])
+        recompensas, terminados, truncados = (np.concatenate([resposta[i] for resposta in respostas]) for i in (1, 2, 3))
+        info = {chave: [valor for resposta in respostas for valor in resposta[4][chave]] for chave in ("resultados", "seeds")}
+        return observacao, recompensas, terminados, truncados, info
+
+    def close(self):
+        for conexao in self.conexoes:
+            conexao.send(("fim", None))
+            conexao.close()
+        for processo in self.processos:
+            processo.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.close()
+        return False
+
+
+def _juntar(observacoes):
+    return {chave: np.concatenate([observacao[chave] for observacao in observacoes]) for chave in observacoes[0]}
+
+
+def acoes_aleatorias(mascaras, rng):
+    """Uma ação válida sorteada por partida (a linha de base dos bots)."""
+    # Ruído só nas ações permitidas; o maior de cada linha é a escolhida
+    return np.argmax(rng.random(mascaras.shape) * mascaras, axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede passos por segundo do Ambiente com ações aleatórias.")
+    parser.add_argument("--partidas", type=int, default=256)
+    parser.add_argument("--passos", type=int, default=200)
+    parser.add_argument("--processos", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.processos == 1:
+        ambiente = Ambiente(args.partidas, seed=args.seed)
+    else:
+        ambiente = AmbienteParalelo(args.partidas, args.processos, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    observacao, _ = ambiente.reset()
+    inicio = time.perf_counter()
+    fins = 0
+    vitorias = 0
+    for _ in range(args.passos):
+        observacao, recompensas, terminados, truncados, info = ambiente.step(acoes_aleatorias(observacao["mascara"], rng))
+        fins += int(terminados.sum() + truncados.sum())
+        vitorias += sum(1 for resultado in info["resultados"] if resultado and resultado["status"] == "vitória")
+    duracao = time.perf_counter() - inicio
+    ambiente.close()
+    print(f"Passos: {args.partidas * args.passos} em {duracao:.2f}s ({args.partidas * args.passos / duracao:.0f} por segundo)")
+    print(f"Partidas terminadas: {fins} ({vitorias} vitórias)")
@@ -0,0 +1,111 @@
+# Balanceamento.py
+"""Constantes de balanceamento do jogo reunidas num objeto, para ajustar sem mexer no código.
+
+Configuracao guarda os recursos base de cada terreno, os custos da pá e da
+cabana, os multiplicadores de energia e fome de andar e explorar e a taxa dos
+eventos aleatórios. A Partida lê tudo da configuração dela; PADRAO é o jogo
+como sempre foi, e com ela as partidas (e as trilhas já gravadas) não mudam.
+
+com() devolve uma cópia com alguns valores trocados, pelo nome do parâmetro,
+com pontos para entrar nos dicionários ("custo_cabana.Madeira",
+"recursos_tipo.Floresta.Comida"). chave() é um hash estável dos valores: o
+Ajuste guarda as avaliações de cada configuração por ela.
+"""
+import copy
+import json
+import hashlib
+
+import numpy as np
+
+import GeradorMapa
+
+MAX_RECURSO_BASE = 85 # Sorteado até 3 vezes o valor base, o recurso da célula ainda cabe num byte
+
+
+class Configuracao:
+    """Valores de balanceamento de uma partida (os padrões são os do jogo).
+
+    Andar gasta round(tempo de travessia * energia_andar) de energia e essa
+    energia vezes fome_andar de fome; explorar gasta tempo * energia_explorar
+    de energia e tempo * fome_explorar de fome. taxa_eventos é a média de
+    eventos aleatórios por hora de jogo.
+    """
+    def __init__(self, recursos_tipo=None, custo_pa=None, custo_cabana=None, energia_andar=4.5, fome_andar=0.5,
+                 energia_explorar=5, fome_explorar=2, taxa_eventos=1 / 24):
+        self.recursos_tipo = copy.deepcopy(GeradorMapa.RECURSOS_TIPO if recursos_tipo is None else recursos_tipo)
+        self.custo_pa = dict({"Madeira": 5, "Pedra": 2} if custo_pa is None else custo_pa)
+        self.custo_cabana = dict({"Madeira": 50, "Pedra": 20} if custo_cabana is None else custo_cabana)
+        self.energia_andar = energia_andar
+        self.fome_andar = fome_andar
+        self.energia_explorar = energia_explorar
+        self.fome_explorar = fome_explorar
+        self.taxa_eventos = taxa_eventos
+
+        if set(self.recursos_tipo) != set(GeradorMapa.TIPOS_TERRENO):
+            raise ValueError(f"recursos_tipo precisa ter os tipos {GeradorMapa.TIPOS_TERRENO}.")
+        for tipo, recursos in self.recursos_tipo.items():
+            if set(recursos) != set(GeradorMapa.NOMES_RECURSOS):
+                raise ValueError(f"Os recursos de {tipo} precisam ser {GeradorMapa.NOMES_RECURSOS}.")
+            if not all(isinstance(valor, int) and 0 <= valor <= MAX_RECURSO_BASE for valor in recursos.values()):
+                raise ValueError(f"Os recursos base de {tipo} precisam ser inteiros entre 0 e {MAX_RECURSO_BASE}.")
+        if taxa_eventos <= 0:
+            raise ValueError("taxa_eventos precisa ser positiva.")
+
+        # Tabela no formato de GeradorMapa.RECURSOS_BASE (a própria, quando não mudou)
+        tabela = np.array([[0] * len(GeradorMapa.NOMES_RECURSOS)] +
+                          [[self.recursos_tipo[tipo][recurso] for recurso in GeradorMapa.NOMES_RECURSOS]
+                           for tipo in GeradorMapa.TIPOS_TERRENO], dtype=np.uint8)
+        self.recursos_base = GeradorMapa.RECURSOS_BASE if np.array_equal(tabela, GeradorMapa.RECURSOS_BASE) else tabela
+
+    def como_dict(self):
+        return {
+            "recursos_tipo": copy.deepcopy(self.recursos_tipo),
+            "custo_pa": dict(self.custo_pa),
+            "custo_cabana": dict(self.custo_cabana),
+            "energia_andar": self.energia_andar,
+            "fome_andar": self.fome_andar,
+            "energia_explorar": self.energia_explorar,
+            "fome_explorar": self.fome_explorar,
+            "taxa_eventos": self.taxa_eventos,
+        }
+
+    def com(self, alteracoes):
+        """Cópia com os valores de `alteracoes` (nome do parâmetro -> valor) trocados."""
+        dados = self.como_dict()
+        for nome, valor in alteracoes.items():
+            *caminho, campo = nome.split(".")
+            destino = dados
+            for parte in caminho:
+                destino = destino.get(parte) if isinstance(destino, dict) else None
+            if not isinstance(destino, dict) or campo not in destino:
+                raise ValueError(f"Parâmetro desconhecido: {nome}")
+            destino[campo] = valor
+        return Configuracao(**dados)
+
+    def diferencas(self, outra=None):
+        """Parâmetros (com pontos) cujo valor difere de `outra` (PADRAO, se omitida), com o valor desta."""
+        def achatar(dados, prefixo=""):
+            for nome, valor in dados.items():
+                if isinstance(valor, dict):
+                    yield from achatar(valor, f"{prefixo}{nome}.")
+                else:
+                    yield f"{prefixo}{nome}", valor
+        referencia = dict(achatar((outra or PADRAO).como_dict()))
+        return {nome: valor for nome, valor in achatar(self.como_dict()) if referencia.get(nome) != valor}
+
+    def chave(self):
+        """Hash (hexadecimal) dos valores: configurações iguais têm a mesma chave em qualquer processo."""
+        texto = json.dumps(self.como_dict(), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+    def __eq__(self, outra):
+        return isinstance(outra, Configuracao) and self.como_dict() == outra.como_dict()
+
+    def __hash__(self):
+        return hash(self.chave())
+
+    def __repr__(self):
+        return f"Configuracao({self.diferencas()!r})"
+
+
+PADRAO = Configuracao()
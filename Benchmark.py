@@ -0,0 +1,216 @@
+# Benchmark.py
+"""Medições de desempenho da geração, do desenho, do salvamento e das partidas.
+
+Cada caso roda várias repetições e registra o tempo por operação (mediana e
+mínimo). O resultado sai em JSON e pode ser gravado como referência; com
+--comparar, os casos que ficaram mais lentos que a referência além da
+tolerância são listados e o processo termina com código 1.
+
+    python Benchmark.py --gravar referencia.json
+    python Benchmark.py --comparar referencia.json --tolerancia 0.25
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+
+import numpy as np
+
+import GeradorMapa
+import Forest
+import Simulador
+import Ambiente
+import Neblina
+from Resultados import ArmazemResultados
+
+VERSAO_FORMATO = 1
+TOLERANCIA = 0.20 # 20% mais lento que a referência conta como regressão
+
+
+def medir(funcao, repeticoes, operacoes=1):
+    """Tempos por operação de `repeticoes` chamadas a funcao() (que faz `operacoes` operações)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) / operacoes)
+    return {
+        "mediana": statistics.median(tempos),
+        "minimo": min(tempos),
+        "repeticoes": repeticoes,
+        "operacoes": operacoes,
+    }
+
+
+# --- Casos ---
+# Cada caso recebe a escala (1 = padrão) e devolve o dicionário de medir().
+
+def caso_gerar_mapa(tamanho, repeticoes, estrategia=GeradorMapa.ESTRATEGIA_PADRAO):
+    def caso(escala):
+        rng = random.Random(0)
+        return medir(lambda: GeradorMapa.gerar_mapa(tamanho, tamanho, rng, estrategia), max(1, int(repeticoes * escala)))
+    return caso
+
+
+def caso_get_vizinhos(escala):
+    n = 10_000
+    posicoes = [(x % GeradorMapa.MAPA_LARGURA, x // GeradorMapa.MAPA_LARGURA % GeradorMapa.MAPA_ALTURA) for x in range(n)]
+
+    def consultar():
+        for posicao in posicoes:
+            GeradorMapa.get_vizinhos(posicao, GeradorMapa.MAPA_LARGURA, GeradorMapa.MAPA_ALTURA)
+    return medir(consultar, max(1, int(20 * escala)), n)
+
+
+def caso_imprimir_mapa(tamanho):
+    def caso(escala):
+        mapa, _ = GeradorMapa.gerar_mapa(tamanho, tamanho, random.Random(0))
+        arquivo = GeradorMapa.console.file
+        GeradorMapa.console.file = io.StringIO() # O desenho vai para a memória, não para o terminal
+        try:
+            return medir(lambda: GeradorMapa.imprimir_mapa_texto_com_grade_e_cores(
+                mapa, tamanho, tamanho, GeradorMapa.LARGURA_CELULA), max(1, int(50 * escala)))
+        finally:
+            GeradorMapa.console.file = arquivo
+    return caso
+
+
+def caso_salvar_resultado(existentes):
+    def caso(escala):
+        jogador = Forest.Jogador(vida=100, energia=100, fome=100)
+        partida = Forest.Partida(jogador, terminal=Simulador.TerminalSilencioso(), salvar=False, seed=0)
+        registro = Forest.montar_resultado(jogador, partida, "derrota", "Benchmark")
+        diretorio_atual = os.getcwd()
+        with tempfile.TemporaryDirectory() as diretorio:
+            # salvar_resultado grava no arquivo padrão do diretório atual
+            os.chdir(diretorio)
+            try:
+                with ArmazemResultados(tamanho_lote=existentes + 1) as armazem:
+                    for _ in range(existentes):
+                        armazem.adicionar(registro)
+                return medir(lambda: Forest.salvar_resultado(jogador, partida, "derrota", "Benchmark"),
+                             max(1, int(50 * escala)))
+            finally:
+                os.chdir(diretorio_atual)
+    return caso
+
+
+def caso_partidas(escala):
+    # O TerminalSilencioso não imprime nem espera: time.sleep não entra na medida
+    n = max(1, int(200 * escala))
+    seeds = iter(range(10**9))
+    return medir(lambda: [Simulador.jogar_partida(next(seeds)) for _ in range(n)], 3, n)
+
+
+def caso_ambiente(escala):
+    ambiente = Ambiente.Ambiente(64, seed=0)
+    ambiente.reset()
+    rng = np.random.default_rng(0)
+    n = max(1, int(20 * escala))
+
+    def passos():
+        for _ in range(n):
+            ambiente.step(Ambiente.acoes_aleatorias(ambiente.mascaras, rng))
+    return medir(passos, 5, n * ambiente.num_partidas)
+
+
+def caso_neblina(escala):
+    # Caminhada aleatória revelando em volta, num mapa de 4096x4096, e as consultas dos bots
+    n = 10_000
+    neblina = Neblina.Neblina(((0, 0), 4096, 4096))
+    rng = random.Random(0)
+    x = y = 2048
+    posicoes = []
+    for _ in range(n):
+        x = min(max(x + rng.randint(-1, 1), 0), 4095)
+        y = min(max(y + rng.randint(-1, 1), 0), 4095)
+        posicoes.append((x, y))
+
+    def revelar():
+        for posicao in posicoes:
+            neblina.revelar(posicao, Forest.RAIO_VISAO)
+            neblina.visto(posicao)
+        neblina.fracao_explorada()
+        neblina.fronteira()
+    return medir(revelar, max(1, int(5 * escala)), n)
+
+
+CASOS = {
+    "gerar_mapa_9x9": caso_gerar_mapa(9, 500),
+    # Nomes novos: as referências gravadas antes de a caminhada crescer com o mapa
+    # mediam mapas quase só de floresta e não servem de comparação
+    "gerar_mapa_caminhada_100x100": caso_gerar_mapa(100, 50),
+    "gerar_mapa_caminhada_1000x1000": caso_gerar_mapa(1000, 3),
+    "gerar_mapa_ruido_1000x1000": caso_gerar_mapa(1000, 3, "ruido"),
+    "gerar_mapa_ruido_4096x4096": caso_gerar_mapa(4096, 1, "ruido"),
+    "get_vizinhos": caso_get_vizinhos,
+    "imprimir_mapa_9x9": caso_imprimir_mapa(9),
+    "salvar_resultado_10k": caso_salvar_resultado(10_000),
+    "salvar_resultado_100k": caso_salvar_resultado(100_000),
+    "partidas": caso_partidas,
+    "ambiente_passos": caso_ambiente,
+    "neblina_4096x4096": caso_neblina,
+}
+
+
+def executar(nomes=None, escala=1.0):
+    """Roda os casos escolhidos (todos, por padrão) e devolve o relatório."""
+    resultados = {}
+    for nome, caso in CASOS.items():
+        if nomes and nome not in nomes:
+            continue
+        resultados[nome] = caso(escala)
+    return {
+        "versao": VERSAO_FORMATO,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "escala": escala,
+        "resultados": resultados,
+    }
+
+
+def comparar(relatorio, referencia, tolerancia=TOLERANCIA):
+    """Lista (nome, tempo de referência, tempo atual, variação) dos casos mais lentos que a tolerância."""
+    regressoes = []
+    for nome, atual in relatorio["resultados"].items():
+        anterior = referencia["resultados"].get(nome)
+        if anterior is None:
+            continue
+        variacao = atual["mediana"] / anterior["mediana"] - 1
+        if variacao > tolerancia:
+            regressoes.append((nome, anterior["mediana"], atual["mediana"], variacao))
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o desempenho do jogo e compara com uma referência.")
+    parser.add_argument("casos", nargs="*", help=f"casos a rodar (padrão: todos): {', '.join(CASOS)}")
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplica o número de repetições")
+    parser.add_argument("--gravar", metavar="ARQUIVO", help="grava o relatório JSON neste arquivo")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="compara com o relatório JSON deste arquivo")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    desconhecidos = set(args.casos) - set(CASOS)
+    if desconhecidos:
+        parser.error(f"casos desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    relatorio = executar(args.casos, args.escala)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    if args.gravar:
+        with open(args.gravar, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            referencia = json.load(f)
+        regressoes = comparar(relatorio, referencia, args.tolerancia)
+        for nome, anterior, atual, variacao in regressoes:
+            print(f"REGRESSÃO {nome}: {anterior * 1e6:.1f}µs -> {atual * 1e6:.1f}µs ({variacao:+.0%})", file=sys.stderr)
+        sys.exit(1 if regressoes else 0)
@@ -0,0 +1,189 @@
+# Caminhos.py
+"""Rotas e campos de distância no mapa, com o custo de tempo_travessia.
+
+O custo de um passo é o tempo_travessia do terreno em que se entra, igual ao
+que Jogador.andar cobra em horas. Um campo de distância guarda, para cada
+célula, o custo mínimo até um alvo; depois de calculado, a distância e o
+próximo passo de qualquer posição saem em tempo constante.
+"""
+import heapq
+
+import numpy as np
+
+import GeradorMapa
+
+# Direções de Jogador.andar: (dx, dy) -> nome
+NOMES_DIRECOES = {(0, -1): "Norte", (0, 1): "Sul", (1, 0): "Leste", (-1, 0): "Oeste"}
+
+
+def campo_distancia(grade, alvos):
+    """Custo mínimo de cada célula da grade até o alvo mais próximo (array altura x largura).
+
+    Algoritmo de Dijkstra com baldes (os custos são inteiros pequenos),
+    vetorizado: cada balde processa de uma vez todas as células com a mesma
+    distância. Células inalcançáveis ficam com -1.
+    """
+    largura, altura = grade.largura, grade.altura
+    n = largura * altura
+    custos = grade.tempos.ravel().astype(np.int64)
+    distancias = np.full(n, -1, dtype=np.int64)
+    provisorias = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+
+    ox, oy = grade.origem
+    iniciais = np.array([(y - oy) * largura + (x - ox) for x, y in alvos], dtype=np.int64)
+    provisorias[iniciais] = 0
+    baldes = {0: [iniciais]}
+
+    while baldes:
+        distancia = min(baldes)
+        celulas = np.unique(np.concatenate(baldes.pop(distancia)))
+        # Descarta entradas antigas de células que já foram fechadas com custo menor
+        celulas = celulas[(distancias[celulas] == -1) & (provisorias[celulas] == distancia)]
+        if len(celulas) == 0:
+            continue
+        distancias[celulas] = distancia
+
+        # Quem entra na célula u a partir de um vizinho paga custos[u]
+        novas = distancia + custos[celulas]
+        xs = celulas % largura
+        for deslocamento, validos in ((1, xs < largura - 1), (-1, xs > 0),
+                                      (largura, celulas < n - largura), (-largura, celulas >= largura)):
+            vizinhos = celulas[validos] + deslocamento
+            custo = novas[validos]
+            melhores = (distancias[vizinhos] == -1) & (custo < provisorias[vizinhos])
+            vizinhos, custo = vizinhos[melhores], custo[melhores]
+            np.minimum.at(provisorias, vizinhos, custo)
+            for valor in np.unique(custo):
+                baldes.setdefault(int(valor), []).append(vizinhos[custo == valor])
+
+    return distancias.reshape(altura, largura)
+
+
+class CampoDistancia:
+    """Campo de distância até um conjunto de alvos, com consultas em O(1)."""
+    def __init__(self, grade, alvos):
+        self.grade = grade
+        self.alvos = tuple(alvos)
+        self.distancias = campo_distancia(grade, self.alvos)
+
+    def distancia(self, posicao):
+        """Custo mínimo (em horas) da posição até o alvo, ou None se inalcançável."""
+        x, y = self.grade._local(posicao)
+        distancia = int(self.distancias[y, x])
+        return None if distancia < 0 else distancia
+
+    def proximo_passo(self, posicao):
+        """Vizinho pelo qual segue a rota mais curta, ou None se já está no alvo."""
+        x, y = self.grade._local(posicao)
+        distancia = self.distancias[y, x]
+        if distancia <= 0:
+            return None
+        for vizinho in self.grade.vizinhos(posicao):
+            vx, vy = self.grade._local(vizinho)
+            if self.distancias[vy, vx] >= 0 and self.distancias[vy, vx] + self.grade.tempos[vy, vx] == distancia:
+                return vizinho
+        return None
+
+    def rota(self, posicao):
+        """Lista de posições da posição até o alvo (incluindo as duas pontas)."""
+        if self.distancia(posicao) is None:
+            return None
+        rota = [posicao]
+        while (passo := self.proximo_passo(rota[-1])) is not None:
+            rota.append(passo)
+        return rota
+
+
+class Rotas:
+    """Campos de distância de uma grade até a saída, a caverna e a cachoeira.
+
+    Os campos são calculados na primeira consulta e guardados até o terreno da
+    grade mudar (Grade.versao).
+    """
+    def __init__(self, grade, saida_pos):
+        self.grade = grade
+        self.saida_pos = saida_pos
+        self._campos = {}
+        self._versao = grade.versao
+
+    def campo(self, alvo):
+        """Campo até "saida", "Caverna", "Cachoeira" ou uma posição (x, y)."""
+        if self.grade.versao != self._versao:
+            self._campos.clear()
+            self._versao = self.grade.versao
+        campo = self._campos.get(alvo)
+        if campo is None:
+            campo = CampoDistancia(self.grade, self._posicoes_alvo(alvo))
+            self._campos[alvo] = campo
+        return campo
+
+    def _posicoes_alvo(self, alvo):
+        if alvo == "saida":
+            return [self.saida_pos]
+        if isinstance(alvo, str):
+            ox, oy = self.grade.origem
+            ys, xs = np.nonzero(self.grade.tipos == GeradorMapa.ID_TIPO[alvo])
+            return [(int(x) + ox, int(y) + oy) for x, y in zip(xs, ys)]
+        return [alvo]
+
+    def distancia(self, posicao, alvo="saida"):
+        return self.campo(alvo).distancia(posicao)
+
+    def proximo_passo(self, posicao, alvo="saida"):
+        return self.campo(alvo).proximo_passo(posicao)
+
+    def rota(self, posicao, alvo="saida"):
+        return self.campo(alvo).rota(posicao)
+
+    def dica(self, posicao, alvo="saida"):
+        """Texto curto com a direção do próximo passo e o tempo até o alvo."""
+        distancia = self.distancia(posicao, alvo)
+        if distancia is None:
+            return "Não há caminho conhecido."
+        if distancia == 0:
+            return "Você já está aqui."
+        passo = self.proximo_passo(posicao, alvo)
+        direcao = NOMES_DIRECOES[(passo[0] - posicao[0], passo[1] - posicao[1])]
+        return f"Siga para o {direcao}. Faltam cerca de {distancia} hora(s) de caminhada."
+
+
+def a_estrela(mapa, origem, destino, limite=100_000):
+    """Rota mais barata de origem a destino em qualquer mapa (Grade ou Mundo).
+
+    Serve para consultas avulsas, sem campo pré-calculado, inclusive no mundo
+    infinito; `limite` é o máximo de células expandidas antes de desistir. No
+    Mundo, a busca gera os chunks que atravessa; os da vizinhança do jogador
+    (Mundo.preparar) continuam no cache.
+    Retorna (custo, rota) ou None.
+    """
+    def estimativa(posicao):
+        # O menor tempo de travessia é 1, então a distância de Manhattan nunca superestima
+        return abs(posicao[0] - destino[0]) + abs(posicao[1] - destino[1])
+
+    custos = {origem: 0}
+    anteriores = {origem: None}
+    fila = [(estimativa(origem), 0, origem)]
+    expandidas = 0
+    while fila:
+        _, custo, posicao = heapq.heappop(fila)
+        if posicao == destino:
+            rota = []
+            while posicao is not None:
+                rota.append(posicao)
+                posicao = anteriores[posicao]
+            return custo, rota[::-1]
+        if custo > custos[posicao]:
+            continue
+        expandidas += 1
+        if expandidas > limite:
+            return None
+        for dx, dy in GeradorMapa.DESLOCAMENTOS_VIZINHOS:
+            vizinho = (posicao[0] + dx, posicao[1] + dy)
+            if vizinho not in mapa:
+                continue
+            novo_custo = custo + mapa[vizinho].tempo_travessia
+            if novo_custo < custos.get(vizinho, novo_custo + 1):
+                custos[vizinho] = novo_custo
+                anteriores[vizinho] = posicao
+                heapq.heappush(fila, (novo_custo + estimativa(vizinho), novo_custo, vizinho))
+    return None
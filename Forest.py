@@ -3,10 +3,20 @@ import os
 import sys
 import random
 import time
+import argparse
 from rich.console import Console
 
 # Importa o nosso módulo de geração de mapa
 import GeradorMapa
+import Caminhos
+from Mundo import Mundo
+from Resultados import ArmazemResultados
+from Renderizador import RenderizadorMapa
+from Neblina import Neblina
+import Salvamento
+import Instrumentacao
+import Agenda
+import Balanceamento
 
 # --- Constantes e Configurações do Jogo ---
 console = Console()
@@ -16,34 +26,80 @@ Seu objetivo é claro: encontrar uma maneira de sair deste lugar.
 Explore, colete recursos e sobreviva. Boa sorte."""
 
 MAX_ATRIBUTOS = 100
-CUSTO_PA = {"Madeira": 5, "Pedra": 2}
-CUSTO_CABANA = {"Madeira": 50, "Pedra": 20} # Custo para construir uma cabana
-
-def salvar_resultado(player, partida, status, motivo=None):
-    """Grava (ou acrescenta) o resultado da partida em resultados.json."""
-    registro = {
+HORA_INICIAL = 6 # Custos, gastos de energia e fome e taxa de eventos: ver Balanceamento.Configuracao
+HORAS_DECAIMENTO = 8 # A cada quantas horas a fome cai sozinha
+FOME_DECAIMENTO = 2
+RAIO_VISAO = 2 # Células vistas em volta do jogador ao chegar num lugar
+RAIO_EXPLORAR = 4 # Explorando, o jogador olha mais longe
+
+def montar_resultado(player, partida, status, motivo=None):
+    """Monta o registro com o resultado final da partida."""
+    return {
         "status": status,                    # "vitória" ou "derrota"
         "dias_sobrevividos": partida.dia,
         "motivo": motivo,                    # None quando vencer
         "mochila": player.mochila.copy(),
-        "tem_cabana": player.tem_cabana
+        "tem_cabana": player.tem_cabana,
+        "seed": partida.seed,                # Recria o mapa e os sorteios da partida
+        "mundo": partida.mundo is not None,
+        "estrategia": partida.estrategia,    # De GeradorMapa.gerar_mapa, com a seed refaz o mapa
+        "config": partida.config.diferencas(), # Valores de balanceamento que não são os padrões
+        "trilha": list(partida.trilha)       # Respostas dadas, em ordem
     }
 
-    arquivo = "resultados.json"
+def salvar_resultado(player, partida, status, motivo=None):
+    """Acrescenta o resultado da partida ao banco de resultados (resultados.db)."""
+    registro = montar_resultado(player, partida, status, motivo)
+    with ArmazemResultados() as armazem:
+        armazem.adicionar(registro)
+
+def gerador_mapa(seed):
+    """Gerador aleatório do mapa da partida de seed `seed`.
+
+    Separado do gerador dos sorteios da partida, para que um mapa gerado antes
+    (num PoolMapas, por exemplo) seja o mesmo que a partida geraria sozinha.
+    """
+    return random.Random(f"mapa:{seed}")
+
+# --- Entrada e Saída ---
+
+class FimDeJogo(Exception):
+    """Sinaliza o fim da partida, carregando o registro com o resultado."""
+    def __init__(self, resultado):
+        super().__init__(resultado["status"])
+        self.resultado = resultado
 
-    # Se já existe, carrega lista; se não, começa vazia
-    try:
-        with open(arquivo, "r", encoding="utf-8") as f:
-            dados = json.load(f)
-            if not isinstance(dados, list):
-                dados = [dados]
-    except FileNotFoundError:
-        dados = []
+class Terminal:
+    """Entrada e saída do jogo no terminal (modo interativo)."""
+    def escrever(self, texto=""):
+        print(texto)
 
-    # Adiciona novo registro e salva de volta
-    dados.append(registro)
-    with open(arquivo, "w", encoding="utf-8") as f:
-        json.dump(dados, f, ensure_ascii=False, indent=2)
+    def destacar(self, texto=""):
+        # Texto com marcações de cor do Rich
+        console.print(texto)
+
+    def ler(self, prompt=""):
+        return input(prompt)
+
+    def perguntar(self, prompt):
+        # Mostra o prompt sem quebrar a linha (quando a resposta é lida em outro lugar)
+        print(prompt, end="", flush=True)
+
+    def desenhar(self, texto):
+        # Texto já renderizado (com códigos ANSI), escrito de uma vez
+        console.file.write(texto)
+        console.file.flush()
+
+    def esperar(self, segundos):
+        time.sleep(segundos)
+
+    def limpar(self):
+        os.system('cls' if os.name == 'nt' else 'clear')
+
+class TerminalRapido(Terminal):
+    """Terminal interativo sem as pausas entre as mensagens."""
+    def esperar(self, segundos):
+        pass
 
 # --- Classes do Jogo ---
 
@@ -59,13 +115,14 @@ class Jogador:
         self.tem_mapa = False
         self.tem_cabana = False
 
+    @Instrumentacao.medido
     def andar(self):
-        print("Qual direção pretende seguir?")
-        print("[1] Norte (Cima)")
-        print("[2] Sul (Baixo)")
-        print("[3] Leste (Direita)")
-        print("[4] Oeste (Esquerda)")
-        print("[5] Voltar")
+        self.jogo.escrever("Qual direção pretende seguir?")
+        self.jogo.escrever("[1] Norte (Cima)")
+        self.jogo.escrever("[2] Sul (Baixo)")
+        self.jogo.escrever("[3] Leste (Direita)")
+        self.jogo.escrever("[4] Oeste (Esquerda)")
+        self.jogo.escrever("[5] Voltar")
 
         direcao_map = {1: (-1, 0), 2: (1, 0), 3: (0, 1), 4: (0, -1)}
         escolha = self.jogo.verifica_escolha(1, 5)
@@ -80,33 +137,42 @@ class Jogador:
 
         if nova_pos in self.jogo.mapa:
             self.terreno_atual = self.jogo.mapa[nova_pos]
-            custo_energia = round(self.terreno_atual.tempo_travessia * 4.5)
+            config = self.jogo.config
+            custo_energia = round(self.terreno_atual.tempo_travessia * config.energia_andar)
             self.energia -= custo_energia
-            self.fome -= round(custo_energia / 2)
+            self.fome -= round(custo_energia * config.fome_andar)
             self.jogo.passar_horas(self.terreno_atual.tempo_travessia)
             self.jogo.mensagem = f"Você chegou em: {self.terreno_atual.tipo}."
+            if self.jogo.mundo is not None:
+                # Gera os chunks em volta antes que o jogador chegue neles
+                self.jogo.mundo.preparar(nova_pos)
+            self.jogo.revelar(RAIO_VISAO)
         else:
-            print("Você não pode seguir por essa direção. Há um limite na floresta.")
-            time.sleep(1)
+            self.jogo.escrever("Você não pode seguir por essa direção. Há um limite na floresta.")
+            self.jogo.esperar(1)
 
+    @Instrumentacao.medido
     def explorar(self):
-        print(f"Explorando {self.terreno_atual.tipo}...")
-        time.sleep(1)
-        self.energia -= round(self.terreno_atual.tempo_travessia * 5)
-        self.fome -= round(self.terreno_atual.tempo_travessia * 2)
+        self.jogo.escrever(f"Explorando {self.terreno_atual.tipo}...")
+        self.jogo.esperar(1)
+        self.energia -= round(self.terreno_atual.tempo_travessia * self.jogo.config.energia_explorar)
+        self.fome -= round(self.terreno_atual.tempo_travessia * self.jogo.config.fome_explorar)
 
         recursos_encontrados = False
-        # A classe Terreno está em GeradorMapa, então usamos os recursos de lá
-        for recurso, valor in self.terreno_atual.recursos.items():
+        # A classe Terreno está em GeradorMapa, então usamos os recursos de lá.
+        # O que for colhido volta a crescer com o passar das horas
+        for recurso, valor in self.terreno_atual.colher().items():
             if valor > 0:
                 recursos_encontrados = True
-                print(f"  - {valor}x {recurso}")
+                self.jogo.escrever(f"  - {valor}x {recurso}")
                 if recurso not in ["Animais", "Água"]:
                     self.mochila[recurso] = self.mochila.get(recurso, 0) + valor
-                self.terreno_atual.recursos[recurso] = 0
         
         if not recursos_encontrados:
-            print("Você não encontrou nada de novo aqui.")
+            self.jogo.escrever("Você não encontrou nada de novo aqui.")
+
+        self.jogo.renderizador.marcar(self.terreno_atual.posicao)
+        self.jogo.revelar(RAIO_EXPLORAR)
 
         if self.terreno_atual.tipo == "Caverna" and not self.tem_mapa:
             self.tem_mapa = True
@@ -115,37 +181,39 @@ class Jogador:
         
         self.jogo.passar_horas(self.terreno_atual.tempo_travessia)
 
+    @Instrumentacao.medido
     def alimentar(self):
         if not "Comida" in self.mochila.keys():
-            print("Você não tem nada para comer.")
-            time.sleep(1)
+            self.jogo.escrever("Você não tem nada para comer.")
+            self.jogo.esperar(1)
             return
         else:
-            quantidade = int(input("Quanto você quer comer?"))
+            quantidade = self.jogo.ler_numero("Quanto você quer comer?")
             if quantidade > self.mochila["Comida"]:
-                print("Você não tem comida o suficiente pra isso!")
+                self.jogo.escrever("Você não tem comida o suficiente pra isso!")
             elif quantidade < 1:
-                print("Valor inválido!")
+                self.jogo.escrever("Valor inválido!")
             else:
                 self.mochila["Comida"] -= quantidade
                 self.fome = min(MAX_ATRIBUTOS, self.fome + (3 * quantidade))
                 self.jogo.mensagem = f"Você comeu e se sente um pouco melhor."
         
         # Chance de passar mal
-        chance = random.randint(1,6) * round(quantidade / 10)
+        chance = self.jogo.rng.randint(1,6) * round(quantidade / 10)
         if chance > 6 :
             self.vida -= (self.vida * 0.15)
             self.jogo.mensagem = f"A comida não lhe caiu bem! Você se sente enjoado e perdeu vida."
-            time.sleep(1)
+            self.jogo.esperar(1)
 
+    @Instrumentacao.medido
     def construir_cabana(self):
         if self.terreno_atual.tipo not in ["Planície", "Floresta", "Rio"]:
-            print("Você só pode construir uma cabana em um terreno plano e seguro (Planície, Floresta ou Rio).")
-            time.sleep(1)
+            self.jogo.escrever("Você só pode construir uma cabana em um terreno plano e seguro (Planície, Floresta ou Rio).")
+            self.jogo.esperar(1)
             return
 
-        madeira_necessaria = CUSTO_CABANA["Madeira"]
-        pedra_necessaria = CUSTO_CABANA["Pedra"]
+        madeira_necessaria = self.jogo.config.custo_cabana["Madeira"]
+        pedra_necessaria = self.jogo.config.custo_cabana["Pedra"]
         madeira_atual = self.mochila.get("Madeira", 0)
         pedra_atual = self.mochila.get("Pedra", 0)
 
@@ -158,102 +226,123 @@ class Jogador:
             self.jogo.passar_horas(8)
             self.jogo.mensagem = "Com muito esforço, você constrói uma cabana! Agora tem um lugar seguro para descansar."
         else:
-            print("Você não tem recursos suficientes para construir uma cabana.")
-            print(f"Falta: {max(0, madeira_necessaria - madeira_atual)} Madeira, {max(0, pedra_necessaria - pedra_atual)} Pedra")
-            time.sleep(2)
+            self.jogo.escrever("Você não tem recursos suficientes para construir uma cabana.")
+            self.jogo.escrever(f"Falta: {max(0, madeira_necessaria - madeira_atual)} Madeira, {max(0, pedra_necessaria - pedra_atual)} Pedra")
+            self.jogo.esperar(2)
 
+    @Instrumentacao.medido
     def descansar(self):
-        print("Quanto tempo quer descansar (1-8 horas)?")
+        self.jogo.escrever("Quanto tempo quer descansar (1-8 horas)?")
         tempo_descanso = self.jogo.verifica_escolha(1, 8, "Você não pode descansar mais que 8 horas!")
         
-        if not self.tem_cabana and self.terreno_atual.tipo != "Caverna" and (random.randint(1, 10) * round(tempo_descanso / 10)) > 8:
-            print("Um som te acorda! Você foi atacado por um animal enquanto dormia!")
-            self.vida -= random.randint(30, 70)
-            time.sleep(1)
+        if not self.tem_cabana and self.terreno_atual.tipo != "Caverna" and (self.jogo.rng.randint(1, 10) * round(tempo_descanso / 10)) > 8:
+            self.jogo.escrever("Um som te acorda! Você foi atacado por um animal enquanto dormia!")
+            self.vida -= self.jogo.rng.randint(30, 70)
+            self.jogo.esperar(1)
             if self.vida <= 0:
                 self.jogo.game_over("Você não sobreviveu ao ataque...")
             return
 
         if self.tem_cabana:
-            print("Você descansa seguro em sua cabana.")
+            self.jogo.escrever("Você descansa seguro em sua cabana.")
 
-        print(f"Você descansou por {tempo_descanso} hora(s).")
+        self.jogo.escrever(f"Você descansou por {tempo_descanso} hora(s).")
         self.energia = min(MAX_ATRIBUTOS, self.energia + tempo_descanso * 10)
         self.fome = max(0, self.fome - tempo_descanso * 2)
         self.vida = min(MAX_ATRIBUTOS, self.vida + tempo_descanso * 2)
         self.jogo.passar_horas(tempo_descanso)
 
+    @Instrumentacao.medido
     def construir_pa(self):
-        print(f"Construindo Pá... (Custo: {CUSTO_PA['Madeira']} Madeira, {CUSTO_PA['Pedra']} Pedra)")
-        time.sleep(1)
-        if self.mochila.get("Madeira", 0) >= CUSTO_PA['Madeira'] and self.mochila.get("Pedra", 0) >= CUSTO_PA['Pedra']:
-            self.mochila["Madeira"] -= CUSTO_PA['Madeira']
-            self.mochila["Pedra"] -= CUSTO_PA['Pedra']
+        custo_pa = self.jogo.config.custo_pa
+        self.jogo.escrever(f"Construindo Pá... (Custo: {custo_pa['Madeira']} Madeira, {custo_pa['Pedra']} Pedra)")
+        self.jogo.esperar(1)
+        if self.mochila.get("Madeira", 0) >= custo_pa['Madeira'] and self.mochila.get("Pedra", 0) >= custo_pa['Pedra']:
+            self.mochila["Madeira"] -= custo_pa['Madeira']
+            self.mochila["Pedra"] -= custo_pa['Pedra']
             self.mochila["Pá"] = 1
             self.energia -= 15
             self.fome -= 5
             self.jogo.passar_horas(2)
-            print("Você construiu uma Pá com sucesso!")
+            self.jogo.escrever("Você construiu uma Pá com sucesso!")
         else:
-            print("Você não tem recursos suficientes.")
+            self.jogo.escrever("Você não tem recursos suficientes.")
     
+    @Instrumentacao.medido
     def cavar(self):
-        print("Você usa a pá e começa a cavar na terra fofa...")
+        self.jogo.escrever("Você usa a pá e começa a cavar na terra fofa...")
         self.energia -= 25
         self.fome -= 10
         self.jogo.passar_horas(3)
-        time.sleep(2)
-        if terreno_atual.saida == True:
-            print("Após algum esforço, sua pá atinge algo metálico. É uma escotilha!")
-            time.sleep(2)
-            print("Você abre a escotilha e encontra um portal brilhante. Sem hesitar, você pula.")
-            time.sleep(2)
+        self.jogo.esperar(2)
+        if self.terreno_atual.saida == True:
+            self.jogo.escrever("Após algum esforço, sua pá atinge algo metálico. É uma escotilha!")
+            self.jogo.esperar(2)
+            self.jogo.escrever("Você abre a escotilha e encontra um portal brilhante. Sem hesitar, você pula.")
+            self.jogo.esperar(2)
             self.jogo.vitoria()
         else:
-            print("Você cava mas não encontra nada! Parabéns...")
+            self.jogo.escrever("Você cava mas não encontra nada! Parabéns...")
             return
 
+    @Instrumentacao.medido
     def abrir_mochila(self):
-        print("\n--- Mochila ---")
+        self.jogo.escrever("\n--- Mochila ---")
         if not self.mochila:
-            print("Sua mochila está vazia.")
+            self.jogo.escrever("Sua mochila está vazia.")
         else:
             for item, quantidade in self.mochila.items():
                 if quantidade > 0:
-                    print(f"- {item}: {quantidade}")
-        print("---------------")
-        input("Pressione Enter para voltar...")
+                    self.jogo.escrever(f"- {item}: {quantidade}")
+        self.jogo.escrever("---------------")
+        self.jogo.ler("Pressione Enter para voltar...")
 
+    @Instrumentacao.medido
     def ver_mapa(self):
         if self.tem_mapa:
-            print(f"O mapa revela que a saída está nas coordenadas: X={self.jogo.saida_pos[0]}, Y={self.jogo.saida_pos[1]}")
-            GeradorMapa.imprimir_mapa_texto_com_grade_e_cores(self.jogo.mapa, 9, 9, 5)
-            input("Pressione Enter para voltar...")
+            self.jogo.escrever(f"O mapa revela que a saída está nas coordenadas: X={self.jogo.saida_pos[0]}, Y={self.jogo.saida_pos[1]}")
+            renderizador = self.jogo.renderizador
+            if self.jogo.mundo is None:
+                # Mapas grandes mostram uma janela em volta do jogador e o minimapa
+                posicao = self.terreno_atual.posicao
+                origem, largura, altura = renderizador.janela(posicao)
+                texto = renderizador.quadro(origem, largura, altura)
+                if (largura, altura) != (self.jogo.largura, self.jogo.altura):
+                    texto += renderizador.minimapa(destaque=posicao)
+            else:
+                # No mundo infinito o mapa mostra o chunk onde fica a saída
+                mundo = self.jogo.mundo
+                origem = (mundo.chunk_saida[0] * mundo.tamanho_chunk, mundo.chunk_saida[1] * mundo.tamanho_chunk)
+                texto = renderizador.quadro(origem, mundo.tamanho_chunk, mundo.tamanho_chunk)
+            self.jogo.desenhar(texto)
+            self.jogo.escrever(f"Rota até a saída: {self.jogo.dica_saida()}")
+            self.jogo.ler("Pressione Enter para voltar...")
         else:
-            print("Você não tem um mapa.")
+            self.jogo.escrever("Você não tem um mapa.")
 
+    @Instrumentacao.medido
     def verificar_status(self):
         if self.energia <= 0:
-            print("Você desmaiou de cansaço!")
-            time.sleep(1)
+            self.jogo.escrever("Você desmaiou de cansaço!")
+            self.jogo.esperar(1)
             self.energia = 0
             if self.terreno_atual.tipo == "Caverna" or self.tem_cabana:
-                print("Você desmaiou em um lugar seguro que te protegeu enquanto você estava desacordado.")
+                self.jogo.escrever("Você desmaiou em um lugar seguro que te protegeu enquanto você estava desacordado.")
                 self.energia += 40
                 self.jogo.passar_horas(8)
             else:
-                if random.randint(1, 4) == 1:
+                if self.jogo.rng.randint(1, 4) == 1:
                     self.jogo.game_over("Animais selvagens te encontraram enquanto você estava vulnerável.")
                 else:
-                    print("Por sorte, nada aconteceu. Você acorda se sentindo fraco.")
+                    self.jogo.escrever("Por sorte, nada aconteceu. Você acorda se sentindo fraco.")
                     self.energia += 30
                     self.jogo.passar_horas(8)
         elif self.energia <= 30:
-            print("\nCuidado sua energia está baixa!")
-            time.sleep(2)
+            self.jogo.escrever("\nCuidado sua energia está baixa!")
+            self.jogo.esperar(2)
         
         if self.fome <= 0:
-            print("Você está morrendo de fome! Sua vida está diminuindo...")
+            self.jogo.escrever("Você está morrendo de fome! Sua vida está diminuindo...")
             self.fome = 0
             self.vida -= 15
         
@@ -265,86 +354,272 @@ class Jogador:
 
 class Partida:
     """Controla o fluxo da partida, eventos, e o estado do jogo."""
-    def __init__(self, player):
-        self.dia = 1
-        self.hora = 6
+    def __init__(self, player, terminal=None, salvar=True, mundo=None, seed=None, mapa=None,
+                 estrategia=GeradorMapa.ESTRATEGIA_PADRAO, config=Balanceamento.PADRAO):
         self.player = player
+        self.player.jogo = self
         self.mensagem = MSG_INICIAL
+        self.terminal = terminal or Terminal()
+        self.salvar = salvar # Desligado nas simulações, que tratam o resultado por conta própria
+        self.resultado = None
+        # Tudo o que foi respondido a ler(), em ordem: com a seed, refaz a partida
+        # (None quando o começo da partida não é conhecido)
+        self.trilha = []
+
+        # Cada partida tem o próprio gerador aleatório: a mesma seed gera o mesmo
+        # mapa e os mesmos sorteios, mesmo com várias partidas no mesmo processo
+        self.seed = random.getrandbits(63) if seed is None else seed # Cabe no INTEGER do SQLite
+        self.rng = random.Random(self.seed)
+        # Custos, gastos e taxas do jogo (ver Balanceamento)
+        self.config = config
         
         # Aqui é a mágica: chamamos a função do outro arquivo para obter o mapa
-        self.mapa, self.saida_pos = GeradorMapa.gerar_mapa(GeradorMapa.MAPA_LARGURA, GeradorMapa.MAPA_ALTURA)
+        # (ou usamos um Mundo infinito, gerado aos poucos em chunks). `mapa` é um
+        # (grade, saida_pos) já pronto, como os do PoolMapas, feito com gerador_mapa(seed),
+        # a mesma `estrategia` (ver GeradorMapa.ESTRATEGIAS) e os recursos base da `config`
+        self.mundo = mundo
+        self.estrategia = estrategia
+        if mapa is not None:
+            self.mapa, self.saida_pos = mapa
+            self.largura, self.altura = self.mapa.largura, self.mapa.altura
+        elif mundo is None:
+            self.largura, self.altura = GeradorMapa.MAPA_LARGURA, GeradorMapa.MAPA_ALTURA
+            self.mapa, self.saida_pos = GeradorMapa.gerar_mapa(self.largura, self.altura, gerador_mapa(self.seed),
+                                                                self.estrategia, self.config.recursos_base)
+        else:
+            self.largura = self.altura = mundo.tamanho_chunk
+            self.mapa, self.saida_pos = mundo, mundo.saida_pos
         
         # Define a posição inicial do jogador
         while True:
-            start_pos = (random.randint(0, GeradorMapa.MAPA_LARGURA - 1), random.randint(0, GeradorMapa.MAPA_ALTURA - 1))
+            start_pos = (self.rng.randint(0, self.largura - 1), self.rng.randint(0, self.altura - 1))
+            Instrumentacao.contar("Partida.tentativas_inicio")
             if self.mapa[start_pos].tipo in ["Planície", "Floresta"]:
                 self.player.terreno_atual = self.mapa[start_pos]
                 break
+        if self.mundo is not None:
+            self.mundo.preparar(start_pos)
+
+        # O relógio: virada do dia, fome e eventos aleatórios ficam agendados.
+        # O mapa consulta o relógio para saber quanto os recursos já cresceram
+        self.iniciar_agenda(HORA_INICIAL)
+        self.mapa.relogio = lambda: self.agenda.agora
+
+        # Células já vistas pelo jogador: o mapa só mostra essas (e a saída)
+        self.neblina = Neblina(None if self.mundo is not None else (self.mapa.origem, self.largura, self.altura))
+        self.renderizador = RenderizadorMapa(self.mapa, neblina=self.neblina)
+        self.revelar(RAIO_VISAO)
+
+        # Campos de distância até a saída, calculados na primeira consulta
+        self.rotas = Caminhos.Rotas(self.mapa, self.saida_pos) if self.mundo is None else None
     
+    # --- Salvar e continuar ---
+
+    def instantaneo(self):
+        """Bytes com o estado da partida e do jogador, para continuar depois com restaurar()."""
+        if self.mundo is not None:
+            raise ValueError("Só partidas no mapa fixo podem ser salvas.")
+        estado = {
+            "seed": self.seed, "vida": self.player.vida, "energia": self.player.energia, "fome": self.player.fome,
+            "dia": self.dia, "hora": self.hora, "proximo_evento": self.proximo_evento.tempo,
+            "posicao": self.player.terreno_atual.posicao,
+            "tem_mapa": self.player.tem_mapa, "tem_cabana": self.player.tem_cabana,
+            "mochila": self.player.mochila, "mensagem": self.mensagem, "rng": self.rng.getstate(),
+            "trilha": self.trilha, "estrategia": self.estrategia, "neblina": self.neblina.blocos,
+            "config": self.config.como_dict(),
+        }
+        return Salvamento.empacotar_partida(estado, self.mapa, self.saida_pos)
+
+    @classmethod
+    def restaurar(cls, dados, terminal=None, salvar=True, config=None):
+        """Partida (com um Jogador novo) no ponto em que instantaneo() foi chamado.
+
+        Sem `config`, a partida continua com a configuração salva com ela.
+        """
+        estado, grade, saida_pos = Salvamento.desempacotar_partida(dados)
+        if config is None:
+            config = Balanceamento.Configuracao(**estado["config"])
+        if config.recursos_base is not GeradorMapa.RECURSOS_BASE:
+            grade.taxa_regeneracao = config.recursos_base / GeradorMapa.HORAS_REGENERACAO
+        player = Jogador(vida=estado["vida"], energia=estado["energia"], fome=estado["fome"])
+        partida = cls(player, terminal=terminal, salvar=salvar, seed=estado["seed"], mapa=(grade, saida_pos),
+                      estrategia=estado["estrategia"], config=config)
+        partida.mensagem = estado["mensagem"]
+        partida.rng.setstate(estado["rng"])
+        partida.iniciar_agenda((estado["dia"] - 1) * 24 + estado["hora"], estado["proximo_evento"])
+        player.terreno_atual = grade[estado["posicao"]]
+        player.mochila = estado["mochila"]
+        player.tem_mapa, player.tem_cabana = estado["tem_mapa"], estado["tem_cabana"]
+        partida.trilha = estado["trilha"]
+        partida.neblina = Neblina(partida.neblina.limites, estado["neblina"])
+        partida.renderizador = RenderizadorMapa(grade, neblina=partida.neblina)
+        partida.revelar(RAIO_VISAO)
+        return partida
+
+    def salvar_jogo(self, caminho):
+        with open(caminho, "wb") as f:
+            f.write(self.instantaneo())
+
+    @classmethod
+    def carregar_jogo(cls, caminho, terminal=None, salvar=True, config=None):
+        with open(caminho, "rb") as f:
+            # bytearray: a grade fica sobre o próprio buffer, que precisa ser gravável
+            return cls.restaurar(bytearray(f.read()), terminal, salvar, config)
+
+    # --- Desfazer um turno ---
+
+    def marcar(self):
+        """Estado da partida agora, para desfazer com voltar() o que vier depois.
+
+        Guarda só o que um turno muda (jogador, relógio, sorteios, trilha,
+        neblina e as coletas e marcas das células), sem serializar a partida
+        como instantaneo(). A Sessao usa para refazer um turno.
+        """
+        if self.mundo is not None:
+            raise ValueError("Só partidas no mapa fixo podem ser desfeitas.")
+        player = self.player
+        return {
+            "jogador": (player.vida, player.energia, player.fome, dict(player.mochila), player.terreno_atual,
+                        player.tem_mapa, player.tem_cabana),
+            "mensagem": self.mensagem, "resultado": self.resultado, "trilha": len(self.trilha),
+            "rng": self.rng.getstate(), "agenda": self.agenda.marcar(), "proximo_evento": self.proximo_evento,
+            "neblina": self.neblina.marcar(),
+            "grade": (self.mapa.recursos.copy(), self.mapa.flags.copy(), self.mapa.colhido.copy()),
+        }
+
+    def voltar(self, marca):
+        """Volta a partida ao ponto de marcar(); a mesma marca pode ser usada mais de uma vez."""
+        player = self.player
+        (player.vida, player.energia, player.fome, mochila, player.terreno_atual,
+         player.tem_mapa, player.tem_cabana) = marca["jogador"]
+        player.mochila = dict(mochila)
+        self.mensagem, self.resultado = marca["mensagem"], marca["resultado"]
+        del self.trilha[marca["trilha"]:]
+        self.rng.setstate(marca["rng"])
+        self.agenda.voltar(marca["agenda"])
+        self.proximo_evento = marca["proximo_evento"]
+        recursos, flags, colhido = marca["grade"]
+        self.mapa.recursos[...] = recursos
+        self.mapa.flags[...] = flags
+        self.mapa.colhido[...] = colhido
+        vistas = self.neblina.vistas
+        self.neblina.voltar(marca["neblina"])
+        if self.neblina.vistas != vistas:
+            self.renderizador.marcar_tudo() # Células reveladas no que foi desfeito voltam à neblina
+
+    def turno(self):
+        """Uma volta do loop principal: verifica o status, mostra o menu e executa a escolha."""
+        self.player.verificar_status()
+        self.hud()
+        self.escrever("\n" + "."*20 + "\n")
+        self.esperar(1)
+
     def hud(self):
         if self.mensagem:
-            console.print(f"[italic yellow]{self.mensagem}[/italic yellow]\n")
+            self.destacar(f"[italic yellow]{self.mensagem}[/italic yellow]\n")
             self.mensagem = ""
-            time.sleep(1)
+            self.esperar(1)
 
         vida_cor = "green" if self.player.vida > 30 else "red"
         energia_cor = "green" if self.player.energia > 30 else "yellow"
         fome_cor = "green" if self.player.fome > 30 else "yellow"
 
-        console.print(f"Dia: {self.dia} | Hora: {self.hora:02d}:00")
-        console.print(f"Vida: [{vida_cor}]{self.player.vida}/{MAX_ATRIBUTOS}[/{vida_cor}] | "
+        self.destacar(f"Dia: {self.dia} | Hora: {self.hora:02d}:00")
+        self.destacar(f"Vida: [{vida_cor}]{self.player.vida}/{MAX_ATRIBUTOS}[/{vida_cor}] | "
                       f"Energia: [{energia_cor}]{self.player.energia}/{MAX_ATRIBUTOS}[/{energia_cor}] | "
                       f"Fome: [{fome_cor}]{self.player.fome}/{MAX_ATRIBUTOS}[/{fome_cor}]")
         
         pos = self.player.terreno_atual.posicao
         terreno_tipo = self.player.terreno_atual.tipo
         terreno_cor = GeradorMapa.CORES_TERRENO.get(terreno_tipo, "white")
-        console.print(f"Local: [{terreno_cor}]{terreno_tipo}[/{terreno_cor}] | Coordenadas: X:{pos[0]} Y:{pos[1]}\n")
+        if self.mundo is None:
+            explorado = f"Explorado: {self.neblina.fracao_explorada():.1%}"
+        else:
+            explorado = f"Células vistas: {self.neblina.vistas}"
+        self.destacar(f"Local: [{terreno_cor}]{terreno_tipo}[/{terreno_cor}] | Coordenadas: X:{pos[0]} Y:{pos[1]} | {explorado}\n")
 
         # Menu de Ações
-        acoes = {
-            '1': {'texto': 'Andar', 'acao': self.player.andar},
-            '2': {'texto': 'Explorar Terreno', 'acao': self.player.explorar},
-            '3': {'texto': 'Descansar', 'acao': self.player.descansar},
-            '4': {'texto': 'Abrir Mochila', 'acao': self.player.abrir_mochila},
-            '5': {'texto': 'Comer','acao': self.player.alimentar}
-        }
-        proximo_indice = 6
+        acoes = {}
+        for indice, (nome, texto, acao) in enumerate(self.acoes_disponiveis(), start=1):
+            acoes[str(indice)] = {'texto': texto, 'acao': acao}
+
+        for key, value in acoes.items():
+            self.escrever(f"[{key}] {value['texto']}")
+        
+        escolha = self.verifica_escolha(1, len(acoes))
+        acoes[str(escolha)]['acao']()
+
+    def acoes_disponiveis(self):
+        """Lista (nome, texto, ação) das ações do menu, na ordem em que aparecem."""
+        acoes = [
+            ('andar', 'Andar', self.player.andar),
+            ('explorar', 'Explorar Terreno', self.player.explorar),
+            ('descansar', 'Descansar', self.player.descansar),
+            ('abrir_mochila', 'Abrir Mochila', self.player.abrir_mochila),
+            ('comer', 'Comer', self.player.alimentar)
+        ]
 
         if not self.player.tem_cabana:
-            madeira_necessaria = CUSTO_CABANA["Madeira"]
-            pedra_necessaria = CUSTO_CABANA["Pedra"]
+            madeira_necessaria = self.config.custo_cabana["Madeira"]
+            pedra_necessaria = self.config.custo_cabana["Pedra"]
             madeira_atual = self.player.mochila.get("Madeira", 0)
             pedra_atual = self.player.mochila.get("Pedra", 0)
             
             texto_cabana = f"Construir Cabana ({madeira_atual}/{madeira_necessaria}M, {pedra_atual}/{pedra_necessaria}P)"
-            acoes[str(proximo_indice)] = {'texto': texto_cabana, 'acao': self.player.construir_cabana}
-            proximo_indice += 1
+            acoes.append(('construir_cabana', texto_cabana, self.player.construir_cabana))
             
         if "Pá" not in self.player.mochila:
-            acoes[str(proximo_indice)] = {'texto': f"Construir Pá ({CUSTO_PA['Madeira']}M, {CUSTO_PA['Pedra']}P)", 'acao': self.player.construir_pa}
-            proximo_indice += 1
+            acoes.append(('construir_pa', f"Construir Pá ({self.config.custo_pa['Madeira']}M, {self.config.custo_pa['Pedra']}P)", self.player.construir_pa))
         if self.player.tem_mapa:
-            acoes[str(proximo_indice)] = {'texto': 'Ver Posição da Saída', 'acao': self.player.ver_mapa}
-            proximo_indice += 1
+            acoes.append(('ver_mapa', 'Ver Posição da Saída', self.player.ver_mapa))
         if self.player.terreno_atual.posicao == self.saida_pos and "Pá" in self.player.mochila and self.player.tem_mapa:
-             acoes[str(proximo_indice)] = {'texto': 'CAVAR!', 'acao': self.player.cavar}
-        
-        for key, value in acoes.items():
-            print(f"[{key}] {value['texto']}")
-        
-        escolha = self.verifica_escolha(1, len(acoes))
-        acoes[str(escolha)]['acao']()
+            acoes.append(('cavar', 'CAVAR!', self.player.cavar))
+        return acoes
 
+    @Instrumentacao.medido
     def passar_horas(self, horas):
-        self.hora += horas
-        if self.hora >= 24:
-            self.hora -= 24
-            self.dia += 1
-            self.mensagem = f"Um novo dia começa. Já se passaram {self.dia} dias."
-        if random.randint(1, 10) == 1:
-            self.evento_aleatorio()
+        # Pula direto de um evento agendado para o próximo, sem andar hora a hora
+        self.agenda.avancar(horas)
+
+    # --- Relógio e eventos agendados ---
+
+    @property
+    def dia(self):
+        return int(self.agenda.agora // 24) + 1
+
+    @property
+    def hora(self):
+        return int(self.agenda.agora % 24)
 
+    def iniciar_agenda(self, agora, proximo_evento=None):
+        """Agenda nova a partir de `agora` (horas desde o início do dia 1) com os eventos fixos.
+
+        `proximo_evento` é o horário do próximo evento aleatório; sem ele, é sorteado.
+        """
+        self.agenda = Agenda.Agenda(agora)
+        self.agenda.agendar((agora // 24 + 1) * 24, self._novo_dia, "novo_dia")
+        self.agenda.agendar((agora // HORAS_DECAIMENTO + 1) * HORAS_DECAIMENTO, self._decair, "fome")
+        self._agendar_evento_aleatorio(proximo_evento)
+
+    def _novo_dia(self):
+        self.mensagem = f"Um novo dia começa. Já se passaram {self.dia} dias."
+        self.agenda.agendar_em(24, self._novo_dia, "novo_dia")
+
+    def _decair(self):
+        self.player.fome -= FOME_DECAIMENTO
+        self.agenda.agendar_em(HORAS_DECAIMENTO, self._decair, "fome")
+
+    def _agendar_evento_aleatorio(self, tempo=None):
+        # Processo de Poisson: o intervalo até o próximo evento é exponencial
+        if tempo is None:
+            tempo = self.agenda.agora + self.rng.expovariate(self.config.taxa_eventos)
+        self.proximo_evento = self.agenda.agendar(tempo, self._evento_agendado, "evento_aleatorio")
+
+    def _evento_agendado(self):
+        self._agendar_evento_aleatorio()
+        self.evento_aleatorio()
+
+    @Instrumentacao.medido
     def evento_aleatorio(self):
         eventos = [
             "Você escuta um som de disparo ao leste. Talvez seja melhor não ir pra lá por enquanto.",
@@ -352,93 +627,193 @@ class Partida:
             "Um barulho te assusta!.",
             "Você tropeça em uma raiz e cai. Por sorte, não se machucou, mas perdeu um pouco de energia."
         ]
-        evento_escolhido = random.choice(eventos)
-        console.print(f"\n[italic cyan]{evento_escolhido}[/italic cyan]")
+        evento_escolhido = self.rng.choice(eventos)
+        self.destacar(f"\n[italic cyan]{evento_escolhido}[/italic cyan]")
         if "tropeça" in evento_escolhido:
             self.player.energia -= 10
 
         elif "cogumelo" in evento_escolhido:
-            console.print(f"\n[italic cyan][1] Sim[/italic cyan]")
-            console.print(f"[italic cyan][2] Não[/italic cyan]")
-            console.print(f"[italic cyan]Deseja come-lo? [/italic cyan]")
-            choice = int(input(f""))
+            self.destacar(f"\n[italic cyan][1] Sim[/italic cyan]")
+            self.destacar(f"[italic cyan][2] Não[/italic cyan]")
+            self.destacar(f"[italic cyan]Deseja come-lo? [/italic cyan]")
+            choice = self.ler_numero()
             while choice < 1 or choice > 2:
-                console.print(f"\n[italic cyan]Escolha invalida![/italic cyan]")
-                choice = int(input(f""))
-            if choice == 1 and random.randint(1,2) > 1:
-                print("Você não sente nada demais...")
-                time.sleep(2)
+                self.destacar(f"\n[italic cyan]Escolha invalida![/italic cyan]")
+                choice = self.ler_numero()
+            if choice == 1 and self.rng.randint(1,2) > 1:
+                self.escrever("Você não sente nada demais...")
+                self.esperar(2)
                 self.game_over("Morto por cogumelo venenoso!")
             elif choice == 1:
-                print("Você recuperou todos os status ao máximo!")
+                self.escrever("Você recuperou todos os status ao máximo!")
                 self.player.energia = MAX_ATRIBUTOS
                 self.player.vida = MAX_ATRIBUTOS
                 self.player.fome = MAX_ATRIBUTOS
             else:
-                print("Você apenas deixa a planta do jeito que encontrou!")
+                self.escrever("Você apenas deixa a planta do jeito que encontrou!")
             
         elif "barulho" in evento_escolhido:
-            console.print(f"\n[italic cyan][1] Sim[/italic cyan]")
-            console.print(f"[italic cyan][2] Não[/italic cyan]")
-            console.print(f"[italic cyan]Deseja investigar o barulho?[/italic cyan]")
-            choice = int(input(f""))
+            self.destacar(f"\n[italic cyan][1] Sim[/italic cyan]")
+            self.destacar(f"[italic cyan][2] Não[/italic cyan]")
+            self.destacar(f"[italic cyan]Deseja investigar o barulho?[/italic cyan]")
+            choice = self.ler_numero()
             while choice < 1 or choice > 2:
-                console.print(f"[italic cyan]Escolha invalida![/italic cyan]")
-                choice = int(input(f""))
+                self.destacar(f"[italic cyan]Escolha invalida![/italic cyan]")
+                choice = self.ler_numero()
             if choice == 1:
-                console.print(f"[italic cyan]Era apenas um siri fazendo barra. Você fica feliz por ve-lo dedicado ao exercicio[/italic cyan]")
-                console.print(f"\n[italic cyan][1] Sim[/italic cyan]")
-                console.print(f"[italic cyan][2] Não[/italic cyan]")
-                console.print(f"[italic cyan]Assustar o siri?[/italic cyan]")
-                choice = int(input(""))
+                self.destacar(f"[italic cyan]Era apenas um siri fazendo barra. Você fica feliz por ve-lo dedicado ao exercicio[/italic cyan]")
+                self.destacar(f"\n[italic cyan][1] Sim[/italic cyan]")
+                self.destacar(f"[italic cyan][2] Não[/italic cyan]")
+                self.destacar(f"[italic cyan]Assustar o siri?[/italic cyan]")
+                choice = self.ler_numero()
                 while choice < 1 or choice > 2:
-                    console.print(f"\n[italic cyan]Escolha invalida![/italic cyan]")
-                    choice = int(input(f""))
+                    self.destacar(f"\n[italic cyan]Escolha invalida![/italic cyan]")
+                    choice = self.ler_numero()
                 if choice == 1:
                     self.game_over("Nunca assuste o siri...")
                 else:
-                   console.print(f"\n[italic cyan]Você apenas o deixa continuar a barra normal![/italic cyan]")
+                   self.destacar(f"\n[italic cyan]Você apenas o deixa continuar a barra normal![/italic cyan]")
 
-        time.sleep(2)
+        self.esperar(2)
 
-    def verifica_escolha(self, low, upper, display="Opção inválida."):
+    def ler_numero(self, prompt=""):
+        """Lê um inteiro, perguntando de novo enquanto a resposta não for um número."""
         while True:
             try:
-                escolha = int(input("\nSua escolha: "))
-                if low <= escolha <= upper:
-                    return escolha
-                else:
-                    print(display)
+                return int(self.ler(prompt))
             except ValueError:
-                print("Por favor, insira um número válido.")
+                self.escrever("Por favor, insira um número válido.")
+
+    def verifica_escolha(self, low, upper, display="Opção inválida."):
+        while True:
+            escolha = self.ler_numero("\nSua escolha: ")
+            if low <= escolha <= upper:
+                return escolha
+            self.escrever(display)
+
+    def revelar(self, raio):
+        """Marca como vistas as células a até `raio` do jogador; as que eram novas são redesenhadas."""
+        posicao = self.player.terreno_atual.posicao
+        if self.neblina.revelar(posicao, raio):
+            self.renderizador.marcar_area(posicao, raio)
+
+    def dica_saida(self):
+        """Direção e tempo de caminhada até a saída a partir da posição do jogador."""
+        posicao = self.player.terreno_atual.posicao
+        if self.rotas is not None:
+            return self.rotas.dica(posicao)
+        # No mundo infinito não há campo pré-calculado: busca A* limitada
+        rota = Caminhos.a_estrela(self.mapa, posicao, self.saida_pos)
+        if rota is None:
+            return "A saída está longe demais para traçar uma rota."
+        custo, caminho = rota
+        if len(caminho) == 1:
+            return "Você já está aqui."
+        passo = caminho[1]
+        direcao = Caminhos.NOMES_DIRECOES[(passo[0] - posicao[0], passo[1] - posicao[1])]
+        return f"Siga para o {direcao}. Faltam cerca de {custo} hora(s) de caminhada."
+
+    # --- Entrada e saída, delegadas ao terminal da partida ---
+
+    def escrever(self, texto=""):
+        self.terminal.escrever(texto)
+
+    def destacar(self, texto=""):
+        self.terminal.destacar(texto)
+
+    def ler(self, prompt=""):
+        resposta = self.terminal.ler(prompt)
+        self.trilha.append(resposta)
+        return resposta
+
+    def desenhar(self, texto):
+        self.terminal.desenhar(texto)
+
+    def esperar(self, segundos):
+        self.terminal.esperar(segundos)
 
     def game_over(self, motivo):
-        os.system('cls')
-        console.print("\n[bold red]VOCÊ PERDEU[/bold red]")
-        console.print(motivo)
-        console.print(f"Você sobreviveu por {self.dia} dia(s).")
-        salvar_resultado(self.player, self, status="derrota", motivo=motivo)
-        print("Arquivo JSON gerado!")
-        sys.exit()
+        self.terminal.limpar()
+        self.destacar("\n[bold red]VOCÊ PERDEU[/bold red]")
+        self.destacar(motivo)
+        self.destacar(f"Você sobreviveu por {self.dia} dia(s).")
+        self.destacar(f"[dim]Seed da partida: {self.seed}[/dim]")
+        self.encerrar("derrota", motivo)
     
     def vitoria(self):
-        os.system('cls')
-        console.print("\n[bold green]VOCÊ ESCAPOU![/bold green]")
-        console.print("Você emerge em um lugar familiar, a floresta ficou para trás.")
-        console.print(f"Você sobreviveu por {self.dia} dia(s) e encontrou o caminho de casa!")
-        salvar_resultado(self.player, self, status="vitória")
-        print("Arquivo JSON gerado!")
-        sys.exit()
+        self.terminal.limpar()
+        self.destacar("\n[bold green]VOCÊ ESCAPOU![/bold green]")
+        self.destacar("Você emerge em um lugar familiar, a floresta ficou para trás.")
+        self.destacar(f"Você sobreviveu por {self.dia} dia(s) e encontrou o caminho de casa!")
+        self.destacar(f"[dim]Seed da partida: {self.seed}[/dim]")
+        self.encerrar("vitória")
+
+    def encerrar(self, status, motivo=None):
+        """Registra o resultado e interrompe a partida com FimDeJogo."""
+        self.resultado = montar_resultado(self.player, self, status, motivo)
+        if self.salvar:
+            salvar_resultado(self.player, self, status, motivo)
+            self.escrever("Resultado salvo!")
+        raise FimDeJogo(self.resultado)
 
 # --- Loop Principal do Jogo ---
 
+def main():
+    import asyncio
+    import Sessao # Importado aqui porque a Sessao importa este módulo
+
+    parser = argparse.ArgumentParser(description="Jogo de sobrevivência na floresta.")
+    parser.add_argument("--mundo", action="store_true", help="joga num mundo infinito em vez do mapa 9x9")
+    parser.add_argument("--seed", type=int, default=None, help="repete o mapa e os sorteios de uma partida")
+    parser.add_argument("--continuar", metavar="ARQUIVO", default=None,
+                        help="continua a partida salva neste arquivo (Ctrl+C salva e sai)")
+    parser.add_argument("--estrategia", choices=sorted(GeradorMapa.ESTRATEGIAS), default=GeradorMapa.ESTRATEGIA_PADRAO,
+                        help="como o mapa fixo é gerado")
+    parser.add_argument("--rapido", action="store_true", help="sem as pausas entre as mensagens")
+    Instrumentacao.argumento_perfil(parser)
+    args = parser.parse_args()
+
+    if args.continuar and os.path.exists(args.continuar):
+        try:
+            JOGO = Partida.carregar_jogo(args.continuar)
+        except Salvamento.ErroSalvamento as erro:
+            sys.exit(f"Não foi possível continuar a partida de {args.continuar}: {erro}")
+    else:
+        SEED = random.getrandbits(63) if args.seed is None else args.seed
+        PLAYER = Jogador(vida=100, energia=100, fome=100)
+        MUNDO = Mundo(seed=SEED) if args.mundo else None
+        JOGO = Partida(PLAYER, terminal=TerminalRapido() if args.rapido else None, mundo=MUNDO, seed=SEED,
+                       estrategia=args.estrategia)
+
+    SESSAO = None
+    with Instrumentacao.perfil(args.perfil):
+        try:
+            if JOGO.mundo is None:
+                ritmo = Sessao.ritmo_rapido if args.rapido else Sessao.ritmo_humano
+                SESSAO = Sessao.Sessao(JOGO, Sessao.EntradaTeclado(), ritmo=ritmo)
+                asyncio.run(SESSAO.jogar())
+            else:
+                # O mundo infinito não tem instantâneo para desfazer um turno: loop síncrono
+                while True:
+                    JOGO.turno()
+        except FimDeJogo:
+            pass
+        except Salvamento.ErroSalvamento as erro:
+            # A Sessao tira um instantâneo por turno: sem ele o turno não pode ser desfeito
+            sys.exit(f"\nNão foi possível guardar o estado da partida: {erro}")
+        except (KeyboardInterrupt, EOFError):
+            if args.continuar and SESSAO is not None:
+                with open(args.continuar, "wb") as f:
+                    f.write(SESSAO.instantaneo())
+                print(f"\nPartida salva em {args.continuar}.")
+            sys.exit()
+
+    if args.continuar and os.path.exists(args.continuar):
+        os.remove(args.continuar) # A partida salva acabou
+    sys.exit()
+
 if __name__ == "__main__":
-    PLAYER = Jogador(vida=100, energia=100, fome=100)
-    JOGO = Partida(PLAYER)
-    PLAYER.jogo = JOGO
-
-    while True:
-        PLAYER.verificar_status()
-        JOGO.hud()
-        print("\n" + "."*20 + "\n")
-        time.sleep(1)
\ No newline at end of file
+    # Roda pelo módulo importado, e não pelo __main__, para que o jogo e a Sessao
+    # usem as mesmas classes (Partida, FimDeJogo)
+    import Forest
+    Forest.main()
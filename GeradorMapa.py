@@ -1,6 +1,12 @@
 import random
+from functools import lru_cache
+from collections.abc import Mapping, MutableMapping
+import numpy as np
 from rich.console import Console
-from rich.text import Text
+
+import Instrumentacao
+import Ruido
+import Hidrologia
 
 console = Console()
 
@@ -33,20 +39,27 @@ ABREVIACOES_TERRENO = {
 }
 
 class Terreno:
-    def __init__(self, posicao, tipo):
+    def __init__(self, posicao, tipo, rng=random):
         self.posicao = posicao
         self.tipo = tipo
-        self.recursos = self._gerar_recursos(self.tipo)
+        self.recursos = self._gerar_recursos(self.tipo, rng)
         self.cabana = False
         self.saida = False
         self.tempo_travessia = self._definir_tempo(self.tipo)
 
-    def _gerar_recursos(self, tipo_atual):
+    def _gerar_recursos(self, tipo_atual, rng=random):
         recursos_final = {}
         for recurso, valor_base in RECURSOS_TIPO[tipo_atual].items():
             # Gera recursos com alguma variação, de 1 a 3 vezes o valor base
-            recursos_final[recurso] = random.randint(1, 3) * valor_base
+            recursos_final[recurso] = rng.randint(1, 3) * valor_base
         return recursos_final
+
+    def colher(self):
+        # Terreno avulso não tem relógio: o que foi colhido não volta
+        colhidos = self.recursos.copy()
+        for recurso in self.recursos:
+            self.recursos[recurso] = 0
+        return colhidos
     
     def _definir_tempo(self, tipo):
         match tipo:
@@ -65,124 +78,462 @@ class Terreno:
     def get_cor(self):
         # Retorna a cor Rich para o tipo de terreno
         if self.saida == True:
-            return("orange")
+            return("orange1")
+        else:
+            return CORES_TERRENO.get(self.tipo, "white")
+
+# --- Grade compacta de terrenos ---
+# Os terrenos do mapa ficam em arrays contíguos (um byte por informação) em vez
+# de um objeto Terreno por célula. CelulaGrade dá acesso a uma célula com a
+# mesma interface de Terreno, lendo e escrevendo direto nos arrays.
+
+TIPOS_TERRENO = list(RECURSOS_TIPO) # O id do tipo é a posição nesta lista + 1; 0 é célula vazia
+ID_TIPO = {tipo: indice for indice, tipo in enumerate(TIPOS_TERRENO, start=1)}
+NOMES_RECURSOS = list(RECURSOS_TIPO["Floresta"])
+
+# Tabelas indexadas pelo id do tipo
+RECURSOS_BASE = np.array([[0] * len(NOMES_RECURSOS)] + [[RECURSOS_TIPO[tipo][recurso] for recurso in NOMES_RECURSOS] for tipo in TIPOS_TERRENO], dtype=np.uint8)
+HORAS_REGENERACAO = 72 # Horas para voltar a quantidade base de cada recurso depois de uma coleta
+TAXA_REGENERACAO = RECURSOS_BASE / HORAS_REGENERACAO # Unidades por hora, por tipo e recurso
+TEMPO_TIPO = np.array([0] + [Terreno._definir_tempo(None, tipo) for tipo in TIPOS_TERRENO], dtype=np.uint8)
+
+FLAG_CABANA = 1
+FLAG_SAIDA = 2
+
+class RecursosCelula(MutableMapping):
+    """Visão dos recursos de uma célula da grade, com a interface de um dicionário.
+
+    A leitura já considera o que voltou a crescer desde a última coleta
+    (Grade.recursos_atuais); a escrita muda a quantidade máxima da célula.
+    """
+    __slots__ = ("_grade", "_x", "_y")
+
+    def __init__(self, grade, x, y):
+        self._grade = grade
+        self._x = x
+        self._y = y
+
+    @property
+    def _valores(self):
+        return self._grade.recursos_atuais(self._x, self._y)
+
+    def __getitem__(self, recurso):
+        return int(self._valores[NOMES_RECURSOS.index(recurso)])
+
+    def __setitem__(self, recurso, valor):
+        self._grade.recursos[self._y, self._x, NOMES_RECURSOS.index(recurso)] = valor
+
+    def __delitem__(self, recurso):
+        raise TypeError("Os recursos de uma célula têm tipos fixos.")
+
+    def __iter__(self):
+        return iter(NOMES_RECURSOS)
+
+    def __len__(self):
+        return len(NOMES_RECURSOS)
+
+    def items(self):
+        return list(zip(NOMES_RECURSOS, self._valores.tolist()))
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.copy())
+
+class CelulaGrade:
+    """Visão de uma célula da Grade com a mesma interface de Terreno."""
+    __slots__ = ("grade", "x", "y")
+
+    def __init__(self, grade, x, y):
+        self.grade = grade
+        self.x = x # Índices locais nos arrays da grade
+        self.y = y
+
+    @property
+    def posicao(self):
+        return (self.x + self.grade.origem[0], self.y + self.grade.origem[1])
+
+    @property
+    def tipo(self):
+        return TIPOS_TERRENO[self.grade.tipos[self.y, self.x] - 1]
+
+    @property
+    def recursos(self):
+        return RecursosCelula(self.grade, self.x, self.y)
+
+    def colher(self):
+        """Recolhe tudo o que a célula tem agora; os recursos voltam a crescer com o tempo."""
+        return self.grade.colher(self.x, self.y)
+
+    @property
+    def tempo_travessia(self):
+        return int(self.grade.tempos[self.y, self.x])
+
+    @property
+    def cabana(self):
+        return bool(self.grade.flags[self.y, self.x] & FLAG_CABANA)
+
+    @cabana.setter
+    def cabana(self, valor):
+        self._marcar(FLAG_CABANA, valor)
+
+    @property
+    def saida(self):
+        return bool(self.grade.flags[self.y, self.x] & FLAG_SAIDA)
+
+    @saida.setter
+    def saida(self, valor):
+        self._marcar(FLAG_SAIDA, valor)
+
+    def _marcar(self, flag, valor):
+        if valor:
+            self.grade.flags[self.y, self.x] |= flag
+        else:
+            self.grade.flags[self.y, self.x] &= ~flag
+
+    def get_abreviacao(self):
+        return ABREVIACOES_TERRENO.get(self.tipo, "???")
+
+    def get_cor(self):
+        if self.saida == True:
+            return("orange1")
         else:
             return CORES_TERRENO.get(self.tipo, "white")
 
+    def __eq__(self, outra):
+        if not isinstance(outra, CelulaGrade):
+            return NotImplemented
+        return self.grade is outra.grade and self.x == outra.x and self.y == outra.y
+
+    def __hash__(self):
+        return hash((id(self.grade), self.x, self.y))
+
+    def __repr__(self):
+        return f"CelulaGrade({self.posicao}, {self.tipo!r})"
+
+class Grade(Mapping):
+    """Mapa de terrenos guardado em arrays NumPy, indexado por posição (x, y).
+
+    Funciona como o antigo dicionário posição -> Terreno: mapa[pos] devolve uma
+    CelulaGrade (ou None, se a célula ainda estiver vazia) e `pos in mapa` diz se
+    a posição está dentro do mapa. `origem` desloca as posições, para grades que
+    representam um pedaço de um mapa maior.
+    """
+    def __init__(self, largura, altura, origem=(0, 0)):
+        self.largura = largura
+        self.altura = altura
+        self.origem = origem
+        self.tipos = np.zeros((altura, largura), dtype=np.uint8)
+        self.tempos = np.zeros((altura, largura), dtype=np.uint8)
+        self.recursos = np.zeros((altura, largura, len(NOMES_RECURSOS)), dtype=np.uint8)
+        self.flags = np.zeros((altura, largura), dtype=np.uint8)
+        self.colhido = np.full((altura, largura), -np.inf, dtype=np.float32) # Hora da última coleta; -inf: nunca
+        self.relogio = None # Função que devolve a hora atual do jogo; sem ela, nada volta a crescer
+        self.taxa_regeneracao = TAXA_REGENERACAO # Da tabela de recursos base usada em gerar_recursos
+        self.versao = 0 # Muda a cada alteração de terreno, para invalidar caches
+
+    @classmethod
+    def de_arrays(cls, tipos, tempos, recursos, flags, origem=(0, 0), colhido=None):
+        """Cria uma grade sobre arrays já existentes, sem copiá-los."""
+        grade = cls.__new__(cls)
+        grade.altura, grade.largura = tipos.shape
+        grade.origem = origem
+        grade.tipos = tipos
+        grade.tempos = tempos
+        grade.recursos = recursos
+        grade.flags = flags
+        grade.colhido = np.full(tipos.shape, -np.inf, dtype=np.float32) if colhido is None else colhido
+        grade.relogio = None
+        grade.taxa_regeneracao = TAXA_REGENERACAO
+        grade.versao = 0
+        return grade
+
+    def _local(self, posicao):
+        x = posicao[0] - self.origem[0]
+        y = posicao[1] - self.origem[1]
+        if 0 <= x < self.largura and 0 <= y < self.altura:
+            return x, y
+        raise KeyError(posicao)
+
+    def __getitem__(self, posicao):
+        x, y = self._local(posicao)
+        if self.tipos[y, x] == 0:
+            return None
+        return CelulaGrade(self, x, y)
+
+    def __contains__(self, posicao):
+        x = posicao[0] - self.origem[0]
+        y = posicao[1] - self.origem[1]
+        return 0 <= x < self.largura and 0 <= y < self.altura
+
+    def __iter__(self):
+        ox, oy = self.origem
+        for y in range(self.altura):
+            for x in range(self.largura):
+                yield (x + ox, y + oy)
+
+    def __len__(self):
+        return self.largura * self.altura
+
+    def vizinhos(self, posicao):
+        """Posições vizinhas (4 direções) dentro da grade, pela tabela compartilhada."""
+        x, y = self._local(posicao)
+        vizinhos = vizinhanca(self.largura, self.altura)[(x, y)]
+        if self.origem == (0, 0):
+            return vizinhos
+        ox, oy = self.origem
+        return tuple((vx + ox, vy + oy) for vx, vy in vizinhos)
+
+    def vazio(self, posicao):
+        x, y = self._local(posicao)
+        return self.tipos[y, x] == 0
+
+    def definir(self, posicao, tipo):
+        """Coloca um terreno do tipo dado na posição (sem recursos; ver gerar_recursos)."""
+        x, y = self._local(posicao)
+        id_tipo = ID_TIPO[tipo]
+        self.tipos[y, x] = id_tipo
+        self.tempos[y, x] = TEMPO_TIPO[id_tipo]
+        self.versao += 1
+
+    def preencher_vazios(self, tipo):
+        """Coloca o tipo dado em todas as células ainda vazias."""
+        vazias = self.tipos == 0
+        self.tipos[vazias] = ID_TIPO[tipo]
+        self.tempos[vazias] = TEMPO_TIPO[ID_TIPO[tipo]]
+        self.versao += 1
+
+    def gerar_recursos(self, rng=random, recursos_base=RECURSOS_BASE):
+        """Sorteia os recursos de todas as células: de 1 a 3 vezes o valor base do tipo.
+
+        `recursos_base` é a tabela (id do tipo, recurso) dos valores base, como
+        RECURSOS_BASE; a regeneração da grade passa a seguir a mesma tabela.
+        """
+        gerador = np.random.default_rng(rng.getrandbits(64))
+        multiplicador = gerador.integers(1, 4, size=self.recursos.shape, dtype=np.uint8)
+        self.recursos[...] = multiplicador * recursos_base[self.tipos]
+        if recursos_base is not RECURSOS_BASE:
+            self.taxa_regeneracao = recursos_base / HORAS_REGENERACAO
+
+    # Regeneração: cada célula guarda só a hora da última coleta, e o que voltou a
+    # crescer é calculado na leitura. Avançar o relógio não custa nada.
+
+    def agora(self):
+        return self.relogio() if self.relogio is not None else 0
+
+    def recursos_atuais(self, x, y):
+        """Recursos da célula local (x, y) agora: o máximo, ou o que cresceu desde a coleta."""
+        maximo = self.recursos[y, x]
+        colhido = self.colhido[y, x]
+        if colhido == -np.inf:
+            return maximo
+        crescido = self.taxa_regeneracao[self.tipos[y, x]] * (self.agora() - colhido)
+        return np.minimum(maximo, crescido).astype(np.uint8)
+
+    def colher(self, x, y):
+        """Dicionário recurso -> quantidade recolhida da célula local (x, y), que fica vazia."""
+        atuais = self.recursos_atuais(x, y)
+        self.colhido[y, x] = self.agora()
+        return dict(zip(NOMES_RECURSOS, atuais.tolist()))
+
+    @property
+    def nbytes(self):
+        return self.tipos.nbytes + self.tempos.nbytes + self.recursos.nbytes + self.flags.nbytes + self.colhido.nbytes
+
 MAPA_LARGURA = 9 
 MAPA_ALTURA = 9
 LARGURA_CELULA = 5
 
-def get_vizinhos(posicao, largura, altura):
-    x,y = posicao
-    vizinhos = []
-    for tx,ty in [(1,0),(-1,0),(0,1),(0,-1)]:
-        vx,vy = x + tx, y+ty
-
-        if 0 <= vx < largura and 0 <= vy < altura:
-            vizinhos.append((vx,vy))
-    return vizinhos
-
-def gerar_mapa(largura,altura):
-    mapa = {}
+# Deslocamentos (dx, dy) dos vizinhos, nesta ordem; as diagonais vêm depois
+DESLOCAMENTOS_VIZINHOS = [(1,0),(-1,0),(0,1),(0,-1)]
+DESLOCAMENTOS_DIAGONAIS = [(1,1),(-1,1),(1,-1),(-1,-1)]
+
+class Vizinhanca:
+    """Vizinhos de todas as células de um mapa largura x altura, calculados uma vez.
+
+    Os vizinhos ficam no formato CSR: os da célula i = y * largura + x são
+    indices[inicio[i]:inicio[i + 1]]. vizinhanca[(x, y)] devolve a tupla de
+    posições vizinhas, montada na primeira consulta e guardada depois.
+    Com `circular`, o mapa dá a volta nas bordas.
+    """
+    def __init__(self, largura, altura, diagonais=False, circular=False):
+        if circular and (largura < 3 or altura < 3):
+            raise ValueError("Vizinhança circular precisa de pelo menos 3 células em cada direção.")
+        self.largura = largura
+        self.altura = altura
+        deslocamentos = DESLOCAMENTOS_VIZINHOS + (DESLOCAMENTOS_DIAGONAIS if diagonais else [])
+
+        ys, xs = np.divmod(np.arange(largura * altura, dtype=np.int64), largura)
+        candidatos = np.empty((largura * altura, len(deslocamentos)), dtype=np.int64)
+        validos = np.ones(candidatos.shape, dtype=bool)
+        for coluna, (dx, dy) in enumerate(deslocamentos):
+            vx, vy = xs + dx, ys + dy
+            if circular:
+                vx %= largura
+                vy %= altura
+            else:
+                validos[:, coluna] = (0 <= vx) & (vx < largura) & (0 <= vy) & (vy < altura)
+            candidatos[:, coluna] = vy * largura + vx
+
+        self.inicio = np.concatenate(([0], np.cumsum(validos.sum(axis=1))))
+        self.indices = candidatos[validos].astype(np.int32)
+        self._tuplas = [None] * (largura * altura)
+
+    def __getitem__(self, posicao):
+        x, y = posicao
+        indice = y * self.largura + x
+        tupla = self._tuplas[indice]
+        if tupla is None:
+            vizinhos = self.indices[self.inicio[indice]:self.inicio[indice + 1]].tolist()
+            tupla = tuple((v % self.largura, v // self.largura) for v in vizinhos)
+            self._tuplas[indice] = tupla
+        return tupla
+
+@lru_cache(maxsize=16)
+def vizinhanca(largura, altura, diagonais=False, circular=False):
+    """Tabela de vizinhos compartilhada para o tamanho de mapa dado."""
+    return Vizinhanca(largura, altura, diagonais, circular)
 
-    #Preecher posições do mapa com vazio
-    for y in range(altura):
-        for x in range(largura):
-            mapa[(x,y)] = None
+def get_vizinhos(posicao, largura, altura):
+    # Consulta a tabela pré-calculada do tamanho do mapa (devolve uma tupla)
+    return vizinhanca(largura, altura)[posicao]
+
+class ErroGeracao(Exception):
+    """O mapa não pode ser gerado (não há espaço para alguma etapa)."""
+
+def crescer_regiao(mapa, inicio, tipo, tamanho, rng=random):
+    """Cresce uma região do tipo a partir de `inicio`, uma célula vizinha por vez.
+
+    Mantém a fronteira (células livres vizinhas da região) explícita, então cada
+    célula entra nela no máximo uma vez e o custo é O(células) no pior caso. Se a
+    região ficar cercada antes do tamanho pedido, para com o que conseguiu.
+    Retorna (região, fronteira restante).
+    """
+    tabela = vizinhanca(mapa.largura, mapa.altura)
+    mapa.definir(inicio, tipo)
+    regiao = [inicio]
+    fronteira = []
+    vistos = {inicio}
+
+    def adicionar_vizinhos(posicao):
+        for vizinho in tabela[posicao]:
+            if vizinho not in vistos and mapa.vazio(vizinho):
+                vistos.add(vizinho)
+                fronteira.append(vizinho)
+
+    adicionar_vizinhos(inicio)
+    while len(regiao) < tamanho and fronteira:
+        # Sorteia e remove da fronteira em O(1): troca com o último e tira do fim
+        indice = rng.randrange(len(fronteira))
+        fronteira[indice], fronteira[-1] = fronteira[-1], fronteira[indice]
+        posicao = fronteira.pop()
+        mapa.definir(posicao, tipo)
+        regiao.append(posicao)
+        adicionar_vizinhos(posicao)
+    if len(regiao) < tamanho:
+        Instrumentacao.contar("crescer_regiao.cercadas")
+    return regiao, fronteira
+
+def tamanho_regiao(base, largura, altura):
+    """Células de uma região sorteada com `base` células no mapa 9x9, na proporção da área do mapa.
+
+    No 9x9 é o próprio `base`; num mapa maior a montanha e a planície ocupam a
+    mesma fração dele, em vez de sumirem na floresta. Aceita arrays (gerar_mapas).
+    """
+    escala = largura * altura / (MAPA_LARGURA * MAPA_ALTURA)
+    return np.maximum(1, np.round(np.asarray(base) * escala)).astype(np.int64)
+
+def gerar_mapa_caminhada(largura,altura,rng=random,recursos_base=RECURSOS_BASE):
+    # rng: o módulo random ou um random.Random próprio, para mapas reproduzíveis
+    # Todas as posições começam vazias
+    mapa = Grade(largura, altura)
+    fases = Instrumentacao.fases("gerar_mapa") # Tempo de cada etapa, quando medido
 
    #Gerar Montanha v
 #-----------------------------------------------------------------------------------------------------------------------------------------
-    montanha_y = (random.randint(0,1)) * (altura - 1)
-    montanha_x = (random.randint(0,1)) * (largura - 1)
-    mapa[(montanha_x,montanha_y)] = Terreno((montanha_x,montanha_y), "Montanha")
-
-    montanhas_totais = [(montanha_x, montanha_y)]
-    num_montanhas = random.randint(6,9)
-
-    while num_montanhas > len(montanhas_totais):
-        base_montanha = random.choice(montanhas_totais)
-        novas_montanhas = get_vizinhos(base_montanha, largura, altura)
-
-        for x,y in novas_montanhas:
-            if mapa[(x,y)] == None:
-                mapa[(x,y)] = Terreno((x,y), "Montanha")
-                montanhas_totais.append((x,y))
-                #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)
-                break
+    fases.proxima("montanha")
+    montanha_y = (rng.randint(0,1)) * (altura - 1)
+    montanha_x = (rng.randint(0,1)) * (largura - 1)
+    num_montanhas = int(tamanho_regiao(rng.randint(6,9), largura, altura))
+
+    montanhas_totais, bordas = crescer_regiao(mapa, (montanha_x, montanha_y), "Montanha", num_montanhas, rng)
     #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)
 #-----------------------------------------------------------------------------------------------------------------------------------------
     #Gerar Montanha ^
 
    #Gerar Cachoeira e Caverna v
 #-----------------------------------------------------------------------------------------------------------------------------------------
-    bordas = []
-    for x,y in montanhas_totais:
-        for vx,vy in get_vizinhos((x,y),largura,altura):
-            if mapa[(vx,vy)] is None:
-                bordas.append((vx,vy))
-    
-    pos_cachoeira = random.choice(bordas)
+    fases.proxima("cachoeira_caverna")
+    # As bordas são a fronteira que sobrou do crescimento da montanha (sem repetições)
+    if len(bordas) < 2:
+        fases.fim()
+        raise ErroGeracao("Não há espaço em volta da montanha para a cachoeira e a caverna.")
+
+    pos_cachoeira = rng.choice(bordas)
     bordas.remove(pos_cachoeira)
 
-    pos_caverna = random.choice(bordas)
+    pos_caverna = rng.choice(bordas)
 
-    mapa[pos_cachoeira] = Terreno(pos_cachoeira, "Cachoeira")
-    mapa[pos_caverna] = Terreno(pos_caverna, "Caverna")
+    mapa.definir(pos_cachoeira, "Cachoeira")
+    mapa.definir(pos_caverna, "Caverna")
     #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)
 #-----------------------------------------------------------------------------------------------------------------------------------------
     #Gerar Cachoeira e Caverna ^
 
    #Gerar Rio v
 #-----------------------------------------------------------------------------------------------------------------------------------------
+    fases.proxima("rio")
     direcoes_rio = {}
 
     for x, y in get_vizinhos(pos_cachoeira, largura, altura):
-        if mapa[(x, y)] is None:
+        if mapa.vazio((x, y)):
             dx = x - pos_cachoeira[0]
             dy = y - pos_cachoeira[1]
             direcoes_rio[(x, y)] = [0, (dx, dy)] 
 
             nx, ny = x, y
-            while 0 <= nx < largura and 0 <= ny < altura and mapa[(nx, ny)] is None:
+            while 0 <= nx < largura and 0 <= ny < altura and mapa.vazio((nx, ny)):
                 direcoes_rio[(x, y)][0] += 1
                 nx += dx
                 ny += dy
 
-    base_rio = max(direcoes_rio, key=direcoes_rio.get)
-    curva = random.randint(0,1)
-    direcao = direcoes_rio[base_rio][1]
-    num_rio = direcoes_rio[base_rio][0]
-    rios_totais = [base_rio]
-    mapa[base_rio] = Terreno(base_rio, "Rio")
-    min_rios = round(num_rio/2)
-
-    x, y = base_rio
-    dx, dy = direcao
-    print(dx,dy)
-    print(curva)
-
-    while len(rios_totais) < num_rio:
-        if len(rios_totais) >= min_rios:
-            if curva == 0:
-                oldx = dx
-                dx = dy
-                dy = oldx
-            elif curva == 1:
-                oldx = dx
-                dx = -dy
-                dy = -oldx
-            curva = 2
-        x += dx
-        y += dy
-        if not (0 <= x < largura and 0 <= y < altura):
-            break
-        elif curva == 2:
-            num_rio += 1
-        if mapa[(x, y)] is not None:
-            break
-        mapa[(x, y)] = Terreno((x, y), "Rio")
-        rios_totais.append((x, y))
+    # Cachoeira cercada por montanhas e pela caverna: o mapa fica sem rio
+    if direcoes_rio:
+        base_rio = max(direcoes_rio, key=direcoes_rio.get)
+        curva = rng.randint(0,1)
+        direcao = direcoes_rio[base_rio][1]
+        num_rio = direcoes_rio[base_rio][0]
+        rios_totais = [base_rio]
+        mapa.definir(base_rio, "Rio")
+        min_rios = round(num_rio/2)
+
+        x, y = base_rio
+        dx, dy = direcao
+
+        while len(rios_totais) < num_rio:
+            if len(rios_totais) >= min_rios:
+                if curva == 0:
+                    oldx = dx
+                    dx = dy
+                    dy = oldx
+                elif curva == 1:
+                    oldx = dx
+                    dx = -dy
+                    dy = -oldx
+                curva = 2
+            x += dx
+            y += dy
+            if not (0 <= x < largura and 0 <= y < altura):
+                break
+            elif curva == 2:
+                num_rio += 1
+            if not mapa.vazio((x, y)):
+                break
+            mapa.definir((x, y), "Rio")
+            rios_totais.append((x, y))
+    else:
+        Instrumentacao.contar("gerar_mapa.sem_rio")
 
 
     #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)
@@ -191,84 +542,299 @@ def gerar_mapa(largura,altura):
 
    #Gerar Planicie v
 #-----------------------------------------------------------------------------------------------------------------------------------------
-    while True:
-        planicie_y = (random.randint(0,8))
-        planicie_x = (random.randint(0,8))
-
-        if mapa[(planicie_x,planicie_y)] == None:
-            mapa[(planicie_x,planicie_y)] = Terreno((planicie_x,planicie_y), "Planície")
-            break
-        
-
-    planicies_totais = [(planicie_x, planicie_y)]
-    num_planicies = random.randint(9,14)
-
-    while num_planicies > len(planicies_totais):
-        base_planicie = random.choice(planicies_totais)
-        novas_planicies = get_vizinhos(base_planicie, largura, altura)
-
-        for x,y in novas_planicies:
-            if mapa[(x,y)] == None:
-                mapa[(x,y)] = Terreno((x,y), "Planície")
-                planicies_totais.append((x,y))
-                break
+    fases.proxima("planicie")
+    livres = np.argwhere(mapa.tipos == 0)
+    if len(livres) == 0:
+        fases.fim()
+        raise ErroGeracao("Não sobrou espaço livre para a planície.")
+    planicie_y, planicie_x = (int(v) for v in livres[rng.randrange(len(livres))])
+    num_planicies = int(tamanho_regiao(rng.randint(9,14), largura, altura))
+
+    planicies_totais, _ = crescer_regiao(mapa, (planicie_x, planicie_y), "Planície", num_planicies, rng)
     #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)
 #-----------------------------------------------------------------------------------------------------------------------------------------
     #Gerar Planicie ^
 
     # Gerar Floresta v
 #-----------------------------------------------------------------------------------------------------------------------------------------
-    for y in range(altura):
-        for x in range(largura):
-            if mapa[(x,y)] == None:
-                mapa[(x,y)] = Terreno((x,y), "Floresta")
+    fases.proxima("floresta")
+    mapa.preencher_vazios("Floresta")
+
+    # Recursos de todas as células sorteados de uma vez
+    mapa.gerar_recursos(rng, recursos_base)
     #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)
 #-----------------------------------------------------------------------------------------------------------------------------------------
     #Gerar Floresta ^
 
     #Gerar Saida v
 #-----------------------------------------------------------------------------------------------------------------------------------------
-    while True:
-        x = random.randint(0,8)
-        y = random.randint(0,8)
-        if mapa[(x,y)] not in ("Rio","Cachoeira","Caverna"):
-                mapa[(x,y)].saida = True
-                saida_pos = (x,y)
-                break
+    fases.proxima("saida")
+    saida_pos = colocar_saida(mapa, rng)
+    fases.fim()
     #imprimir_mapa_texto_com_grade_e_cores(mapa, MAPA_LARGURA, MAPA_ALTURA, LARGURA_CELULA)   
 #-----------------------------------------------------------------------------------------------------------------------------------------
     #Gerar Saida ^
 
     return mapa, saida_pos
 
-def imprimir_mapa_texto_com_grade_e_cores(mapa, largura, altura, largura_celula):
-    console.print("\n--- Mapa Pré-Gerado ---", style="bold blue")
-
-    # Cabeçalho das colunas (X)
-    y_label_width = len(str(altura - 1)) 
-    linha_cabecalho_partes = [" " * (y_label_width + 1)] 
-    for i in range(largura):
-        linha_cabecalho_partes.append(f"{i:^{largura_celula}}")
-    console.print("".join(linha_cabecalho_partes), style="bold yellow")
-
-    # Linha horizontal superior
-    console.print(" " * (y_label_width + 1) + "+" + ("-" * largura_celula + "+") * largura, style="dim")
-
-    for y in range(altura):
-        # Linha dos números Y e conteúdos das células
-        linha_conteudo_partes = [Text(f"{y:<{y_label_width}}", style="dim"), Text("|", style="dim")] 
-        for x in range(largura):
-            posicao = (x, y)
-            terreno = mapa.get(posicao)
-            if terreno:
-                texto_celula = Text(f"{terreno.get_abreviacao():^{largura_celula}}", style=terreno.get_cor())
-                linha_conteudo_partes.append(texto_celula)
-            else:
-                linha_conteudo_partes.append(Text(f"{'???':^{largura_celula}}", style="white")) 
-            linha_conteudo_partes.append(Text("|", style="dim"))
-        
-        console.print(*linha_conteudo_partes, sep="")
-
-        # Linha horizontal entre as células
-        console.print(" " * (y_label_width + 1) + "+" + ("-" * largura_celula + "+") * largura, style="dim")
-    console.print("-----------------------------------------\n", style="bold blue")
\ No newline at end of file
+def colocar_saida(mapa, rng=random):
+    """Sorteia a célula da saída, que não pode ficar na água nem na caverna. Retorna (x, y)."""
+    proibidos = [ID_TIPO[tipo] for tipo in ("Rio","Cachoeira","Caverna")]
+    # Índices planos, em ordem de linha: a mesma sequência de np.argwhere, com metade da memória
+    candidatas = np.flatnonzero(~np.isin(mapa.tipos, proibidos))
+    y, x = divmod(int(candidatas[rng.randrange(len(candidatas))]), mapa.largura)
+    mapa[(x,y)].saida = True
+    return (x,y)
+
+# --- Geração por ruído ---
+# Campos de elevação e umidade feitos com ruído de valor (Ruido.fbm),
+# classificados nos tipos de terreno, e rios por escoamento sobre a elevação
+# (Hidrologia), tudo com operações sobre o mapa inteiro. Não há laços por
+# célula, então serve para mapas muito grandes (4096x4096 em segundos); em
+# mapas pequenos dá mapas mais simples que os da caminhada.
+
+FRACAO_MONTANHA = 0.10 # As células mais altas viram montanha
+FRACAO_AFLUENTES = 0.02 # Células fora das montanhas com mais água escoando por elas viram rio
+CELULAS_MONTANHA_POR_CACHOEIRA = 1000
+LIMIAR_PLANICIE = 0.42 # Umidade abaixo disto é planície; acima, floresta
+CELULAS_POR_CAVERNA = 400
+OITAVAS = 5
+TAMANHO_DETALHE = 8 # Mapas grandes ganham oitavas na elevação até detalhes deste tamanho, que desviam os rios
+MAX_AMOSTRA_QUANTIL = 1 << 20 # Acima disto os limiares vêm de uma amostra das células
+
+def _quantil(valores, fracao):
+    passo = max(1, valores.size // MAX_AMOSTRA_QUANTIL)
+    return np.quantile(valores.ravel()[::passo], fracao)
+
+def gerar_mapa_ruido(largura, altura, rng=random, recursos_base=RECURSOS_BASE):
+    """Mapa por ruído, com o mesmo resultado de gerar_mapa: (Grade, posição da saída)."""
+    mapa = Grade(largura, altura)
+    fases = Instrumentacao.fases("gerar_mapa_ruido")
+    gerador = np.random.default_rng(rng.getrandbits(64))
+    escala = max(largura, altura) / 4 # Cerca de quatro "morros" de um lado a outro
+
+    fases.proxima("campos")
+    elevacao = Ruido.fbm(largura, altura, escala, max(OITAVAS, int(np.log2(escala / TAMANHO_DETALHE)) + 1), gerador)
+    umidade = Ruido.fbm(largura, altura, escala, OITAVAS, gerador)
+
+    fases.proxima("classificar")
+    tipos = np.where(umidade < LIMIAR_PLANICIE, ID_PLANICIE, ID_FLORESTA).astype(np.uint8)
+    montanha = elevacao >= _quantil(elevacao, 1 - FRACAO_MONTANHA)
+    tipos[montanha] = ID_MONTANHA
+
+    # Rios por escoamento sobre o mesmo relevo, com cachoeiras onde a água sai das montanhas
+    fases.proxima("rios")
+    quedas = max(1, int(montanha.sum()) // CELULAS_MONTANHA_POR_CACHOEIRA)
+    rio, cachoeira = Hidrologia.rios(montanha, elevacao, escala, quedas, fracao=FRACAO_AFLUENTES)
+    tipos[rio] = ID_RIO
+    tipos[cachoeira] = ID_CACHOEIRA
+
+    # A caverna na borda da montanha
+    borda = _fronteira(montanha[None], ~montanha[None])[0]
+    if not cachoeira.any():
+        # Nenhuma água sai das montanhas: uma cachoeira na borda, como na caminhada
+        candidatas = np.flatnonzero(borda)
+        if candidatas.size == 0:
+            fases.fim()
+            raise ErroGeracao("Não há espaço em volta da montanha para a cachoeira e a caverna.")
+        tipos.flat[gerador.choice(candidatas)] = ID_CACHOEIRA
+    candidatas = np.flatnonzero(borda & (tipos != ID_CACHOEIRA) & (tipos != ID_RIO))
+    if candidatas.size == 0:
+        fases.fim()
+        raise ErroGeracao("Não há espaço em volta da montanha para a caverna.")
+    quantidade = min(candidatas.size, max(1, largura * altura // CELULAS_POR_CAVERNA))
+    tipos.flat[gerador.choice(candidatas, quantidade, replace=False)] = ID_CAVERNA
+
+    fases.proxima("recursos")
+    mapa.tipos[...] = tipos
+    mapa.tempos[...] = TEMPO_TIPO[tipos]
+    mapa.gerar_recursos(rng, recursos_base)
+
+    fases.proxima("saida")
+    saida_pos = colocar_saida(mapa, rng)
+    fases.fim()
+    return mapa, saida_pos
+
+# --- Escolha da estratégia ---
+
+ESTRATEGIAS = {
+    "caminhada": gerar_mapa_caminhada, # Regiões crescidas passo a passo e um rio com uma curva
+    "ruido": gerar_mapa_ruido,
+}
+ESTRATEGIA_PADRAO = "caminhada"
+
+@Instrumentacao.medido
+def gerar_mapa(largura, altura, rng=random, estrategia=ESTRATEGIA_PADRAO, recursos_base=RECURSOS_BASE):
+    """Gera um mapa com a estratégia escolhida (ver ESTRATEGIAS). Retorna (Grade, posição da saída).
+
+    `recursos_base` troca a tabela de RECURSOS_BASE (ver Grade.gerar_recursos)
+    sem mudar o terreno: o mesmo rng gera o mesmo mapa com outras quantidades.
+    """
+    gerar = ESTRATEGIAS.get(estrategia)
+    if gerar is None:
+        raise ValueError(f"Estratégia de geração desconhecida: {estrategia}")
+    return gerar(largura, altura, rng, recursos_base)
+
+# --- Geração de mapas em lote ---
+# Mesmas etapas de gerar_mapa, mas feitas para n mapas de uma vez com operações
+# sobre arrays empilhados (n, altura, largura). Cada passo dos laços de
+# crescimento e do rio avança todos os mapas juntos.
+
+ID_MONTANHA = ID_TIPO["Montanha"]
+ID_PLANICIE = ID_TIPO["Planície"]
+ID_FLORESTA = ID_TIPO["Floresta"]
+ID_RIO = ID_TIPO["Rio"]
+ID_CACHOEIRA = ID_TIPO["Cachoeira"]
+ID_CAVERNA = ID_TIPO["Caverna"]
+
+DIRECOES = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)]) # (dx, dy), na ordem de get_vizinhos
+_DESEMPATE_RIO = np.argsort(np.lexsort((DIRECOES[:, 1], DIRECOES[:, 0]))) # Posição de cada direção ordenada por (dx, dy)
+
+class LoteMapas:
+    """Vários mapas do mesmo tamanho guardados em arrays empilhados."""
+    def __init__(self, tipos, recursos, flags, saidas):
+        self.tipos = tipos         # (n, altura, largura)
+        self.tempos = TEMPO_TIPO[tipos]
+        self.recursos = recursos   # (n, altura, largura, recursos)
+        self.flags = flags         # (n, altura, largura)
+        self.saidas = saidas       # (n, 2) com (x, y) da saída
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def grade(self, indice):
+        """Mapa `indice` do lote como Grade (compartilha os arrays do lote)."""
+        grade = Grade.de_arrays(self.tipos[indice], self.tempos[indice], self.recursos[indice], self.flags[indice])
+        return grade, tuple(int(v) for v in self.saidas[indice])
+
+def _fronteira(regiao, livres):
+    """Células livres vizinhas (4 direções) de alguma célula da região, em cada mapa."""
+    vizinhas = np.zeros_like(regiao)
+    vizinhas[:, 1:, :] |= regiao[:, :-1, :]
+    vizinhas[:, :-1, :] |= regiao[:, 1:, :]
+    vizinhas[:, :, 1:] |= regiao[:, :, :-1]
+    vizinhas[:, :, :-1] |= regiao[:, :, 1:]
+    return vizinhas & livres
+
+def _sortear_celulas(mascara, gerador):
+    """Sorteia uma célula marcada por mapa. Retorna (tem_celula, y, x)."""
+    n, altura, largura = mascara.shape
+    sorteio = gerador.random(mascara.shape)
+    sorteio[~mascara] = -1
+    indices = sorteio.reshape(n, -1).argmax(axis=1)
+    return mascara.reshape(n, -1).any(axis=1), indices // largura, indices % largura
+
+def _crescer(tipos, id_tipo, tamanhos, gerador):
+    """Cresce a região do tipo, uma célula por passo, até o tamanho sorteado de cada mapa."""
+    indices = np.arange(len(tipos))
+    atuais = (tipos == id_tipo).reshape(len(tipos), -1).sum(axis=1)
+    for _ in range(int(tamanhos.max())):
+        ativos = atuais < tamanhos
+        if not ativos.any():
+            break
+        tem_celula, ys, xs = _sortear_celulas(_fronteira(tipos == id_tipo, tipos == 0), gerador)
+        # Região cercada para de crescer, como em gerar_mapa
+        ativos &= tem_celula
+        tipos[indices[ativos], ys[ativos], xs[ativos]] = id_tipo
+        atuais += ativos
+
+def _gerar_rios(tipos, gerador):
+    """Rio a partir da cachoeira: segue a direção livre mais longa e faz uma curva."""
+    n, altura, largura = tipos.shape
+    indices = np.arange(n)
+    # Uma cachoeira por mapa (a primeira, se houver mais); mapas sem nenhuma ficam sem rio
+    cachoeiras = (tipos == ID_CACHOEIRA).reshape(n, -1)
+    tem_cachoeira = cachoeiras.any(axis=1)
+    cy, cx = np.divmod(cachoeiras.argmax(axis=1), largura)
+
+    # Comprimento livre em cada direção a partir da cachoeira
+    comprimentos = np.zeros((n, len(DIRECOES)), dtype=np.int64)
+    for d, (dx, dy) in enumerate(DIRECOES):
+        seguindo = tem_cachoeira.copy()
+        for passo in range(1, max(largura, altura)):
+            x = cx + dx * passo
+            y = cy + dy * passo
+            dentro = (0 <= x) & (x < largura) & (0 <= y) & (y < altura)
+            seguindo &= dentro
+            seguindo[seguindo] &= tipos[indices[seguindo], y[seguindo], x[seguindo]] == 0
+            if not seguindo.any():
+                break
+            comprimentos[seguindo, d] += 1
+
+    num_rio = comprimentos.max(axis=1)
+    # Empate no comprimento: vence a maior direção (dx, dy), como no max() de gerar_mapa
+    direcao = DIRECOES[(comprimentos * len(DIRECOES) + _DESEMPATE_RIO).argmax(axis=1)]
+    dx, dy = direcao[:, 0].copy(), direcao[:, 1].copy()
+    x, y = cx + dx, cy + dy
+    tem_rio = num_rio > 0
+    tipos[indices[tem_rio], y[tem_rio], x[tem_rio]] = ID_RIO
+
+    curva = gerador.integers(0, 2, n)
+    min_rios = np.round(num_rio / 2)
+    comprimento = tem_rio.astype(np.int64)
+    virou = np.zeros(n, dtype=bool)
+    ativos = tem_rio & (comprimento < num_rio)
+    while ativos.any():
+        # Curva única quando o rio atinge metade do comprimento
+        vira = ativos & ~virou & (comprimento >= min_rios)
+        antigo_dx = dx.copy()
+        sentido = np.where(curva == 0, 1, -1)
+        dx = np.where(vira, sentido * dy, dx)
+        dy = np.where(vira, sentido * antigo_dx, dy)
+        virou |= vira
+
+        x = np.where(ativos, x + dx, x)
+        y = np.where(ativos, y + dy, y)
+        dentro = (0 <= x) & (x < largura) & (0 <= y) & (y < altura)
+        ativos &= dentro
+        # Depois da curva o rio segue até encontrar a borda ou outro terreno
+        num_rio = np.where(ativos & virou, num_rio + 1, num_rio)
+        ativos[ativos] &= tipos[indices[ativos], y[ativos], x[ativos]] == 0
+        tipos[indices[ativos], y[ativos], x[ativos]] = ID_RIO
+        comprimento += ativos
+        ativos &= comprimento < num_rio
+
+def gerar_mapas(n, largura, altura, seed=None):
+    """Gera n mapas de uma vez, com as mesmas etapas de gerar_mapa, em arrays empilhados."""
+    gerador = np.random.default_rng(seed)
+    indices = np.arange(n)
+    tipos = np.zeros((n, altura, largura), dtype=np.uint8)
+
+    # Montanha: começa num canto e cresce
+    montanha_y = gerador.integers(0, 2, n) * (altura - 1)
+    montanha_x = gerador.integers(0, 2, n) * (largura - 1)
+    tipos[indices, montanha_y, montanha_x] = ID_MONTANHA
+    _crescer(tipos, ID_MONTANHA, tamanho_regiao(gerador.integers(6, 10, n), largura, altura), gerador)
+
+    # Cachoeira e Caverna na borda da montanha
+    bordas = _fronteira(tipos == ID_MONTANHA, tipos == 0)
+    tem_borda, ys, xs = _sortear_celulas(bordas, gerador)
+    tipos[indices[tem_borda], ys[tem_borda], xs[tem_borda]] = ID_CACHOEIRA
+    bordas[indices, ys, xs] = False
+    tem_borda, ys, xs = _sortear_celulas(bordas, gerador)
+    tipos[indices[tem_borda], ys[tem_borda], xs[tem_borda]] = ID_CAVERNA
+
+    _gerar_rios(tipos, gerador)
+
+    # Planície: uma célula livre ao acaso e cresce
+    tem_livre, ys, xs = _sortear_celulas(tipos == 0, gerador)
+    tipos[indices[tem_livre], ys[tem_livre], xs[tem_livre]] = ID_PLANICIE
+    _crescer(tipos, ID_PLANICIE, tamanho_regiao(gerador.integers(9, 15, n), largura, altura), gerador)
+
+    tipos[tipos == 0] = ID_FLORESTA
+
+    recursos = gerador.integers(1, 4, size=tipos.shape + (len(NOMES_RECURSOS),), dtype=np.uint8) * RECURSOS_BASE[tipos]
+
+    # Saída fora da água e da caverna, como em gerar_mapa
+    flags = np.zeros_like(tipos)
+    _, saida_y, saida_x = _sortear_celulas(~np.isin(tipos, [ID_RIO, ID_CACHOEIRA, ID_CAVERNA]), gerador)
+    flags[indices, saida_y, saida_x] = FLAG_SAIDA
+
+    return LoteMapas(tipos, recursos, flags, np.stack([saida_x, saida_y], axis=1))
+
+def imprimir_mapa_texto_com_grade_e_cores(mapa, largura, altura, largura_celula, origem=(0, 0)):
+    # origem: canto superior esquerdo da região mostrada. Desenho feito pelo
+    # Renderizador, numa única escrita; para desenhos repetidos do mesmo mapa,
+    # use um RenderizadorMapa próprio, que guarda o que já foi desenhado.
+    from Renderizador import RenderizadorMapa
+    RenderizadorMapa(mapa, largura_celula, console).desenhar(origem, largura, altura)
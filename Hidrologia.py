@@ -0,0 +1,150 @@
+# Hidrologia.py
+"""Rios por escoamento: direção e acumulação do fluxo sobre um relevo, com NumPy.
+
+A elevação sai das montanhas (mais alta quanto mais para dentro delas), somada
+a um relevo de ruído que cria os vales. Cada célula escoa para a vizinha mais
+baixa das quatro (ou para nenhuma, num fundo de vale). A acumulação conta quantas células escoam por cada uma: acima de um
+limiar, é afluente. Onde sai mais água das montanhas ficam as cachoeiras, e o
+rio segue dali morro abaixo, recebendo os afluentes pelo caminho.
+
+Todas as etapas são operações sobre o mapa inteiro ou sobre linhas inteiras. A
+distância às montanhas passa uma vez pelas colunas e uma pelas linhas; a
+acumulação tira, a cada rodada, as células sem ninguém escoando para elas ainda
+por contar, então cada célula é visitada uma vez e o custo é linear no tamanho
+do mapa.
+"""
+import numpy as np
+
+DESLOCAMENTOS = ((1, 0), (-1, 0), (0, 1), (0, -1)) # (dx, dy), na ordem de GeradorMapa.get_vizinhos
+SEM_DESTINO = -1 # Fundo de vale: a água para ali
+MAX_AMOSTRA_LIMIAR = 1 << 20 # Acima disto o limiar dos afluentes vem de uma amostra das células
+
+
+def _distancia_colunas(distancias):
+    # Ao longo de y, linha a linha: cada passo é uma operação sobre a largura toda
+    for y in range(1, len(distancias)):
+        np.minimum(distancias[y], distancias[y - 1] + 1, out=distancias[y])
+    for y in range(len(distancias) - 2, -1, -1):
+        np.minimum(distancias[y], distancias[y + 1] + 1, out=distancias[y])
+
+
+def distancia(mascara):
+    """Distância (em passos nas quatro direções) de cada célula até a célula marcada mais próxima.
+
+    Sem células marcadas, tudo fica infinito.
+    """
+    distancias = np.where(mascara, np.float32(0), np.float32(np.inf))
+    _distancia_colunas(distancias)
+    # Ao longo de x, com o array transposto (contíguo), pelo mesmo caminho
+    transposta = np.ascontiguousarray(distancias.T)
+    _distancia_colunas(transposta)
+    return transposta.T
+
+
+def elevacao(montanha, relevo=None, peso_relevo=1.0):
+    """Elevação derivada das montanhas: dentro delas, a distância até a borda; fora, zero.
+
+    `relevo` (um campo de ruído do mesmo tamanho, em [0, 1)) entra com o peso
+    dado em passos de distância: fora das montanhas é ele que junta o
+    escoamento em vales, e dentro delas desvia a água até a saída.
+    """
+    if montanha.all():
+        terreno = np.zeros(montanha.shape, dtype=np.float32)
+    else:
+        terreno = distancia(~montanha)
+    if relevo is not None:
+        terreno += np.float32(peso_relevo) * relevo
+    return terreno
+
+
+def destinos(elevacoes):
+    """Índice plano (y * largura + x) da vizinha mais baixa de cada célula, ou SEM_DESTINO."""
+    altura, largura = elevacoes.shape
+    borda = np.pad(elevacoes, 1, constant_values=np.inf)
+    mais_baixa = elevacoes.copy()
+    direcao = np.zeros(elevacoes.shape, dtype=np.int8) # 0: nenhuma vizinha mais baixa
+    for indice, (dx, dy) in enumerate(DESLOCAMENTOS, start=1):
+        vizinha = borda[1 + dy:1 + dy + altura, 1 + dx:1 + dx + largura]
+        menor = vizinha < mais_baixa
+        np.copyto(mais_baixa, vizinha, where=menor)
+        np.copyto(direcao, np.int8(indice), where=menor)
+    saltos = np.array([0] + [dy * largura + dx for dx, dy in DESLOCAMENTOS], dtype=np.int64)
+    direcao = direcao.ravel()
+    destino = np.arange(altura * largura, dtype=np.int64) + saltos[direcao]
+    destino[direcao == 0] = SEM_DESTINO
+    return destino.reshape(altura, largura)
+
+
+def acumulacao(destino):
+    """Quantas células (contando a própria) escoam por cada célula, dados os destinos de destinos()."""
+    plano = destino.ravel()
+    acumulado = np.ones(plano.size, dtype=np.int64)
+    validos = plano[plano != SEM_DESTINO]
+    chegando = np.bincount(validos, minlength=plano.size) # Vizinhas que ainda vão escoar para cada célula
+    posicao = np.empty(plano.size, dtype=np.int64) # Rascunho para tirar os repetidos de cada rodada
+    prontas = np.flatnonzero(chegando == 0)
+    while prontas.size:
+        alvos = plano[prontas]
+        seguem = alvos != SEM_DESTINO
+        prontas, alvos = prontas[seguem], alvos[seguem]
+        np.add.at(acumulado, alvos, acumulado[prontas])
+        np.subtract.at(chegando, alvos, 1)
+        # Um destino que ficou pronto aparece uma vez por vizinha que chegou nele
+        # nesta rodada: fica só a última aparição
+        prontas = alvos[chegando[alvos] == 0]
+        indices = np.arange(prontas.size)
+        posicao[prontas] = indices
+        prontas = prontas[posicao[prontas] == indices]
+    return acumulado.reshape(destino.shape)
+
+
+def vazao_da_montanha(destino, acumulado, montanha):
+    """Para cada célula fora da montanha, quantas células de montanha escoam direto por ela."""
+    plano = destino.ravel()
+    saindo = np.flatnonzero(montanha.ravel() & (plano != SEM_DESTINO))
+    alvos = plano[saindo]
+    fora = ~montanha.ravel()[alvos]
+    vazao = np.zeros(plano.size, dtype=np.int64)
+    np.add.at(vazao, alvos[fora], acumulado.ravel()[saindo[fora]])
+    return vazao.reshape(destino.shape)
+
+
+def jusante(destino, origens):
+    """Células por onde passa a água que sai das `origens` (incluídas), até o fundo do vale."""
+    plano = destino.ravel()
+    marcadas = origens.ravel().copy()
+    frente = np.flatnonzero(marcadas)
+    while frente.size:
+        frente = plano[frente]
+        frente = frente[frente != SEM_DESTINO]
+        frente = np.unique(frente[~marcadas[frente]])
+        marcadas[frente] = True
+    return marcadas.reshape(destino.shape)
+
+
+def rios(montanha, relevo=None, peso_relevo=1.0, quedas=1, limiar=None, fracao=None):
+    """(rio, cachoeira): máscaras das células de rio e das cachoeiras, fora das montanhas.
+
+    As cachoeiras são as `quedas` células por onde sai mais água das
+    montanhas; o rio é o caminho da água a partir delas, mais os afluentes:
+    as células com acumulação de pelo menos `limiar` células (com `fracao`, o
+    limiar que deixa essa fração das células fora da montanha como afluente).
+    """
+    destino = destinos(elevacao(montanha, relevo, peso_relevo))
+    acumulado = acumulacao(destino)
+    if limiar is None:
+        fora = acumulado[~montanha]
+        amostra = fora[::max(1, fora.size // MAX_AMOSTRA_LIMIAR)]
+        limiar = np.quantile(amostra, 1 - fracao) if fora.size and fracao else np.inf
+    vazao = vazao_da_montanha(destino, acumulado, montanha).ravel()
+    # Só saídas por onde a água segue: o rio começa ao lado da cachoeira
+    candidatas = np.flatnonzero(vazao * (destino.ravel() != SEM_DESTINO))
+    quantidade = min(quedas, candidatas.size)
+    cachoeira = np.zeros(vazao.size, dtype=bool)
+    if quantidade:
+        # As maiores vazões; empates ficam com a célula de menor índice
+        ordem = np.argsort(-vazao[candidatas], kind="stable")
+        cachoeira[candidatas[ordem[:quantidade]]] = True
+    cachoeira = cachoeira.reshape(montanha.shape)
+    rio = (jusante(destino, cachoeira) | (~montanha & (acumulado >= max(limiar, 2)))) & ~cachoeira
+    return rio, cachoeira
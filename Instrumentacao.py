@@ -0,0 +1,235 @@
+# Instrumentacao.py
+"""Medição de tempo por etapa e contadores, ligada só quando pedida.
+
+O código do jogo marca as etapas (as fases de gerar_mapa, as ações do Jogador,
+Partida.passar_horas) com etapa(), fases() ou o decorador medido; enquanto nenhuma
+Instrumentacao estiver ativa, essas marcas não medem nada. Com uma ativa
+(ativar() ou `with Instrumentacao():`), cada etapa acumula chamadas, tempo total
+e máximo, e o tempo próprio de cada pilha de etapas, no formato "colapsado" dos
+geradores de flamegraph (flamegraph.pl, speedscope).
+
+As etapas podem ser aninhadas (passar_horas dentro de andar, por exemplo); o
+tempo de uma etapa inclui o das etapas dentro dela.
+"""
+import sys
+import time
+import cProfile
+import functools
+from contextlib import nullcontext
+from collections import Counter
+
+_ativa = None # Instrumentacao em uso, ou None
+_NADA = nullcontext()
+
+
+class _Etapa:
+    __slots__ = ("instrumentacao", "nome", "inicio", "filhos")
+
+    def __init__(self, instrumentacao, nome):
+        self.instrumentacao = instrumentacao
+        self.nome = nome
+
+    def __enter__(self):
+        self.filhos = 0.0
+        self.instrumentacao._pilha.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        duracao = time.perf_counter() - self.inicio
+        instrumentacao = self.instrumentacao
+        pilha = instrumentacao._pilha
+        # Uma exceção pode ter deixado etapas internas abertas: saem junto com esta
+        indice = len(pilha) - 1 if pilha[-1] is self else pilha.index(self)
+        caminho = ";".join(etapa.nome for etapa in pilha[:indice + 1])
+        del pilha[indice:]
+        if pilha:
+            pilha[-1].filhos += duracao
+        instrumentacao._registrar(self.nome, duracao)
+        instrumentacao.pilhas[caminho] += duracao - self.filhos
+        return False
+
+
+class Instrumentacao:
+    """Tempos por etapa e contadores de uma execução."""
+    def __init__(self):
+        self.tempos = {} # nome -> [chamadas, total, máximo]
+        self.contadores = Counter()
+        self.pilhas = Counter() # "etapa;subetapa" -> tempo próprio, em segundos
+        self._pilha = []
+        self._anterior = None
+
+    def medir(self, nome):
+        """Contexto que mede o tempo da etapa `nome`."""
+        return _Etapa(self, nome)
+
+    def contar(self, nome, quantidade=1):
+        self.contadores[nome] += quantidade
+
+    def _registrar(self, nome, duracao):
+        tempo = self.tempos.get(nome)
+        if tempo is None:
+            self.tempos[nome] = [1, duracao, duracao]
+        else:
+            tempo[0] += 1
+            tempo[1] += duracao
+            if duracao > tempo[2]:
+                tempo[2] = duracao
+
+    def limpar(self):
+        self.tempos.clear()
+        self.contadores.clear()
+        self.pilhas.clear()
+
+    def __enter__(self):
+        self._anterior = ativar(self)
+        return self
+
+    def __exit__(self, *erro):
+        ativar(self._anterior)
+        return False
+
+    # --- Relatórios ---
+
+    def resumo(self):
+        """Dicionário com as etapas (chamadas, total, média e máximo em segundos) e os contadores."""
+        return {
+            "etapas": {
+                nome: {"chamadas": chamadas, "total": total, "media": total / chamadas, "maximo": maximo}
+                for nome, (chamadas, total, maximo) in self.tempos.items()
+            },
+            "contadores": dict(self.contadores),
+        }
+
+    def texto(self):
+        """Tabela das etapas, da que mais tomou tempo para a que menos, e os contadores."""
+        linhas = [f"{'Etapa':<36} {'Chamadas':>9} {'Total (ms)':>11} {'Média (µs)':>11} {'Máx. (µs)':>11}"]
+        for nome, (chamadas, total, maximo) in sorted(self.tempos.items(), key=lambda item: -item[1][1]):
+            linhas.append(f"{nome:<36} {chamadas:>9} {total * 1e3:>11.2f} {total / chamadas * 1e6:>11.1f} {maximo * 1e6:>11.1f}")
+        if self.contadores:
+            linhas.append("")
+            linhas.append("Contadores:")
+            for nome, quantidade in sorted(self.contadores.items()):
+                linhas.append(f"  {nome:<34} {quantidade:>9}")
+        return "\n".join(linhas)
+
+    def pilhas_colapsadas(self):
+        """Linhas "etapa;subetapa microssegundos", a entrada dos geradores de flamegraph."""
+        return "\n".join(f"{caminho} {round(tempo * 1e6)}" for caminho, tempo in sorted(self.pilhas.items()))
+
+
+def ativar(instrumentacao=None):
+    """Passa a medir com `instrumentacao` (None desliga). Retorna a que estava ativa."""
+    global _ativa
+    anterior = _ativa
+    _ativa = instrumentacao
+    return anterior
+
+
+def ativa():
+    return _ativa
+
+
+def etapa(nome):
+    """Contexto que mede a etapa na instrumentação ativa (e não faz nada sem ela)."""
+    if _ativa is None:
+        return _NADA
+    return _ativa.medir(nome)
+
+
+def contar(nome, quantidade=1):
+    if _ativa is not None:
+        _ativa.contar(nome, quantidade)
+
+
+class Fases:
+    """Etapas seguidas de uma função (uma termina quando a próxima começa)."""
+    def __init__(self, instrumentacao, prefixo):
+        self.instrumentacao = instrumentacao
+        self.prefixo = prefixo
+        self.atual = None
+
+    def proxima(self, nome):
+        self.fim()
+        self.atual = self.instrumentacao.medir(f"{self.prefixo}.{nome}").__enter__()
+
+    def fim(self):
+        if self.atual is not None:
+            self.atual.__exit__(None, None, None)
+            self.atual = None
+
+
+class _SemFases:
+    def proxima(self, nome):
+        pass
+
+    def fim(self):
+        pass
+
+
+_SEM_FASES = _SemFases()
+
+
+def fases(prefixo):
+    """Fases para marcar com proxima("nome") e fim(); não fazem nada sem instrumentação ativa."""
+    if _ativa is None:
+        return _SEM_FASES
+    return Fases(_ativa, prefixo)
+
+
+def medido(funcao):
+    """Decorador: mede cada chamada da função como a etapa "Classe.metodo"."""
+    nome = funcao.__qualname__
+
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        if _ativa is None:
+            return funcao(*args, **kwargs)
+        with _ativa.medir(nome):
+            return funcao(*args, **kwargs)
+    return medida
+
+
+class Perfil:
+    """Mede um trecho inteiro (o loop do jogo, um lote de simulações) e relata no fim.
+
+    Ao sair, escreve a tabela de etapas em `saida`. Com `arquivo`, roda também
+    o cProfile e grava as estatísticas nele (para pstats, snakeviz...) e as
+    pilhas colapsadas das etapas em `arquivo`.pilhas (para flamegraph).
+    """
+    def __init__(self, arquivo=None, saida=sys.stderr):
+        self.arquivo = arquivo
+        self.saida = saida
+        self.instrumentacao = Instrumentacao()
+        self.perfilador = cProfile.Profile() if arquivo else None
+
+    def __enter__(self):
+        self.instrumentacao.__enter__()
+        if self.perfilador is not None:
+            self.perfilador.enable()
+        return self.instrumentacao
+
+    def __exit__(self, *erro):
+        if self.perfilador is not None:
+            self.perfilador.disable()
+        self.instrumentacao.__exit__(*erro)
+        print(self.instrumentacao.texto(), file=self.saida)
+        if self.arquivo:
+            self.perfilador.dump_stats(self.arquivo)
+            with open(f"{self.arquivo}.pilhas", "w", encoding="utf-8") as f:
+                f.write(self.instrumentacao.pilhas_colapsadas() + "\n")
+            print(f"Perfil gravado em {self.arquivo} e {self.arquivo}.pilhas", file=self.saida)
+        return False
+
+
+def argumento_perfil(parser):
+    """Adiciona --perfil [ARQUIVO] (ou --profile) a um ArgumentParser."""
+    parser.add_argument("--perfil", "--profile", nargs="?", const="", default=None, metavar="ARQUIVO",
+                        help="mede as etapas e mostra o resumo no fim; com ARQUIVO, grava também o cProfile")
+
+
+def perfil(arquivo):
+    """Perfil(arquivo) se --perfil foi pedido (arquivo não é None), senão um contexto que não faz nada."""
+    if arquivo is None:
+        return nullcontext()
+    return Perfil(arquivo or None)
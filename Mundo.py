@@ -0,0 +1,169 @@
+# Mundo.py
+"""Mundo infinito dividido em chunks, gerados sob demanda a partir de uma seed.
+
+Cada chunk é um mapa de gerar_mapa com tamanho_chunk x tamanho_chunk células,
+gerado com uma seed derivada da seed do mundo e das coordenadas do chunk. Só os
+chunks usados recentemente ficam em memória (cache LRU); os mais antigos são
+descartados e gerados de novo quando o jogador volta. Chunks que o jogador
+alterou (recursos coletados, saída) são guardados compactados ao sair do cache,
+num arquivo por chunk: no diretório dado ou, sem ele, num diretório temporário
+apagado junto com o Mundo. A memória fica do tamanho do cache, por mais longe
+que o jogador ande.
+"""
+import os
+import zlib
+import random
+import tempfile
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+import GeradorMapa
+
+TAMANHO_CHUNK = 9
+MAX_CHUNKS = 64 # Chunks mantidos em memória
+RAIO_PREPARO = 1 # Chunks gerados em volta do jogador
+RAIO_SAIDA = 2 # Distância máxima (em chunks) entre o início e o chunk da saída
+
+
+class Mundo(Mapping):
+    """Mapa infinito: mundo[(x, y)] devolve a célula de qualquer posição inteira."""
+    def __init__(self, seed, tamanho_chunk=TAMANHO_CHUNK, max_chunks=MAX_CHUNKS, raio=RAIO_PREPARO, diretorio=None,
+                 recursos_base=GeradorMapa.RECURSOS_BASE):
+        if max_chunks < (2 * raio + 1) ** 2:
+            raise ValueError("max_chunks precisa comportar todos os chunks em volta do jogador.")
+        self.seed = seed
+        self.tamanho_chunk = tamanho_chunk
+        self.max_chunks = max_chunks
+        self.raio = raio
+        self.diretorio = diretorio # Onde os chunks alterados vão para o disco (None: diretório temporário)
+        self._temporario = None # TemporaryDirectory criado no primeiro chunk guardado, quando não há diretório
+        self.recursos_base = recursos_base # Ver GeradorMapa.gerar_mapa (a de Balanceamento.Configuracao)
+        self.chunks = OrderedDict() # (cx, cy) -> Grade, do menos para o mais recente
+        self.centro = None # Chunk da última chamada a preparar(): ele e os vizinhos no raio não saem do cache
+        self.assinaturas = {} # (cx, cy) -> crc dos recursos/flags quando o chunk foi carregado
+        self.relogio = None # Hora atual do jogo, repassada aos chunks (regeneração de recursos)
+
+        # A saída fica num único chunk perto do início
+        rng = random.Random(f"{seed}:saida")
+        self.chunk_saida = (rng.randint(-RAIO_SAIDA, RAIO_SAIDA), rng.randint(-RAIO_SAIDA, RAIO_SAIDA))
+        grade = self.chunk(*self.chunk_saida)
+        y, x = np.argwhere(grade.flags & GeradorMapa.FLAG_SAIDA)[0]
+        self.saida_pos = (int(x) + grade.origem[0], int(y) + grade.origem[1])
+
+    def coordenadas_chunk(self, posicao):
+        return posicao[0] // self.tamanho_chunk, posicao[1] // self.tamanho_chunk
+
+    def chunk(self, cx, cy):
+        """Grade do chunk (cx, cy), do cache, do armazenamento ou gerada na hora."""
+        chave = (cx, cy)
+        grade = self.chunks.get(chave)
+        if grade is not None:
+            self.chunks.move_to_end(chave)
+            return grade
+
+        grade = self._gerar_chunk(cx, cy)
+        dados = self._carregar(chave)
+        if dados is not None:
+            self._restaurar(grade, dados)
+        self.chunks[chave] = grade
+        self.assinaturas[chave] = self._assinatura(grade)
+        while len(self.chunks) > self.max_chunks:
+            self._descartar_antigo()
+        return grade
+
+    def _fixado(self, chave):
+        return self.centro is not None and max(abs(chave[0] - self.centro[0]), abs(chave[1] - self.centro[1])) <= self.raio
+
+    def _descartar_antigo(self):
+        # O chunk menos recente fora da vizinhança do jogador: consultas que passam por
+        # muitos chunks (a busca de Caminhos.a_estrela, por exemplo) não tiram do cache a
+        # grade onde o jogador está. max_chunks comporta a vizinhança, então sempre há um
+        for chave in self.chunks:
+            if not self._fixado(chave):
+                self._descartar(chave, self.chunks.pop(chave))
+                return
+
+    def preparar(self, posicao):
+        """Garante os chunks em volta da posição, mantendo-os como os mais recentes."""
+        cx, cy = self.coordenadas_chunk(posicao)
+        self.centro = (cx, cy)
+        for dy in range(-self.raio, self.raio + 1):
+            for dx in range(-self.raio, self.raio + 1):
+                self.chunk(cx + dx, cy + dy)
+        # O chunk do jogador fica por último, o mais longe de ser descartado
+        self.chunk(cx, cy)
+
+    def _gerar_chunk(self, cx, cy):
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+        grade, saida = GeradorMapa.gerar_mapa(self.tamanho_chunk, self.tamanho_chunk, rng,
+                                              recursos_base=self.recursos_base)
+        grade.origem = (cx * self.tamanho_chunk, cy * self.tamanho_chunk)
+        if (cx, cy) != self.chunk_saida:
+            grade.flags &= ~np.uint8(GeradorMapa.FLAG_SAIDA)
+        grade.relogio = self._agora
+        return grade
+
+    def _agora(self):
+        return self.relogio() if self.relogio is not None else 0
+
+    # --- Chunks alterados ---
+
+    def _assinatura(self, grade):
+        return zlib.crc32(grade.colhido.tobytes(), zlib.crc32(grade.flags.tobytes(), zlib.crc32(grade.recursos.tobytes())))
+
+    def _descartar(self, chave, grade):
+        assinatura = self.assinaturas.pop(chave)
+        if self._assinatura(grade) == assinatura:
+            return # Igual ao que foi carregado: basta gerar de novo depois
+        dados = zlib.compress(grade.recursos.tobytes() + grade.flags.tobytes() + grade.colhido.tobytes())
+        if self.diretorio is None:
+            self._temporario = tempfile.TemporaryDirectory(prefix="mundo_")
+            self.diretorio = self._temporario.name
+        with open(self._arquivo(chave), "wb") as f:
+            f.write(dados)
+
+    def _carregar(self, chave):
+        if self.diretorio is None:
+            return None # Nada foi guardado ainda
+        try:
+            with open(self._arquivo(chave), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _restaurar(self, grade, dados):
+        dados = zlib.decompress(dados)
+        fim_recursos = grade.recursos.nbytes
+        fim_flags = fim_recursos + grade.flags.nbytes
+        grade.recursos[...] = np.frombuffer(dados[:fim_recursos], dtype=np.uint8).reshape(grade.recursos.shape)
+        grade.flags[...] = np.frombuffer(dados[fim_recursos:fim_flags], dtype=np.uint8).reshape(grade.flags.shape)
+        if len(dados) > fim_flags: # Chunks guardados antes da regeneração não têm as horas de coleta
+            grade.colhido[...] = np.frombuffer(dados[fim_flags:], dtype=np.float32).reshape(grade.colhido.shape)
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, f"chunk_{chave[0]}_{chave[1]}.bin")
+
+    def fechar(self):
+        """Apaga o diretório temporário dos chunks guardados, se houver (também é apagado quando o Mundo some)."""
+        if self._temporario is not None:
+            self._temporario.cleanup()
+            self._temporario = None
+            self.diretorio = None
+
+    # --- Interface de mapa ---
+
+    def __getitem__(self, posicao):
+        return self.chunk(*self.coordenadas_chunk(posicao))[posicao]
+
+    def __contains__(self, posicao):
+        return True # O mundo não tem limites
+
+    def __iter__(self):
+        # Só as posições dos chunks carregados
+        for grade in list(self.chunks.values()):
+            yield from grade
+
+    def __len__(self):
+        return len(self.chunks) * self.tamanho_chunk ** 2
@@ -0,0 +1,234 @@
+# Neblina.py
+"""Neblina de guerra: quais células o jogador já viu, um bit por célula.
+
+As células vistas ficam em blocos de BLOCO x BLOCO bits, com cada linha do
+bloco numa palavra de 64 bits, guardados num dicionário pelas coordenadas do
+bloco. Só existem os blocos por onde o jogador já passou, então um mapa enorme
+(ou o Mundo infinito) custa só o que foi visto, e milhares de partidas
+abertas cabem na memória.
+
+revelar() marca o disco de visão em volta de uma posição com máscaras
+calculadas uma vez por raio e por deslocamento do disco dentro da palavra: são
+no máximo quatro ORs de algumas palavras (o disco cai em até quatro blocos),
+então o custo não depende do tamanho do mapa. A contagem de células vistas é
+atualizada a cada revelação, e fronteira() acha as células não vistas ao lado
+de vistas deslocando as palavras dos blocos, sem laço por célula.
+"""
+import math
+import functools
+
+import numpy as np
+
+BLOCO = 64 # Lado de um bloco, em células: uma linha do bloco é uma palavra de 64 bits
+MAX_RAIO = BLOCO // 2 # Com 2 * raio + 1 <= BLOCO + 1 colunas, o disco cabe em duas palavras a partir de qualquer fase
+CHEIA = (1 << BLOCO) - 1
+_UM = np.uint64(1)
+_ULTIMO = np.uint64(BLOCO - 1)
+_BITS_BYTE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int64)
+
+
+def contar_bits(palavras):
+    """Quantos bits ligados há num array de uint64."""
+    return int(_BITS_BYTE[np.ascontiguousarray(palavras).view(np.uint8)].sum())
+
+
+def _bits(bloco):
+    # Array bool (BLOCO, BLOCO) de um bloco: [y, x] é o bit x da linha y
+    return np.unpackbits(bloco.astype("<u8").view(np.uint8), bitorder="little").reshape(BLOCO, BLOCO).astype(bool)
+
+
+@functools.lru_cache(maxsize=None)
+def mascaras(raio):
+    """Máscaras do disco de visão de raio `raio`: array (BLOCO, 2, 2 * raio + 1) de uint64.
+
+    mascaras(raio)[fase, lado, dy] são os bits da linha dy do disco quando a
+    coluna mais à esquerda dele cai no bit `fase` da palavra (lado 0); o que
+    passa do fim da palavra vai para a palavra do bloco seguinte (lado 1). O
+    disco tem as células com dx² + dy² <= raio² + raio.
+    """
+    if not 0 <= raio <= MAX_RAIO:
+        raise ValueError(f"O raio de visão precisa estar entre 0 e {MAX_RAIO}.")
+    lado = 2 * raio + 1
+    resultado = np.zeros((BLOCO, 2, lado), dtype=np.uint64)
+    for dy in range(-raio, raio + 1):
+        meia = math.isqrt(raio * raio + raio - dy * dy)
+        linha = ((1 << (2 * meia + 1)) - 1) << (raio - meia)
+        for fase in range(BLOCO):
+            bits = linha << fase
+            resultado[fase, 0, dy + raio] = bits & CHEIA
+            resultado[fase, 1, dy + raio] = bits >> BLOCO
+    return resultado
+
+
+class Neblina:
+    """Células vistas de um mapa.
+
+    `limites` é (origem, largura, altura) da Grade: fora dela nada é marcado.
+    None é o Mundo infinito. `blocos`, se dado, é o dicionário de blocos de
+    outra Neblina (ao restaurar uma partida salva).
+    """
+    def __init__(self, limites=None, blocos=None):
+        self.limites = limites
+        self.blocos = {} if blocos is None else blocos # (bx, by) -> BLOCO uint64: bit x % BLOCO da linha y % BLOCO
+        self.vistas = sum(contar_bits(bloco) for bloco in self.blocos.values())
+        self._limites = {} # (bx, by) -> bits do bloco dentro do mapa (None: todos)
+
+    def _limite(self, bx, by):
+        if self.limites is None:
+            return None
+        chave = (bx, by)
+        if chave not in self._limites:
+            (ox, oy), largura, altura = self.limites
+            x0, y0 = bx * BLOCO, by * BLOCO
+            inicio_x, fim_x = max(ox - x0, 0), min(ox + largura - x0, BLOCO)
+            inicio_y, fim_y = max(oy - y0, 0), min(oy + altura - y0, BLOCO)
+            if (inicio_x, inicio_y, fim_x, fim_y) == (0, 0, BLOCO, BLOCO):
+                self._limites[chave] = None
+            else:
+                limite = np.zeros(BLOCO, dtype=np.uint64)
+                if inicio_x < fim_x and inicio_y < fim_y:
+                    limite[inicio_y:fim_y] = ((1 << (fim_x - inicio_x)) - 1) << inicio_x
+                self._limites[chave] = limite
+        return self._limites[chave]
+
+    def _marcar(self, bx, by, linha, bits):
+        # Liga `bits` a partir da linha `linha` do bloco e retorna quantos eram novos
+        limite = self._limite(bx, by)
+        if limite is not None:
+            bits = bits & limite[linha:linha + len(bits)]
+        bloco = self.blocos.get((bx, by))
+        if bloco is not None:
+            bits = bits & ~bloco[linha:linha + len(bits)]
+        if not bits.any():
+            return 0
+        if bloco is None:
+            bloco = self.blocos[(bx, by)] = np.zeros(BLOCO, dtype=np.uint64)
+        bloco[linha:linha + len(bits)] |= bits
+        return contar_bits(bits)
+
+    def revelar(self, posicao, raio=0):
+        """Marca como vistas as células do disco de raio `raio` em volta de `posicao`.
+
+        Retorna quantas delas ainda não tinham sido vistas.
+        """
+        lado = 2 * raio + 1
+        bx, fase = divmod(posicao[0] - raio, BLOCO)
+        by, linha = divmod(posicao[1] - raio, BLOCO)
+        mascara = mascaras(raio)[fase]
+        corte = min(lado, BLOCO - linha) # Linhas do disco que ficam no primeiro bloco
+        novas = 0
+        for lado_x in (0, 1) if fase + lado > BLOCO else (0,):
+            novas += self._marcar(bx + lado_x, by, linha, mascara[lado_x, :corte])
+            if corte < lado:
+                novas += self._marcar(bx + lado_x, by + 1, 0, mascara[lado_x, corte:])
+        self.vistas += novas
+        return novas
+
+    def marcar(self):
+        """Cópia das células vistas agora, para voltar a elas com voltar()."""
+        return {chave: bloco.copy() for chave, bloco in self.blocos.items()}, self.vistas
+
+    def voltar(self, marca):
+        blocos, self.vistas = marca
+        self.blocos = {chave: bloco.copy() for chave, bloco in blocos.items()}
+
+    def visto(self, posicao):
+        bx, x = divmod(posicao[0], BLOCO)
+        by, y = divmod(posicao[1], BLOCO)
+        bloco = self.blocos.get((bx, by))
+        return bloco is not None and bool((int(bloco[y]) >> x) & 1)
+
+    def fracao_explorada(self):
+        """Fração das células do mapa já vistas (no Mundo, das células dos blocos já visitados)."""
+        if self.limites is None:
+            total = len(self.blocos) * BLOCO * BLOCO
+        else:
+            total = self.limites[1] * self.limites[2]
+        return self.vistas / total if total else 0.0
+
+    def mascara(self, origem, largura, altura):
+        """Array bool (altura, largura) das células vistas no retângulo com canto em `origem`."""
+        ox, oy = origem
+        bx0, by0 = ox // BLOCO, oy // BLOCO
+        bx1, by1 = (ox + largura - 1) // BLOCO, (oy + altura - 1) // BLOCO
+        vistas = np.zeros(((by1 - by0 + 1) * BLOCO, (bx1 - bx0 + 1) * BLOCO), dtype=bool)
+        for by in range(by0, by1 + 1):
+            for bx in range(bx0, bx1 + 1):
+                bloco = self.blocos.get((bx, by))
+                if bloco is not None:
+                    y, x = (by - by0) * BLOCO, (bx - bx0) * BLOCO
+                    vistas[y:y + BLOCO, x:x + BLOCO] = _bits(bloco)
+        y, x = oy - by0 * BLOCO, ox - bx0 * BLOCO
+        return vistas[y:y + altura, x:x + largura]
+
+    def fronteira(self):
+        """Array (n, 2) com as posições (x, y) não vistas vizinhas, nas quatro direções, de uma vista.
+
+        Ordenadas por y e depois por x.
+        """
+        vazio = np.zeros(BLOCO, dtype=np.uint64)
+        candidatos = set(self.blocos)
+        for bx, by in self.blocos:
+            candidatos.update(((bx + 1, by), (bx - 1, by), (bx, by + 1), (bx, by - 1)))
+        partes = []
+        for bx, by in candidatos:
+            bloco = self.blocos.get((bx, by), vazio)
+            esquerda = self.blocos.get((bx - 1, by), vazio)
+            direita = self.blocos.get((bx + 1, by), vazio)
+            vizinhas = (bloco << _UM) | (bloco >> _UM) | (esquerda >> _ULTIMO) | ((direita & _UM) << _ULTIMO)
+            vizinhas[1:] |= bloco[:-1]
+            vizinhas[:-1] |= bloco[1:]
+            vizinhas[0] |= self.blocos.get((bx, by - 1), vazio)[-1]
+            vizinhas[-1] |= self.blocos.get((bx, by + 1), vazio)[0]
+            vizinhas &= ~bloco
+            limite = self._limite(bx, by)
+            if limite is not None:
+                vizinhas &= limite
+            if vizinhas.any():
+                ys, xs = np.nonzero(_bits(vizinhas))
+                partes.append(np.column_stack((xs + bx * BLOCO, ys + by * BLOCO)))
+        if not partes:
+            return np.zeros((0, 2), dtype=np.int64)
+        posicoes = np.concatenate(partes).astype(np.int64)
+        return posicoes[np.lexsort((posicoes[:, 0], posicoes[:, 1]))]
+
+    def fronteira_mais_proxima(self, posicao):
+        """A posição da fronteira mais perto de `posicao` (distância nas quatro direções), ou None."""
+        posicoes = self.fronteira()
+        if not len(posicoes):
+            return None
+        distancias = np.abs(posicoes - np.array(posicao)).sum(axis=1)
+        x, y = posicoes[distancias.argmin()]
+        return int(x), int(y)
+
+
+if __name__ == "__main__":
+    # Confere revelar() com o disco calculado célula a célula, no raio máximo e
+    # em volta dos cantos dos blocos (todas as fases cruzando a divisa)
+    import random
+
+    rng = random.Random(0)
+    for raio in (0, 1, 2, MAX_RAIO - 1, MAX_RAIO):
+        neblina = Neblina()
+        vistas = set()
+        centros = [(bx * BLOCO + dx, by * BLOCO + dy) for bx in (-1, 0, 1) for by in (-1, 0, 1)
+                   for dx in (-raio - 1, -raio, 0, raio - 1, raio) for dy in (-raio - 1, 0, raio)]
+        centros += [(rng.randrange(-3 * BLOCO, 3 * BLOCO), rng.randrange(-3 * BLOCO, 3 * BLOCO)) for _ in range(100)]
+        for cx, cy in centros:
+            disco = {(cx + dx, cy + dy) for dx in range(-raio, raio + 1) for dy in range(-raio, raio + 1)
+                     if dx * dx + dy * dy <= raio * raio + raio}
+            assert neblina.revelar((cx, cy), raio) == len(disco - vistas), (raio, cx, cy)
+            vistas |= disco
+        assert neblina.vistas == len(vistas)
+        assert all(neblina.visto(posicao) for posicao in vistas)
+        xs, ys = zip(*vistas)
+        origem = (min(xs) - 1, min(ys) - 1)
+        largura, altura = max(xs) - origem[0] + 2, max(ys) - origem[1] + 2
+        assert neblina.mascara(origem, largura, altura).sum() == len(vistas)
+    try:
+        mascaras(MAX_RAIO + 1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("mascaras() aceitou um raio maior que MAX_RAIO")
+    print(f"revelar() conferido até o raio {MAX_RAIO}.")
@@ -0,0 +1,199 @@
+# PoolMapas.py
+"""Pool de mapas gerados antes da hora, para uma Partida começar sem esperar.
+
+Uma thread de fundo mantém a fila de mapas prontos entre duas marcas: quando
+a fila cai abaixo de `minimo`, ela gera (na própria thread ou num pool de
+processos) até chegar em `maximo`. obter() nunca espera pela thread: se a fila
+estiver vazia, gera o mapa na hora. Os mapas também podem vir de um arquivo
+com mapas gerados antes (Salvamento.salvar_mapas/abrir_mapas): eles são lidos
+do arquivo aos poucos, só para completar a fila, antes de gerar mapas novos.
+Uma seed cujo mapa não pode ser gerado (GeradorMapa.ErroGeracao) é avisada no
+stderr e pulada.
+
+Cada mapa vem com a seed que o gerou (Forest.gerador_mapa), então
+Partida(player, seed=seed, mapa=mapa) é igual a Partida(player, seed=seed),
+desde que o pool use a estratégia e os recursos base (config.recursos_base)
+da Partida.
+"""
+import sys
+import queue
+import random
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import GeradorMapa
+from Forest import gerador_mapa
+from Salvamento import salvar_mapas, abrir_mapas
+
+MINIMO = 32 # Abaixo disso a thread volta a gerar
+MAXIMO = 256 # A thread gera até aqui
+TAMANHO_BLOCO = 32 # Mapas por tarefa, quando há processos
+
+
+def gerar_mapa_com_seed(seed, largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA,
+                        estrategia=GeradorMapa.ESTRATEGIA_PADRAO, recursos_base=GeradorMapa.RECURSOS_BASE):
+    """(seed, (grade, saida_pos)) do mapa que a Partida de seed `seed` (e mesma estratégia e recursos) usaria."""
+    return seed, GeradorMapa.gerar_mapa(largura, altura, gerador_mapa(seed), estrategia, recursos_base)
+
+
+def _gerar_ou_pular(seed, largura, altura, estrategia, recursos_base):
+    # None (com aviso no stderr) quando a seed não gera um mapa válido
+    try:
+        return gerar_mapa_com_seed(seed, largura, altura, estrategia, recursos_base)
+    except GeradorMapa.ErroGeracao as erro:
+        print(f"PoolMapas: seed {seed} pulada: {erro}", file=sys.stderr)
+        return None
+
+
+def _gerar_bloco(seeds, largura, altura, estrategia=GeradorMapa.ESTRATEGIA_PADRAO,
+                 recursos_base=GeradorMapa.RECURSOS_BASE):
+    prontos = (_gerar_ou_pular(seed, largura, altura, estrategia, recursos_base) for seed in seeds)
+    return [pronto for pronto in prontos if pronto is not None]
+
+
+class PoolMapas:
+    """Fila de mapas prontos, reabastecida em segundo plano."""
+    def __init__(self, largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA,
+                 minimo=MINIMO, maximo=MAXIMO, processos=0, seed=None, estrategia=GeradorMapa.ESTRATEGIA_PADRAO,
+                 recursos_base=GeradorMapa.RECURSOS_BASE):
+        if not 0 <= minimo <= maximo:
+            raise ValueError("As marcas precisam seguir 0 <= minimo <= maximo.")
+        self.largura = largura
+        self.altura = altura
+        self.minimo = minimo
+        self.maximo = maximo
+        self.estrategia = estrategia # As Partidas com estes mapas precisam usar a mesma
+        self.recursos_base = recursos_base # E a mesma tabela (Balanceamento.Configuracao.recursos_base)
+        self.prontos = queue.Queue()
+        self.geracoes_na_hora = 0 # Pedidos que encontraram a fila vazia
+        self._seeds = random.Random(seed)
+        self._trava_seeds = threading.Lock()
+        self._arquivos = [] # Iteradores dos arquivos carregados, com os mapas ainda não usados
+        self._trava_arquivos = threading.Lock()
+        self._precisa_gerar = threading.Event()
+        self._parar = threading.Event()
+        # spawn: os processos nascem da thread de fundo, e um fork com a thread principal no meio do jogo pode
+        # copiar travas presas e deixar os processos parados para sempre
+        self._executor = None
+        if processos:
+            self._executor = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn"))
+        self._thread = None
+
+    def iniciar(self):
+        """Começa a gerar em segundo plano."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._abastecer, name="PoolMapas", daemon=True)
+            self._thread.start()
+            self._precisa_gerar.set()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._precisa_gerar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *erro):
+        self.parar()
+
+    def __len__(self):
+        return self.prontos.qsize()
+
+    def _nova_seed(self):
+        with self._trava_seeds:
+            return self._seeds.getrandbits(63)
+
+    def obter(self):
+        """(seed, (grade, saida_pos)) de um mapa pronto, sem esperar pela thread."""
+        try:
+            pronto = self.prontos.get_nowait()
+        except queue.Empty:
+            pronto = self._do_arquivo()
+            if pronto is None:
+                self.geracoes_na_hora += 1
+            while pronto is None:
+                pronto = _gerar_ou_pular(self._nova_seed(), self.largura, self.altura, self.estrategia,
+                                         self.recursos_base)
+        if self.prontos.qsize() < self.minimo:
+            self._precisa_gerar.set()
+        return pronto
+
+    def adicionar(self, prontos):
+        """Coloca mapas já gerados (por exemplo, carregados do disco) na fila."""
+        for pronto in prontos:
+            self.prontos.put(pronto)
+
+    def carregar(self, caminho):
+        """Usa os mapas de um arquivo de Salvamento.salvar_mapas (lidos via mmap) antes de gerar novos.
+
+        Os mapas entram na fila aos poucos, conforme ela precisa, sem montar
+        todas as grades do arquivo de uma vez. O arquivo precisa ter o tamanho,
+        a estratégia e os recursos base do pool.
+        """
+        arquivo = abrir_mapas(caminho)
+        if (arquivo.largura, arquivo.altura) != (self.largura, self.altura):
+            raise ValueError(f"Os mapas de {caminho} não têm o tamanho dos mapas do pool.")
+        if arquivo.estrategia != self.estrategia or not np.array_equal(arquivo.recursos_base, self.recursos_base):
+            raise ValueError(f"Os mapas de {caminho} foram gerados com outra estratégia ou outros recursos base.")
+        with self._trava_arquivos:
+            self._arquivos.append(iter(arquivo))
+        self._precisa_gerar.set()
+
+    def _do_arquivo(self):
+        # Próximo mapa dos arquivos carregados, ou None quando acabaram
+        with self._trava_arquivos:
+            while self._arquivos:
+                try:
+                    return next(self._arquivos[0])
+                except StopIteration:
+                    self._arquivos.pop(0)
+        return None
+
+    def _abastecer(self):
+        while not self._parar.is_set():
+            self._precisa_gerar.wait()
+            self._precisa_gerar.clear()
+            while not self._parar.is_set() and self.prontos.qsize() < self.maximo:
+                pronto = self._do_arquivo()
+                if pronto is not None:
+                    self.prontos.put(pronto)
+                    continue
+                faltam = self.maximo - self.prontos.qsize()
+                if self._executor is None:
+                    pronto = _gerar_ou_pular(self._nova_seed(), self.largura, self.altura, self.estrategia,
+                                             self.recursos_base)
+                    if pronto is not None:
+                        self.prontos.put(pronto)
+                    continue
+                blocos = []
+                while faltam > 0:
+                    tamanho = min(TAMANHO_BLOCO, faltam)
+                    blocos.append([self._nova_seed() for _ in range(tamanho)])
+                    faltam -= tamanho
+                tarefas = [self._executor.submit(_gerar_bloco, bloco, self.largura, self.altura, self.estrategia,
+                                                 self.recursos_base) for bloco in blocos]
+                for tarefa in tarefas:
+                    self.adicionar(tarefa.result())
+
+
+if __name__ == "__main__":
+    import sys
+
+    # "python PoolMapas.py arquivo N" gera N mapas 9x9 e grava no arquivo
+    caminho, quantidade = sys.argv[1], int(sys.argv[2])
+    with ProcessPoolExecutor() as executor:
+        seeds = [random.getrandbits(63) for _ in range(quantidade)]
+        blocos = [seeds[i:i + TAMANHO_BLOCO] for i in range(0, quantidade, TAMANHO_BLOCO)]
+        prontos = [pronto for bloco in executor.map(_gerar_bloco, blocos, [GeradorMapa.MAPA_LARGURA] * len(blocos),
+                                                    [GeradorMapa.MAPA_ALTURA] * len(blocos)) for pronto in bloco]
+    salvar_mapas(caminho, prontos)
+    print(f"{len(prontos)} mapa(s) gravado(s) em {caminho}.")
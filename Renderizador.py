@@ -0,0 +1,189 @@
+# Renderizador.py
+"""Desenho do mapa no terminal com cache, janela de visão e minimapa.
+
+O texto de cada célula (abreviação com a cor já convertida em códigos ANSI)
+e de cada linha da grade fica guardado entre um desenho e outro; marcar()
+invalida só a célula alterada e a linha dela. O quadro inteiro é montado como
+uma única string e escrito no terminal de uma vez. Com uma Neblina, as células
+que o jogador ainda não viu ficam em branco (menos a saída).
+"""
+import math
+
+import numpy as np
+from rich.color import ColorSystem
+from rich.style import Style
+
+import GeradorMapa
+
+SISTEMAS_DE_COR = {
+    "standard": ColorSystem.STANDARD,
+    "256": ColorSystem.EIGHT_BIT,
+    "truecolor": ColorSystem.TRUECOLOR,
+    "windows": ColorSystem.WINDOWS,
+}
+
+JANELA_LARGURA = 15 # Tamanho máximo da janela de visão, em células
+JANELA_ALTURA = 15
+MAX_LINHAS_CACHE = 4096 # Linhas guardadas antes de limpar o cache
+MAX_CELULAS_CACHE = 65536 # Idem, para o texto das células
+
+
+class RenderizadorMapa:
+    """Desenha um mapa (Grade ou Mundo) reaproveitando o que não mudou.
+
+    Com `neblina`, só aparecem as células vistas; revelar células é avisado
+    com marcar_area().
+    """
+    def __init__(self, mapa, largura_celula=GeradorMapa.LARGURA_CELULA, console=GeradorMapa.console, neblina=None):
+        self.mapa = mapa
+        self.neblina = neblina
+        self.largura_celula = largura_celula
+        self.console = console
+        self.sistema_de_cor = SISTEMAS_DE_COR.get(console.color_system) # None: sem cores
+        self._estilos = {}
+        self._celulas = {} # posição -> texto da célula
+        self._linhas = {} # y -> {(x inicial, largura): texto da linha}
+
+    def _pintar(self, texto, estilo):
+        if self.sistema_de_cor is None:
+            return texto
+        prefixo_sufixo = self._estilos.get(estilo)
+        if prefixo_sufixo is None:
+            # Renderiza um marcador e separa os códigos de abertura e fechamento
+            pintado = Style.parse(estilo).render("\0", color_system=self.sistema_de_cor)
+            prefixo_sufixo = tuple(pintado.split("\0"))
+            self._estilos[estilo] = prefixo_sufixo
+        return prefixo_sufixo[0] + texto + prefixo_sufixo[1]
+
+    def marcar(self, posicao):
+        """Avisa que a célula mudou: ela e a linha dela serão redesenhadas."""
+        self._celulas.pop(posicao, None)
+        self._linhas.pop(posicao[1], None)
+
+    def marcar_area(self, centro, raio):
+        """marcar() para o quadrado de lado 2 * raio + 1 em volta de `centro`."""
+        cx, cy = centro
+        for y in range(cy - raio, cy + raio + 1):
+            self._linhas.pop(y, None)
+            for x in range(cx - raio, cx + raio + 1):
+                self._celulas.pop((x, y), None)
+
+    def marcar_tudo(self):
+        self._celulas.clear()
+        self._linhas.clear()
+
+    def _celula(self, posicao):
+        texto = self._celulas.get(posicao)
+        if texto is None:
+            terreno = self.mapa.get(posicao)
+            if terreno and self.neblina is not None and not terreno.saida and not self.neblina.visto(posicao):
+                texto = " " * self.largura_celula
+            elif terreno:
+                texto = self._pintar(f"{terreno.get_abreviacao():^{self.largura_celula}}", terreno.get_cor())
+            else:
+                texto = self._pintar(f"{'???':^{self.largura_celula}}", "white")
+            self._celulas[posicao] = texto
+        return texto
+
+    def _linha(self, y, ox, largura, largura_rotulo):
+        linhas = self._linhas.setdefault(y, {})
+        chave = (ox, largura, largura_rotulo)
+        texto = linhas.get(chave)
+        if texto is None:
+            barra = self._pintar("|", "dim")
+            partes = [self._pintar(f"{y:<{largura_rotulo}}", "dim"), barra]
+            for x in range(ox, ox + largura):
+                partes.append(self._celula((x, y)))
+                partes.append(barra)
+            texto = "".join(partes)
+            linhas[chave] = texto
+        return texto
+
+    def quadro(self, origem=(0, 0), largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA):
+        """Texto do trecho do mapa com canto superior esquerdo em `origem`."""
+        if len(self._linhas) > MAX_LINHAS_CACHE:
+            self._linhas.clear()
+        if len(self._celulas) > MAX_CELULAS_CACHE:
+            self._celulas.clear()
+        ox, oy = origem
+        largura_rotulo = max(len(str(oy)), len(str(oy + altura - 1)))
+        cabecalho = " " * (largura_rotulo + 1) + "".join(f"{x:^{self.largura_celula}}" for x in range(ox, ox + largura))
+        separador = self._pintar(" " * (largura_rotulo + 1) + "+" + ("-" * self.largura_celula + "+") * largura, "dim")
+
+        partes = ["", self._pintar("--- Mapa Pré-Gerado ---", "bold blue"), self._pintar(cabecalho, "bold yellow"), separador]
+        for y in range(oy, oy + altura):
+            partes.append(self._linha(y, ox, largura, largura_rotulo))
+            partes.append(separador)
+        partes.append(self._pintar("-----------------------------------------", "bold blue"))
+        partes.append("\n")
+        return "\n".join(partes)
+
+    def janela(self, centro, largura=JANELA_LARGURA, altura=JANELA_ALTURA):
+        """(origem, largura, altura) de uma janela em volta de `centro`, sem sair da grade."""
+        ox, oy = centro[0] - largura // 2, centro[1] - altura // 2
+        if isinstance(self.mapa, GeradorMapa.Grade):
+            gx, gy = self.mapa.origem
+            largura = min(largura, self.mapa.largura)
+            altura = min(altura, self.mapa.altura)
+            ox = min(max(ox, gx), gx + self.mapa.largura - largura)
+            oy = min(max(oy, gy), gy + self.mapa.altura - altura)
+        return (ox, oy), largura, altura
+
+    def minimapa(self, largura_max=60, altura_max=30, destaque=None):
+        """Mapa inteiro reduzido: cada caractere mostra o terreno mais comum de um bloco.
+
+        `destaque` é uma posição (o jogador, por exemplo) marcada com "@".
+        A saída aparece em laranja; com neblina, os blocos sem nenhuma célula
+        vista ficam em branco. Só para Grade.
+        """
+        grade = self.mapa
+        bloco = max(1, math.ceil(grade.largura / largura_max), math.ceil(grade.altura / altura_max))
+        colunas = math.ceil(grade.largura / bloco)
+        linhas = math.ceil(grade.altura / bloco)
+
+        # Completa a grade até múltiplos do bloco e conta cada tipo por bloco
+        tipos = np.zeros((linhas * bloco, colunas * bloco), dtype=np.uint8)
+        tipos[:grade.altura, :grade.largura] = grade.tipos
+        blocos = tipos.reshape(linhas, bloco, colunas, bloco)
+        contagens = np.stack([(blocos == id_tipo).sum(axis=(1, 3)) for id_tipo in range(len(GeradorMapa.TIPOS_TERRENO) + 1)])
+        contagens[0] = -1 # Preenchimento nunca vence
+        dominantes = contagens.argmax(axis=0)
+
+        saidas = np.zeros((linhas * bloco, colunas * bloco), dtype=bool)
+        saidas[:grade.altura, :grade.largura] = grade.flags & GeradorMapa.FLAG_SAIDA
+        saidas = saidas.reshape(linhas, bloco, colunas, bloco).any(axis=(1, 3))
+
+        vistos = None
+        if self.neblina is not None:
+            vistos = np.zeros((linhas * bloco, colunas * bloco), dtype=bool)
+            vistos[:grade.altura, :grade.largura] = self.neblina.mascara(grade.origem, grade.largura, grade.altura)
+            vistos = vistos.reshape(linhas, bloco, colunas, bloco).any(axis=(1, 3))
+
+        marcador = None
+        if destaque is not None:
+            marcador = ((destaque[1] - grade.origem[1]) // bloco, (destaque[0] - grade.origem[0]) // bloco)
+
+        partes = [self._pintar(f"--- Minimapa (1 caractere = {bloco}x{bloco}) ---", "bold blue")]
+        for y in range(linhas):
+            linha = []
+            for x in range(colunas):
+                if (y, x) == marcador:
+                    linha.append(self._pintar("@", "bold white"))
+                elif saidas[y, x]:
+                    linha.append(self._pintar("█", "orange1"))
+                elif vistos is not None and not vistos[y, x]:
+                    linha.append(" ")
+                else:
+                    tipo = GeradorMapa.TIPOS_TERRENO[dominantes[y, x] - 1]
+                    linha.append(self._pintar("█", GeradorMapa.CORES_TERRENO[tipo]))
+            partes.append("".join(linha))
+        partes.append("")
+        return "\n".join(partes)
+
+    def desenhar(self, origem=(0, 0), largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA, minimapa=False, destaque=None):
+        """Escreve o quadro (e, opcionalmente, o minimapa) numa única escrita no terminal."""
+        texto = self.quadro(origem, largura, altura)
+        if minimapa:
+            texto += self.minimapa(destaque=destaque)
+        self.console.file.write(texto)
+        self.console.file.flush()
@@ -0,0 +1,137 @@
+# Replay.py
+"""Reprodução de partidas a partir da trilha: a seed e as respostas dadas.
+
+A partida é determinística dada a seed (mapa e sorteios), a configuração de
+balanceamento e as respostas a ler(): escolhas do menu, direções, quantidade de comida, horas de descanso e
+respostas dos eventos aleatórios. Essa trilha vai no registro do resultado (e
+no banco de resultados), e basta para refazer a partida. reproduzir() joga a
+trilha sem saída nem pausas; verificar() compara o resultado com o registrado.
+Depois de uma mudança nas regras, o replay em lote do banco mostra quais
+partidas passaram a terminar de outro jeito.
+
+    python Replay.py resultados.db --processos 4
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import GeradorMapa
+import Balanceamento
+from Forest import Jogador, Partida, FimDeJogo, montar_resultado
+from Mundo import Mundo
+from Resultados import ArmazemResultados, ARQUIVO_RESULTADOS
+from Simulador import TerminalSilencioso
+
+# Campos do registro que a reprodução precisa repetir
+CAMPOS_COMPARADOS = ("status", "dias_sobrevividos", "motivo", "mochila", "tem_cabana")
+
+
+class TrilhaEsgotada(Exception):
+    """A trilha acabou antes do fim da partida."""
+
+
+def _esgotada(prompt):
+    raise TrilhaEsgotada(prompt)
+
+
+def reproduzir(seed, trilha, mundo=False, estrategia=None, config=None):
+    """Joga a partida de seed `seed` com as respostas da trilha e devolve o registro do resultado.
+
+    Se as respostas acabarem antes do fim (partidas interrompidas, ou
+    cortadas pelo limite de ações do Simulador), o status é "limite".
+    `estrategia` é a de GeradorMapa.gerar_mapa e `config` a
+    Balanceamento.Configuracao da partida (None: as padrão, como nos registros
+    de antes das colunas).
+    """
+    terminal = TerminalSilencioso(_esgotada)
+    terminal.respostas.extend(trilha)
+    jogador = Jogador(vida=100, energia=100, fome=100)
+    partida = Partida(jogador, terminal=terminal, salvar=False, seed=seed, mundo=Mundo(seed) if mundo else None,
+                      estrategia=estrategia or GeradorMapa.ESTRATEGIA_PADRAO, config=config or Balanceamento.PADRAO)
+    try:
+        while True:
+            partida.turno()
+    except FimDeJogo as fim:
+        return fim.resultado
+    except TrilhaEsgotada:
+        return montar_resultado(jogador, partida, "limite")
+
+
+def verificar(registro):
+    """Reproduz a partida do registro e lista as diferenças (campo, registrado, reproduzido).
+
+    Retorna None se o registro não tem trilha.
+    """
+    if registro.get("trilha") is None or registro.get("seed") is None:
+        return None
+    # O registro guarda só o que difere da configuração padrão
+    config = Balanceamento.PADRAO.com(registro["config"]) if registro.get("config") else None
+    resultado = reproduzir(registro["seed"], registro["trilha"], registro.get("mundo", False),
+                           registro.get("estrategia"), config)
+    return [(campo, registro.get(campo), resultado[campo])
+            for campo in CAMPOS_COMPARADOS if registro.get(campo) != resultado[campo]]
+
+
+def _verificar_bloco(registros):
+    return [verificar(registro) for registro in registros]
+
+
+def verificar_lote(registros, processos=None, tamanho_bloco=200):
+    """Verifica os registros num pool de processos, gerando (registro, diferenças) em ordem."""
+    def blocos():
+        bloco = []
+        for registro in registros:
+            bloco.append(registro)
+            if len(bloco) == tamanho_bloco:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+
+    if processos == 1:
+        for bloco in blocos():
+            yield from zip(bloco, _verificar_bloco(bloco))
+        return
+
+    adiantados = 4 * (processos or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        pendentes = []
+        for bloco in blocos():
+            pendentes.append((bloco, executor.submit(_verificar_bloco, bloco)))
+            # Poucos blocos adiantados: o banco pode ter mais registros do que cabe na memória
+            if len(pendentes) > adiantados:
+                bloco, futuro = pendentes.pop(0)
+                yield from zip(bloco, futuro.result())
+        for bloco, futuro in pendentes:
+            yield from zip(bloco, futuro.result())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduz as partidas do banco de resultados e confere os finais.")
+    parser.add_argument("banco", nargs="?", default=ARQUIVO_RESULTADOS)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--status", default=None, help="só as partidas com este status")
+    parser.add_argument("--mostrar", type=int, default=10, help="quantas divergências listar")
+    args = parser.parse_args()
+
+    iguais = divergentes = sem_trilha = 0
+    inicio = time.perf_counter()
+    with ArmazemResultados(args.banco) as armazem:
+        for registro, diferencas in verificar_lote(armazem.registros(status=args.status), args.processos):
+            if diferencas is None:
+                sem_trilha += 1
+            elif diferencas:
+                divergentes += 1
+                if divergentes <= args.mostrar:
+                    detalhes = "; ".join(f"{campo}: {antes!r} -> {depois!r}" for campo, antes, depois in diferencas)
+                    print(f"Seed {registro['seed']}: {detalhes}")
+            else:
+                iguais += 1
+    duracao = time.perf_counter() - inicio
+
+    reproduzidas = iguais + divergentes
+    print(f"Reproduzidas: {reproduzidas} em {duracao:.1f}s ({reproduzidas / duracao if duracao else 0:.0f} por segundo)")
+    print(f"Iguais: {iguais} | Divergentes: {divergentes} | Sem trilha: {sem_trilha}")
+    sys.exit(1 if divergentes else 0)
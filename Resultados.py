@@ -0,0 +1,200 @@
+# Resultados.py
+"""Armazenamento dos resultados das partidas em SQLite.
+
+Cada fim de partida vira uma linha nova (nada é reescrito), as gravações são
+feitas em lotes e o modo WAL do SQLite permite vários processos gravando ao
+mesmo tempo. As consultas de estatísticas são feitas pelo próprio banco, com
+índices em status, dias_sobrevividos e motivo, sem carregar o histórico todo.
+
+A trilha de cada partida (as respostas dadas, que com a seed e a configuração
+refazem a partida; ver Replay.py) é gravada compactada com zlib.
+"""
+import json
+import zlib
+import sqlite3
+
+from Salvamento import texto_trilha, respostas_trilha
+
+ARQUIVO_RESULTADOS = "resultados.db"
+TAMANHO_LOTE = 500 # Registros acumulados antes de gravar
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    dias_sobrevividos INTEGER NOT NULL,
+    motivo TEXT,
+    mochila TEXT NOT NULL,
+    tem_cabana INTEGER NOT NULL,
+    seed INTEGER,
+    mundo INTEGER,
+    trilha BLOB,
+    estrategia TEXT,
+    config TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_status ON resultados (status);
+CREATE INDEX IF NOT EXISTS idx_resultados_dias ON resultados (dias_sobrevividos);
+CREATE INDEX IF NOT EXISTS idx_resultados_motivo ON resultados (motivo);
+"""
+
+COLUNAS = ("status", "dias_sobrevividos", "motivo", "mochila", "tem_cabana", "seed", "mundo", "trilha", "estrategia",
+           "config")
+
+
+def empacotar_trilha(respostas):
+    return zlib.compress(texto_trilha(respostas).encode("utf-8"), 9)
+
+
+def desempacotar_trilha(dados):
+    return respostas_trilha(zlib.decompress(dados).decode("utf-8"))
+
+
+class ArmazemResultados:
+    """Banco de resultados com gravação em lote. Use com `with` para gravar o que faltar."""
+    def __init__(self, caminho=ARQUIVO_RESULTADOS, tamanho_lote=TAMANHO_LOTE):
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.pendentes = []
+        # timeout: espera outro processo terminar de gravar em vez de falhar
+        self.conexao = sqlite3.connect(caminho, timeout=60, isolation_level=None)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.conexao.executescript(ESQUEMA)
+        self._atualizar_esquema()
+
+    def _atualizar_esquema(self):
+        # Bancos criados antes das colunas seed, mundo, trilha, estrategia e config
+        colunas = {linha[1] for linha in self.conexao.execute("PRAGMA table_info(resultados)")}
+        for coluna, tipo in (("seed", "INTEGER"), ("mundo", "INTEGER"), ("trilha", "BLOB"),
+                             ("estrategia", "TEXT"), ("config", "TEXT")):
+            if coluna not in colunas:
+                self.conexao.execute(f"ALTER TABLE resultados ADD COLUMN {coluna} {tipo}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.fechar()
+
+    def adicionar(self, registro):
+        """Acumula um registro (o dicionário de montar_resultado) para gravar no próximo lote."""
+        self.pendentes.append(tuple(self._linha(registro)))
+        if len(self.pendentes) >= self.tamanho_lote:
+            self.gravar()
+
+    def _linha(self, registro):
+        for coluna in COLUNAS:
+            valor = registro.get(coluna)
+            if coluna in ("mochila", "config"):
+                valor = json.dumps(valor or {}, ensure_ascii=False)
+            elif coluna in ("tem_cabana", "mundo"):
+                valor = int(bool(valor))
+            elif coluna == "trilha" and valor is not None:
+                valor = empacotar_trilha(valor)
+            yield valor
+
+    def gravar(self):
+        """Grava os registros pendentes numa única transação."""
+        if not self.pendentes:
+            return
+        colunas = ", ".join(COLUNAS)
+        marcadores = ", ".join("?" * len(COLUNAS))
+        self.conexao.execute("BEGIN IMMEDIATE")
+        try:
+            self.conexao.executemany(f"INSERT INTO resultados ({colunas}) VALUES ({marcadores})", self.pendentes)
+            self.conexao.execute("COMMIT")
+        except BaseException:
+            self.conexao.execute("ROLLBACK")
+            raise
+        self.pendentes.clear()
+
+    def fechar(self):
+        self.gravar()
+        self.conexao.close()
+
+    def importar_json(self, caminho):
+        """Importa um resultados.json antigo (lista de registros)."""
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        if not isinstance(dados, list):
+            dados = [dados]
+        for registro in dados:
+            self.adicionar(registro)
+        self.gravar()
+        return len(dados)
+
+    # --- Consultas ---
+
+    def registros(self, status=None, motivo=None, min_dias=None, max_dias=None):
+        """Percorre os registros que atendem aos filtros, um por vez."""
+        condicoes, parametros = [], []
+        for condicao, valor in (("status = ?", status), ("motivo = ?", motivo),
+                                ("dias_sobrevividos >= ?", min_dias), ("dias_sobrevividos <= ?", max_dias)):
+            if valor is not None:
+                condicoes.append(condicao)
+                parametros.append(valor)
+        onde = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        cursor = self.conexao.execute(f"SELECT {', '.join(COLUNAS)} FROM resultados{onde} ORDER BY id", parametros)
+        for linha in cursor:
+            registro = dict(zip(COLUNAS, linha))
+            registro["mochila"] = json.loads(registro["mochila"])
+            registro["config"] = json.loads(registro["config"] or "{}") # Vazio: a configuração padrão
+            registro["tem_cabana"] = bool(registro["tem_cabana"])
+            registro["mundo"] = bool(registro["mundo"])
+            if registro["trilha"] is not None:
+                registro["trilha"] = desempacotar_trilha(registro["trilha"])
+            yield registro
+
+    def total(self, status=None):
+        if status is None:
+            return self.conexao.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        return self.conexao.execute("SELECT COUNT(*) FROM resultados WHERE status = ?", (status,)).fetchone()[0]
+
+    def taxa_vitoria(self):
+        """Fração das partidas terminadas em vitória (0 se não houver partidas)."""
+        total = self.total()
+        return self.total("vitória") / total if total else 0.0
+
+    def histograma_dias(self, status=None):
+        """Dicionário dias_sobrevividos -> número de partidas."""
+        if status is None:
+            cursor = self.conexao.execute(
+                "SELECT dias_sobrevividos, COUNT(*) FROM resultados GROUP BY dias_sobrevividos ORDER BY dias_sobrevividos")
+        else:
+            cursor = self.conexao.execute(
+                "SELECT dias_sobrevividos, COUNT(*) FROM resultados WHERE status = ? "
+                "GROUP BY dias_sobrevividos ORDER BY dias_sobrevividos", (status,))
+        return dict(cursor.fetchall())
+
+    def causas_morte(self, limite=None):
+        """Lista (motivo, quantidade) das derrotas, da causa mais comum para a menos."""
+        consulta = ("SELECT motivo, COUNT(*) AS quantidade FROM resultados WHERE status = 'derrota' "
+                    "GROUP BY motivo ORDER BY quantidade DESC")
+        if limite is not None:
+            consulta += f" LIMIT {int(limite)}"
+        return self.conexao.execute(consulta).fetchall()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # "python Resultados.py [arquivo.db] [--importar resultados.json]" mostra as estatísticas
+    argumentos = sys.argv[1:]
+    importar = None
+    if "--importar" in argumentos:
+        indice = argumentos.index("--importar")
+        importar = argumentos[indice + 1]
+        del argumentos[indice:indice + 2]
+    caminho = argumentos[0] if argumentos else ARQUIVO_RESULTADOS
+
+    with ArmazemResultados(caminho) as armazem:
+        if importar:
+            print(f"{armazem.importar_json(importar)} registro(s) importado(s) de {importar}.")
+        print(f"Partidas: {armazem.total()}")
+        print(f"Taxa de vitória: {armazem.taxa_vitoria():.2%}")
+        print("Dias sobrevividos:")
+        for dias, quantidade in armazem.histograma_dias().items():
+            print(f"  {dias:>4}: {quantidade}")
+        print("Causas de morte:")
+        for motivo, quantidade in armazem.causas_morte(10):
+            print(f"  {quantidade:>6}x {motivo}")
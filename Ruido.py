@@ -0,0 +1,69 @@
+# Ruido.py
+"""Campos de ruído de valor (value noise) calculados com NumPy, para mapas grandes.
+
+Cada oitava sorteia valores numa rede grossa e interpola entre eles com
+smoothstep. A interpolação é separável: primeiro ao longo de x, só nas linhas
+da rede, e depois ao longo de y, então o custo é proporcional ao número de
+células do mapa, sem laços em Python por célula. fbm() soma oitavas cada vez
+mais finas e mais fracas.
+"""
+import numpy as np
+
+BLOCO_LINHAS = 256 # Linhas interpoladas por vez (os temporários cabem no cache)
+
+
+def _coordenadas(tamanho, escala):
+    # Índice da célula da rede à esquerda de cada posição e a fração suavizada até ela
+    posicoes = np.arange(tamanho, dtype=np.float32) / np.float32(escala)
+    indices = posicoes.astype(np.int64)
+    fracao = posicoes - indices.astype(np.float32)
+    return indices, fracao * fracao * (3 - 2 * fracao)
+
+
+def _somar_oitava(total, peso, escala, gerador):
+    """Soma em `total` (altura, largura) uma camada de ruído de valor com o peso dado."""
+    altura, largura = total.shape
+    escala = max(float(escala), 1.0)
+    rede = gerador.random((int(altura / escala) + 2, int(largura / escala) + 2), dtype=np.float32)
+    ix, tx = _coordenadas(largura, escala)
+    iy, ty = _coordenadas(altura, escala)
+    # Ao longo de x só nas linhas da rede; ao longo de y, por blocos de linhas do mapa
+    linhas = (rede[:, ix] * (1 - tx) + rede[:, ix + 1] * tx) * np.float32(peso)
+    passos = linhas[1:] - linhas[:-1]
+    base = np.empty((BLOCO_LINHAS, largura), dtype=np.float32)
+    inclinacao = np.empty((BLOCO_LINHAS, largura), dtype=np.float32)
+    for inicio in range(0, altura, BLOCO_LINHAS):
+        fim = min(inicio + BLOCO_LINHAS, altura)
+        b, i = base[:fim - inicio], inclinacao[:fim - inicio]
+        np.take(linhas, iy[inicio:fim], axis=0, out=b)
+        np.take(passos, iy[inicio:fim], axis=0, out=i)
+        i *= ty[inicio:fim, None]
+        b += i
+        total[inicio:fim] += b
+
+
+def ruido_valor(largura, altura, escala, gerador):
+    """Array (altura, largura) em [0, 1): valores da rede a cada `escala` células, interpolados."""
+    total = np.zeros((altura, largura), dtype=np.float32)
+    _somar_oitava(total, 1.0, escala, gerador)
+    return total
+
+
+def fbm(largura, altura, escala, oitavas, gerador, persistencia=0.5):
+    """Soma de `oitavas` camadas de ruido_valor, cada uma com metade da escala da anterior.
+
+    O peso de cada camada é `persistencia` vezes o da anterior; o resultado é
+    normalizado para [0, 1).
+    """
+    total = np.zeros((altura, largura), dtype=np.float32)
+    amplitude = 1.0
+    soma = 0.0
+    for _ in range(oitavas):
+        _somar_oitava(total, amplitude, escala, gerador)
+        soma += amplitude
+        amplitude *= persistencia
+        escala /= 2
+        if escala < 1:
+            break
+    total /= np.float32(soma)
+    return total
@@ -0,0 +1,346 @@
+# Salvamento.py
+"""Formato binário de mapas e de partidas em andamento.
+
+Todo arquivo começa com o mesmo cabeçalho de 32 bytes (assinatura, versão,
+tipo de conteúdo e dimensões da grade). Num arquivo de mapas vêm depois a
+estratégia e a tabela de recursos base com que foram gerados e os registros,
+de tamanho fixo, então um arquivo com milhões de mapas pode ser aberto com mmap
+(abrir_mapas) e qualquer mapa é lido direto do arquivo, sem cópia e sem ler os
+outros. Uma partida salva é o cabeçalho, o estado do jogador e da partida, o
+registro do mapa dela, a hora da última coleta de cada célula, a trilha das
+respostas dadas até ali, a estratégia que gerou o mapa, os blocos da neblina
+(as células que o jogador já viu) e a configuração de balanceamento, em JSON.
+"""
+import json
+import struct
+
+import numpy as np
+
+import GeradorMapa
+import Neblina
+
+ASSINATURA = b"FLRS"
+VERSAO = 1
+
+CONTEUDO_MAPAS = 1
+CONTEUDO_PARTIDA = 2
+
+# assinatura, versão, conteúdo, recursos por célula, largura, altura, quantidade de registros
+CABECALHO = struct.Struct("<4sHBBHHQ12x")
+# seed, vida, energia, fome, dia, hora, x, y, tem_mapa, tem_cabana, gauss_next, proximo_evento
+# (vida, energia e fome em double: a comida estragada deixa a vida fracionária)
+ESTADO = struct.Struct("<q3d4i2?dd")
+ESTADO_RNG = 625 # Inteiros de 32 bits no estado do random.Random
+TEXTO = struct.Struct("<H") # Tamanho de um texto UTF-8
+QUANTIDADE = struct.Struct("<i")
+
+
+class ErroSalvamento(ValueError):
+    """Arquivo que não é deste formato, de outra versão ou corrompido."""
+
+
+def tipo_registro(largura, altura):
+    """dtype de um mapa salvo: seed, saída e os arrays da Grade."""
+    return np.dtype([
+        ("seed", "<i8"),
+        ("saida", "<i4", (2,)),
+        ("tipos", "u1", (altura, largura)),
+        ("tempos", "u1", (altura, largura)),
+        ("flags", "u1", (altura, largura)),
+        ("recursos", "u1", (altura, largura, len(GeradorMapa.NOMES_RECURSOS))),
+    ])
+
+
+def _cabecalho(conteudo, largura, altura, quantidade):
+    return CABECALHO.pack(ASSINATURA, VERSAO, conteudo, len(GeradorMapa.NOMES_RECURSOS), largura, altura, quantidade)
+
+
+def _ler_cabecalho(dados, conteudo):
+    if len(dados) < CABECALHO.size:
+        raise ErroSalvamento("Arquivo curto demais.")
+    assinatura, versao, tipo, num_recursos, largura, altura, quantidade = CABECALHO.unpack_from(dados)
+    if assinatura != ASSINATURA:
+        raise ErroSalvamento("Não é um arquivo salvo do jogo.")
+    if versao != VERSAO:
+        raise ErroSalvamento(f"Versão {versao} não suportada (esperada {VERSAO}).")
+    if tipo != conteudo:
+        raise ErroSalvamento("O arquivo não tem o conteúdo esperado.")
+    if num_recursos != len(GeradorMapa.NOMES_RECURSOS):
+        raise ErroSalvamento("Número de recursos por célula diferente do desta versão do jogo.")
+    return largura, altura, quantidade
+
+
+def _preencher(registro, seed, grade, saida_pos):
+    registro["seed"] = seed
+    registro["saida"] = (saida_pos[0] - grade.origem[0], saida_pos[1] - grade.origem[1])
+    registro["tipos"] = grade.tipos
+    registro["tempos"] = grade.tempos
+    registro["flags"] = grade.flags
+    registro["recursos"] = grade.recursos
+
+
+def _grade(registro):
+    # Os campos do registro são visões do buffer (ou do mmap): a grade não copia nada
+    grade = GeradorMapa.Grade.de_arrays(registro["tipos"], registro["tempos"], registro["recursos"], registro["flags"])
+    return grade, tuple(registro["saida"].tolist())
+
+
+def _empacotar_texto(texto):
+    dados = texto.encode("utf-8")
+    return TEXTO.pack(len(dados)) + dados
+
+
+def _desempacotar_texto(dados, inicio):
+    (tamanho,) = TEXTO.unpack_from(dados, inicio)
+    inicio += TEXTO.size
+    return bytes(dados[inicio:inicio + tamanho]).decode("utf-8"), inicio + tamanho
+
+
+# --- Coleções de mapas ---
+
+def salvar_mapas(caminho, prontos, estrategia=GeradorMapa.ESTRATEGIA_PADRAO, recursos_base=GeradorMapa.RECURSOS_BASE):
+    """Grava uma lista de (seed, (grade, saida_pos)), todas do mesmo tamanho.
+
+    `estrategia` e `recursos_base` são os de GeradorMapa.gerar_mapa que geraram
+    os mapas; vão junto no arquivo.
+    """
+    largura, altura = prontos[0][1][0].largura, prontos[0][1][0].altura
+    registros = np.zeros(len(prontos), dtype=tipo_registro(largura, altura))
+    for registro, (seed, (grade, saida_pos)) in zip(registros, prontos):
+        if (grade.largura, grade.altura) != (largura, altura):
+            raise ValueError("Todos os mapas de um arquivo precisam ter o mesmo tamanho.")
+        _preencher(registro, seed, grade, saida_pos)
+    with open(caminho, "wb") as f:
+        f.write(_cabecalho(CONTEUDO_MAPAS, largura, altura, len(prontos)))
+        f.write(_empacotar_texto(estrategia))
+        f.write(np.asarray(recursos_base, dtype="u1").tobytes())
+        f.write(registros.tobytes())
+
+
+class ArquivoMapas:
+    """Mapas de um arquivo de salvar_mapas, lidos sob demanda via mmap.
+
+    Abrir o arquivo não lê os mapas; cada acesso monta uma Grade sobre a parte
+    do arquivo daquele mapa. O mapeamento é copy-on-write: a partida pode
+    alterar a grade (colher recursos, construir a cabana) sem mudar o arquivo.
+    `estrategia` e `recursos_base` são os que geraram os mapas.
+    """
+    def __init__(self, caminho):
+        with open(caminho, "rb") as f:
+            self.largura, self.altura, quantidade = _ler_cabecalho(f.read(CABECALHO.size), CONTEUDO_MAPAS)
+            try:
+                (tamanho,) = TEXTO.unpack(f.read(TEXTO.size))
+                self.estrategia = f.read(tamanho).decode("utf-8")
+                tabela = np.frombuffer(f.read(GeradorMapa.RECURSOS_BASE.nbytes), dtype="u1")
+                tabela = tabela.reshape(GeradorMapa.RECURSOS_BASE.shape)
+            except (struct.error, ValueError) as erro:
+                raise ErroSalvamento("Arquivo de mapas incompleto ou corrompido.") from erro
+            inicio = f.tell()
+        # A própria RECURSOS_BASE quando não mudou, como em Balanceamento.Configuracao
+        self.recursos_base = GeradorMapa.RECURSOS_BASE if np.array_equal(tabela, GeradorMapa.RECURSOS_BASE) else tabela
+        self.caminho = caminho
+        self.registros = np.memmap(caminho, dtype=tipo_registro(self.largura, self.altura), mode="c",
+                                   offset=inicio, shape=(quantidade,))
+
+    def __len__(self):
+        return len(self.registros)
+
+    def __getitem__(self, indice):
+        """(seed, (grade, saida_pos)) do mapa de número `indice`."""
+        registro = self.registros[indice]
+        grade, saida_pos = _grade(registro)
+        if self.recursos_base is not GeradorMapa.RECURSOS_BASE:
+            grade.taxa_regeneracao = self.recursos_base / GeradorMapa.HORAS_REGENERACAO
+        return int(registro["seed"]), (grade, saida_pos)
+
+    def __iter__(self):
+        for indice in range(len(self)):
+            yield self[indice]
+
+    def amostra(self, quantidade, rng):
+        """`quantidade` mapas sorteados sem repetição, lendo só esses do disco."""
+        return [self[indice] for indice in rng.sample(range(len(self)), quantidade)]
+
+
+def abrir_mapas(caminho):
+    return ArquivoMapas(caminho)
+
+
+def carregar_mapas(caminho):
+    """Todos os mapas do arquivo, em memória (para arquivos pequenos)."""
+    prontos = []
+    for seed, (grade, saida_pos) in ArquivoMapas(caminho):
+        copia = GeradorMapa.Grade.de_arrays(grade.tipos.copy(), grade.tempos.copy(), grade.recursos.copy(),
+                                            grade.flags.copy())
+        copia.taxa_regeneracao = grade.taxa_regeneracao
+        prontos.append((seed, (copia, saida_pos)))
+    return prontos
+
+
+# --- Partidas em andamento ---
+
+def _atributo(valor):
+    # Vida, energia e fome inteiras voltam como int, como eram antes de salvar
+    return int(valor) if float(valor).is_integer() else valor
+
+
+def texto_trilha(respostas):
+    """As respostas de uma trilha num texto, cada uma terminada por \\n."""
+    return "".join(f"{resposta}\n" for resposta in respostas)
+
+
+def respostas_trilha(texto):
+    return texto.split("\n")[:-1]
+
+
+def empacotar_partida(estado, grade, saida_pos):
+    """Bytes de uma partida: o dicionário `estado` (ver desempacotar_partida) e o mapa."""
+    versao_rng, estado_rng, gauss_next = estado["rng"]
+    x, y = estado["posicao"]
+    try:
+        partes = [
+            _cabecalho(CONTEUDO_PARTIDA, grade.largura, grade.altura, 1),
+            ESTADO.pack(estado["seed"], estado["vida"], estado["energia"], estado["fome"], estado["dia"],
+                                 estado["hora"], x, y, estado["tem_mapa"], estado["tem_cabana"],
+                                 float("nan") if gauss_next is None else gauss_next, estado["proximo_evento"]),
+            np.array(estado_rng, dtype="<u4").tobytes(),
+            QUANTIDADE.pack(len(estado["mochila"])),
+        ]
+        for item, quantidade in estado["mochila"].items():
+            partes.append(_empacotar_texto(item))
+            partes.append(QUANTIDADE.pack(quantidade))
+    except struct.error as erro:
+        raise ErroSalvamento(f"O estado da partida não cabe no formato salvo: {erro}") from erro
+    partes.append(_empacotar_texto(estado["mensagem"]))
+
+    registro = np.zeros(1, dtype=tipo_registro(grade.largura, grade.altura))
+    _preencher(registro[0], estado["seed"], grade, saida_pos)
+    partes.append(registro.tobytes())
+    partes.append(grade.colhido.astype("<f4").tobytes())
+    trilha = texto_trilha(estado["trilha"]).encode("utf-8")
+    partes.append(QUANTIDADE.pack(len(trilha)))
+    partes.append(trilha)
+    partes.append(_empacotar_texto(estado["estrategia"]))
+    # Neblina: as coordenadas dos blocos e depois os bits deles, bloco a bloco
+    blocos = estado["neblina"]
+    partes.append(QUANTIDADE.pack(len(blocos)))
+    partes.append(np.array(list(blocos), dtype="<i4").reshape(len(blocos), 2).tobytes())
+    partes.append(np.array(list(blocos.values()), dtype="<u8").reshape(len(blocos), Neblina.BLOCO).tobytes())
+    partes.append(_empacotar_texto(json.dumps(estado["config"], sort_keys=True, ensure_ascii=False)))
+    return b"".join(partes)
+
+
+def desempacotar_partida(dados):
+    """(estado, grade, saida_pos) de bytes de empacotar_partida.
+
+    `estado` tem seed, vida, energia, fome, dia, hora, proximo_evento (horário
+    do próximo evento aleatório), posicao, tem_mapa, tem_cabana, mochila,
+    mensagem, rng (o getstate() do gerador), trilha (lista de respostas),
+    estrategia (a de GeradorMapa.gerar_mapa), neblina (os blocos de
+    Neblina.Neblina) e config (o como_dict() de Balanceamento.Configuracao).
+    A grade usa o próprio buffer `dados` quando ele é gravável (bytearray).
+    """
+    largura, altura, _ = _ler_cabecalho(dados, CONTEUDO_PARTIDA)
+    try:
+        inicio = CABECALHO.size
+        (seed, vida, energia, fome, dia, hora, x, y, tem_mapa, tem_cabana, gauss_next,
+         proximo_evento) = ESTADO.unpack_from(dados, inicio)
+        vida, energia, fome = (_atributo(valor) for valor in (vida, energia, fome))
+        inicio += ESTADO.size
+        estado_rng = tuple(np.frombuffer(dados, dtype="<u4", count=ESTADO_RNG, offset=inicio).tolist())
+        inicio += ESTADO_RNG * 4
+
+        mochila = {}
+        (itens,) = QUANTIDADE.unpack_from(dados, inicio)
+        inicio += QUANTIDADE.size
+        for _ in range(itens):
+            item, inicio = _desempacotar_texto(dados, inicio)
+            (mochila[item],) = QUANTIDADE.unpack_from(dados, inicio)
+            inicio += QUANTIDADE.size
+        mensagem, inicio = _desempacotar_texto(dados, inicio)
+
+        tipo = tipo_registro(largura, altura)
+        registro = np.frombuffer(dados, dtype=tipo, count=1, offset=inicio)[0]
+        inicio += tipo.itemsize
+        colhido = np.frombuffer(dados, dtype="<f4", count=largura * altura, offset=inicio).reshape(altura, largura)
+        inicio += colhido.nbytes
+        (tamanho,) = QUANTIDADE.unpack_from(dados, inicio)
+        inicio += QUANTIDADE.size
+        if tamanho < 0 or inicio + tamanho > len(dados):
+            raise ValueError("Trilha incompleta.")
+        trilha = respostas_trilha(bytes(dados[inicio:inicio + tamanho]).decode("utf-8"))
+        inicio += tamanho
+        estrategia, inicio = _desempacotar_texto(dados, inicio)
+        (quantidade,) = QUANTIDADE.unpack_from(dados, inicio)
+        inicio += QUANTIDADE.size
+        chaves = np.frombuffer(dados, dtype="<i4", count=2 * quantidade, offset=inicio).reshape(quantidade, 2)
+        inicio += chaves.nbytes
+        bits = np.frombuffer(dados, dtype="<u8", count=quantidade * Neblina.BLOCO, offset=inicio)
+        bits = bits.reshape(quantidade, Neblina.BLOCO).astype(np.uint64) # Cópia: os blocos são alterados
+        neblina = {(int(bx), int(by)): bloco for (bx, by), bloco in zip(chaves, bits)}
+        inicio += bits.nbytes
+        texto, inicio = _desempacotar_texto(dados, inicio)
+        config = json.loads(texto)
+    except (struct.error, ValueError) as erro:
+        raise ErroSalvamento("Partida salva incompleta ou corrompida.") from erro
+
+    estado = {
+        "seed": seed, "vida": vida, "energia": energia, "fome": fome, "dia": dia, "hora": hora,
+        "proximo_evento": proximo_evento, "posicao": (x, y), "tem_mapa": tem_mapa, "tem_cabana": tem_cabana, "mochila": mochila,
+        "mensagem": mensagem, "rng": (3, estado_rng, None if gauss_next != gauss_next else gauss_next),
+        "trilha": trilha, "estrategia": estrategia, "neblina": neblina, "config": config,
+    }
+    grade, saida_pos = _grade(registro)
+    grade.colhido = colhido
+    return estado, grade, saida_pos
+
+
+if __name__ == "__main__":
+    # Ida e volta de partidas salvas: python Salvamento.py
+    import random
+
+    import Balanceamento
+    from Forest import Partida
+    from Simulador import Motor, bot_aleatorio, TerminalSilencioso
+
+    CAMPOS = ("vida", "energia", "fome", "dia", "hora", "mochila", "tem_mapa", "tem_cabana", "trilha", "estrategia",
+              "config")
+
+    def estado(jogo):
+        return {campo: getattr(jogo.player, campo) if hasattr(jogo.player, campo) else getattr(jogo, campo)
+                for campo in CAMPOS}
+
+    def conferir(partida):
+        copia = Partida.restaurar(bytearray(partida.instantaneo()), terminal=TerminalSilencioso(), salvar=False)
+        assert estado(copia) == estado(partida), (estado(partida), estado(copia))
+        assert copia.player.terreno_atual.posicao == partida.player.terreno_atual.posicao
+        assert copia.rng.getstate() == partida.rng.getstate()
+        assert (copia.mapa.recursos == partida.mapa.recursos).all() and copia.neblina.vistas == partida.neblina.vistas
+        assert np.array_equal(copia.mapa.taxa_regeneracao, partida.mapa.taxa_regeneracao)
+
+    conferidas = 0
+    for seed in range(200):
+        motor = Motor(seed)
+        rng = random.Random(seed)
+        while motor.resultado is None and motor.num_acoes < 200:
+            acao, respostas = bot_aleatorio(motor, rng)
+            motor.executar(acao, *respostas)
+            if motor.resultado is None:
+                conferir(motor.partida)
+                conferidas += 1
+
+    # Comida estragada tira 15% da vida, que fica fracionária
+    motor = Motor(0)
+    motor.jogador.vida -= motor.jogador.vida * 0.15
+    conferir(motor.partida)
+
+    # Outra configuração de balanceamento volta com a partida (custos e regeneração)
+    config = Balanceamento.PADRAO.com({"custo_pa.Madeira": 3, "energia_andar": 3.5,
+                                       "recursos_tipo.Floresta.Madeira": 20})
+    motor = Motor(1, config=config)
+    rng = random.Random(1)
+    while motor.resultado is None and motor.num_acoes < 50:
+        acao, respostas = bot_aleatorio(motor, rng)
+        motor.executar(acao, *respostas)
+    conferir(motor.partida)
+    print(f"{conferidas + 2} instantâneos conferidos.")
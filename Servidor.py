@@ -0,0 +1,308 @@
+# Servidor.py
+"""Servidor TCP com muitas partidas ao mesmo tempo, num único processo.
+
+Cada conexão joga a própria Partida numa Sessao do mesmo loop asyncio. O
+protocolo é texto (UTF-8, linhas terminadas em \\r\\n, usável com telnet ou
+nc): o servidor escreve o jogo e, quando espera uma resposta, manda o sinal
+IAC GA do telnet ("pode falar"); o cliente responde uma linha.
+
+Ao conectar, o cliente manda "novo [seed]" ou "continuar CODIGO". Sessões sem
+resposta por muito tempo, e conexões que caem, são guardadas como instantâneo
+(alguns KB) e fechadas; "continuar CODIGO" retoma do início do turno em que
+pararam. As partidas novas sem seed usam mapas de um PoolMapas, quando o
+servidor tem um. Clientes lentos seguram só a própria partida: o servidor espera o
+envio esvaziar antes de seguir e desiste do cliente que não lê.
+
+    python Servidor.py servir --porta 8765
+    python Servidor.py carga --clientes 1000
+"""
+import io
+import time
+import random
+import asyncio
+import secrets
+import functools
+import argparse
+import traceback
+import statistics
+from collections import OrderedDict
+
+from rich.console import Console
+from rich.text import Text
+
+from Forest import Partida, Jogador
+from Resultados import ArmazemResultados
+from PoolMapas import PoolMapas
+import Sessao
+
+PORTA = 8765
+FIM_DE_LINHA = "\r\n"
+PODE_FALAR = b"\xff\xf9" # IAC GA: o servidor espera uma linha
+TEMPO_OCIOSO = 300 # Segundos sem resposta antes de guardar a sessão
+TEMPO_ENVIO = 30 # Segundos esperando um cliente lento ler antes de desistir dele
+LIMITE_ENVIO = 64 * 1024 # Bytes pendentes de envio antes de segurar a partida
+LIMITE_RESPOSTAS = 16 # Linhas recebidas e ainda não usadas por conexão
+MAX_GUARDADAS = 100_000 # Sessões guardadas em memória (as mais antigas saem primeiro)
+TAMANHO_LINHA = 1024
+
+
+class Ociosa(Exception):
+    """A sessão passou TEMPO_OCIOSO sem resposta."""
+
+
+class EntradaConexao(Sessao.EntradaFila):
+    """Respostas de uma conexão; avisa o cliente quando a partida espera por uma."""
+    def __init__(self, saida, tempo_ocioso):
+        super().__init__(LIMITE_RESPOSTAS)
+        self.saida = saida
+        self.tempo_ocioso = tempo_ocioso
+
+    async def esperar(self, prompt):
+        self.saida.pode_falar()
+        await self.saida.drenar()
+        try:
+            return await asyncio.wait_for(super().esperar(prompt), self.tempo_ocioso)
+        except asyncio.TimeoutError:
+            raise Ociosa() from None
+
+
+@functools.lru_cache(maxsize=4096)
+def _renderizar(texto, console):
+    """Texto com marcações do Rich em códigos ANSI (ou sem elas, sem console); os mesmos textos se repetem muito."""
+    if console is None:
+        return Text.from_markup(texto).plain + "\n"
+    with console.capture() as captura:
+        console.print(texto)
+    return captura.get()
+
+
+class SaidaConexao:
+    """Saída de uma sessão para o socket (a interface de Terminal, mais drenar())."""
+    def __init__(self, writer, console):
+        self.writer = writer
+        self.console = console # None: sem cores
+
+    def _enviar(self, texto):
+        self.writer.write(texto.replace("\n", FIM_DE_LINHA).encode("utf-8"))
+
+    def escrever(self, texto=""):
+        self._enviar(f"{texto}\n")
+
+    def destacar(self, texto=""):
+        self._enviar(_renderizar(texto, self.console))
+
+    def desenhar(self, texto):
+        self._enviar(texto)
+
+    def perguntar(self, prompt):
+        self._enviar(prompt)
+
+    def limpar(self):
+        if self.console is not None:
+            self._enviar("\x1b[2J\x1b[H")
+
+    def pode_falar(self):
+        self.writer.write(PODE_FALAR)
+
+    async def drenar(self):
+        # Segura esta partida (e só ela) enquanto o cliente não lê
+        await asyncio.wait_for(self.writer.drain(), TEMPO_ENVIO)
+
+
+class Servidor:
+    def __init__(self, ritmo=Sessao.ritmo_rapido, cores=True, tempo_ocioso=TEMPO_OCIOSO,
+                 max_guardadas=MAX_GUARDADAS, arquivo_resultados=None, mapas=None):
+        self.ritmo = ritmo
+        self.mapas = mapas # PoolMapas das partidas novas sem seed; sem ele cada partida gera o próprio mapa
+        # Um console só para converter as marcações do Rich em códigos ANSI
+        self.console = Console(file=io.StringIO(), force_terminal=True, color_system="256", width=100) if cores else None
+        self.tempo_ocioso = tempo_ocioso
+        self.max_guardadas = max_guardadas
+        self.guardadas = OrderedDict() # código -> instantâneo, da mais antiga para a mais nova
+        self.ativas = 0
+        self.terminadas = 0
+        self.erros = 0
+        self.armazem = ArmazemResultados(arquivo_resultados) if arquivo_resultados else None
+
+    def guardar(self, codigo, instantaneo):
+        self.guardadas[codigo] = instantaneo
+        self.guardadas.move_to_end(codigo)
+        while len(self.guardadas) > self.max_guardadas:
+            self.guardadas.popitem(last=False)
+
+    async def atender(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=LIMITE_ENVIO)
+        saida = SaidaConexao(writer, self.console)
+        entrada = EntradaConexao(saida, self.tempo_ocioso)
+        self.ativas += 1
+        leitor = None
+        sessao = None
+        codigo = None
+        try:
+            saida.escrever("Bem-vindo à floresta! Digite \"novo [seed]\" ou \"continuar CODIGO\".")
+            saida.pode_falar()
+            partida, codigo = await self._abrir(reader, saida)
+            if partida is None:
+                return
+            saida.escrever(f"Código desta partida: {codigo} (use \"continuar {codigo}\" para voltar)")
+            leitor = asyncio.create_task(self._ler(reader, entrada))
+            sessao = Sessao.Sessao(partida, entrada, saida, self.ritmo)
+            resultado = await sessao.jogar()
+            self.terminadas += 1
+            if self.armazem is not None:
+                self.armazem.adicionar(resultado)
+            await saida.drenar()
+        except Ociosa:
+            self.guardar(codigo, sessao.instantaneo())
+            saida.escrever(f"\nSessão parada por inatividade. Para voltar: continuar {codigo}")
+        except (EOFError, ConnectionError, asyncio.TimeoutError):
+            # Conexão caiu ou cliente parou de ler: guarda para continuar depois
+            if sessao is not None and sessao.resultado is None:
+                self.guardar(codigo, sessao.instantaneo())
+        except Exception:
+            # Erro do jogo num turno: derruba só esta conexão, e a partida fica guardada do início do turno
+            self.erros += 1
+            traceback.print_exc()
+            if sessao is not None and sessao.resultado is None:
+                try:
+                    self.guardar(codigo, sessao.instantaneo())
+                except Exception:
+                    # O próprio estado pode estar estragado (ErroSalvamento): não há o que guardar
+                    traceback.print_exc()
+                    saida.escrever("\nErro no servidor. Não foi possível salvar a partida.")
+                else:
+                    saida.escrever(f"\nErro no servidor. Para tentar de novo: continuar {codigo}")
+        finally:
+            self.ativas -= 1
+            if leitor is not None:
+                leitor.cancel()
+            writer.close()
+
+    async def _abrir(self, reader, saida):
+        """Lê o primeiro comando e devolve (partida, código), ou (None, None)."""
+        while True:
+            linha = await reader.readline()
+            if not linha:
+                return None, None
+            comando = linha.decode("utf-8", "replace").split()
+            if comando and comando[0] == "novo":
+                seed = int(comando[1]) if len(comando) > 1 and comando[1].isdigit() else None
+                mapa = None
+                if seed is None and self.mapas is not None:
+                    seed, mapa = self.mapas.obter()
+                partida = Partida(Jogador(vida=100, energia=100, fome=100), salvar=False, seed=seed, mapa=mapa)
+                return partida, secrets.token_hex(6)
+            if len(comando) == 2 and comando[0] == "continuar" and comando[1] in self.guardadas:
+                instantaneo = self.guardadas.pop(comando[1])
+                return Partida.restaurar(bytearray(instantaneo), salvar=False), comando[1]
+            saida.escrever("Comando desconhecido ou partida não encontrada.")
+            saida.pode_falar()
+
+    async def _ler(self, reader, entrada):
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                # Espera vaga na fila: quem manda rápido demais para de ser lido
+                await entrada.colocar_quando_couber(linha[:TAMANHO_LINHA].decode("utf-8", "replace").strip())
+        except ConnectionError:
+            pass
+        await entrada.colocar_quando_couber(None)
+
+    async def servir(self, host="127.0.0.1", porta=PORTA):
+        servidor = await asyncio.start_server(self.atender, host, porta, limit=TAMANHO_LINHA * 4, backlog=4096)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def fechar(self):
+        if self.armazem is not None:
+            self.armazem.fechar()
+
+
+# --- Gerador de carga ---
+
+RESPOSTAS_INVALIDAS = ("", "abc", "-1", "99", "2.5", "sim")
+
+
+async def cliente_bot(host, porta, seed, latencias):
+    """Joga uma partida inteira respondendo ao acaso; devolve o número de respostas."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, porta)
+    respostas = 0
+    try:
+        await reader.readuntil(PODE_FALAR)
+        writer.write(f"novo {seed}\n".encode())
+        while True:
+            inicio = time.perf_counter()
+            try:
+                await reader.readuntil(PODE_FALAR)
+            except asyncio.IncompleteReadError:
+                return respostas # O servidor fechou: fim de jogo
+            latencias.append(time.perf_counter() - inicio)
+            # De vez em quando uma resposta inválida, como as de quem joga pelo telnet
+            resposta = rng.choice(RESPOSTAS_INVALIDAS) if rng.random() < 0.05 else rng.randint(1, 7)
+            writer.write(f"{resposta}\n".encode())
+            respostas += 1
+    finally:
+        writer.close()
+
+
+async def carga(clientes, host="127.0.0.1", porta=PORTA, simultaneos=500):
+    """Roda `clientes` partidas de bot contra o servidor, no máximo `simultaneos` por vez."""
+    latencias = []
+    limite = asyncio.Semaphore(simultaneos)
+
+    async def um(seed):
+        async with limite:
+            return await cliente_bot(host, porta, seed, latencias)
+
+    inicio = time.perf_counter()
+    respostas = await asyncio.gather(*(um(seed) for seed in range(clientes)))
+    duracao = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "partidas": clientes,
+        "respostas": sum(respostas),
+        "segundos": duracao,
+        "respostas_por_segundo": sum(respostas) / duracao,
+        "latencia_mediana": statistics.median(latencias) if latencias else 0,
+        "latencia_p99": latencias[int(len(latencias) * 0.99)] if latencias else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de partidas simultâneas e gerador de carga.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    servir = subcomandos.add_parser("servir", help="atende jogadores por TCP")
+    servir.add_argument("--host", default="127.0.0.1")
+    servir.add_argument("--porta", type=int, default=PORTA)
+    servir.add_argument("--humano", action="store_true", help="com as pausas entre as mensagens")
+    servir.add_argument("--sem-cores", action="store_true")
+    servir.add_argument("--ocioso", type=float, default=TEMPO_OCIOSO, help="segundos até guardar uma sessão parada")
+    servir.add_argument("--salvar", metavar="ARQUIVO", default=None, help="grava os resultados neste banco SQLite")
+    servir.add_argument("--mapas", metavar="ARQUIVO", default=None, help="usa primeiro os mapas deste arquivo de PoolMapas.py")
+    cargas = subcomandos.add_parser("carga", help="joga muitas partidas de bot contra um servidor")
+    cargas.add_argument("--host", default="127.0.0.1")
+    cargas.add_argument("--porta", type=int, default=PORTA)
+    cargas.add_argument("--clientes", type=int, default=1000)
+    cargas.add_argument("--simultaneos", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.comando == "servir":
+        with PoolMapas() as mapas:
+            if args.mapas is not None:
+                mapas.carregar(args.mapas)
+            servidor = Servidor(Sessao.ritmo_humano if args.humano else Sessao.ritmo_rapido, not args.sem_cores,
+                                args.ocioso, arquivo_resultados=args.salvar, mapas=mapas)
+            try:
+                asyncio.run(servidor.servir(args.host, args.porta))
+            except KeyboardInterrupt:
+                pass
+            finally:
+                servidor.fechar()
+    else:
+        resumo = asyncio.run(carga(args.clientes, args.host, args.porta, args.simultaneos))
+        print(f"Partidas: {resumo['partidas']} em {resumo['segundos']:.1f}s")
+        print(f"Respostas: {resumo['respostas']} ({resumo['respostas_por_segundo']:.0f}/s)")
+        print(f"Latência: mediana {resumo['latencia_mediana'] * 1e3:.2f}ms, p99 {resumo['latencia_p99'] * 1e3:.2f}ms")
@@ -0,0 +1,246 @@
+# Sessao.py
+"""Loop do jogo em asyncio, com fontes de entrada e ritmo trocáveis.
+
+O código da partida continua síncrono: Partida.turno() pede respostas com
+ler() e pausa com esperar(). Numa Sessao, o terminal da partida só anota o que
+seria escrito e as pausas, e a sessão entrega tudo à saída depois, aguardando
+as pausas conforme o ritmo (de verdade para pessoas, nenhum para bots e
+replays). Quando uma resposta ainda não chegou, a tentativa do turno é
+desfeita (Partida.voltar, até o marcar() do início do turno), a sessão
+aguarda a resposta sem bloquear o loop e o turno é refeito com as respostas
+que já tem. Como a partida é determinística, o refazer produz o mesmo texto,
+que não é entregue de novo.
+
+Assim muitas partidas dividem um único loop de eventos, sem uma thread por
+partida.
+"""
+import sys
+import asyncio
+import threading
+
+from Forest import Terminal, FimDeJogo
+
+
+# --- Ritmo ---
+
+async def ritmo_humano(segundos):
+    await asyncio.sleep(segundos)
+
+
+ritmo_rapido = None # Sem pausas
+
+
+# --- Fontes de entrada ---
+# ler_agora(prompt) devolve a resposta já disponível, ou None; esperar(prompt)
+# aguarda a próxima. Fontes com pode_bloquear = False nunca precisam esperar.
+
+class EntradaFila:
+    """Respostas que chegam de fora (teclado, rede) por uma fila asyncio."""
+    pode_bloquear = True
+
+    def __init__(self, limite=0):
+        self.fila = asyncio.Queue(limite) # limite: respostas guardadas antes de quem coloca ter que esperar
+
+    def colocar(self, resposta):
+        self.fila.put_nowait(resposta)
+
+    def fechar(self):
+        """Sinaliza que não virão mais respostas."""
+        self.fila.put_nowait(None)
+
+    async def colocar_quando_couber(self, resposta):
+        """Coloca a resposta esperando vaga na fila (None fecha a entrada)."""
+        await self.fila.put(resposta)
+
+    def ler_agora(self, prompt):
+        try:
+            resposta = self.fila.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        if resposta is None:
+            raise EOFError("A entrada foi fechada.")
+        return resposta
+
+    async def esperar(self, prompt):
+        resposta = await self.fila.get()
+        if resposta is None:
+            raise EOFError("A entrada foi fechada.")
+        return resposta
+
+
+class EntradaTeclado(EntradaFila):
+    """Linhas digitadas no terminal, lidas sem bloquear o loop.
+
+    Uma thread (só uma, a do teclado) lê a entrada padrão e coloca as linhas na
+    fila; ela não segura o fim do programa.
+    """
+    def __init__(self):
+        super().__init__()
+        self._leitor = None
+
+    async def esperar(self, prompt):
+        if self._leitor is None:
+            loop = asyncio.get_running_loop()
+
+            def ler():
+                for linha in iter(sys.stdin.readline, ""):
+                    loop.call_soon_threadsafe(self.colocar, linha.rstrip("\n"))
+                loop.call_soon_threadsafe(self.fechar)
+
+            self._leitor = threading.Thread(target=ler, name="EntradaTeclado", daemon=True)
+            self._leitor.start()
+        return await super().esperar(prompt)
+
+
+class EntradaLista:
+    """Respostas conhecidas de antemão (replays, testes), em ordem."""
+    pode_bloquear = False
+
+    def __init__(self, respostas):
+        self.respostas = iter(respostas)
+
+    def ler_agora(self, prompt):
+        resposta = next(self.respostas, None)
+        if resposta is None:
+            raise EOFError("As respostas acabaram.")
+        return str(resposta)
+
+
+class EntradaFuncao:
+    """Respostas calculadas na hora por uma função prompt -> resposta (bots)."""
+    pode_bloquear = False
+
+    def __init__(self, funcao):
+        self.funcao = funcao
+
+    def ler_agora(self, prompt):
+        return str(self.funcao(prompt))
+
+
+# --- Terminal da sessão ---
+
+class _SemResposta(Exception):
+    def __init__(self, prompt):
+        super().__init__(prompt)
+        self.prompt = prompt
+
+
+class TerminalSessao(Terminal):
+    """Terminal que anota a saída e as pausas de uma tentativa de turno."""
+    def __init__(self, entrada):
+        self.entrada = entrada
+        self.saida = [] # (método da saída ou "esperar", argumento)
+        self.respostas = [] # Respostas já usadas neste turno
+        self._proxima = 0
+
+    def recomecar(self):
+        self.saida.clear()
+        self._proxima = 0
+
+    def escrever(self, texto=""):
+        self.saida.append(("escrever", texto))
+
+    def destacar(self, texto=""):
+        self.saida.append(("destacar", texto))
+
+    def desenhar(self, texto):
+        self.saida.append(("desenhar", texto))
+
+    def limpar(self):
+        self.saida.append(("limpar", None))
+
+    def esperar(self, segundos):
+        self.saida.append(("esperar", segundos))
+
+    def ler(self, prompt=""):
+        if prompt:
+            self.saida.append(("perguntar", prompt))
+        if self._proxima == len(self.respostas):
+            resposta = self.entrada.ler_agora(prompt)
+            if resposta is None:
+                raise _SemResposta(prompt)
+            self.respostas.append(resposta)
+        resposta = self.respostas[self._proxima]
+        self._proxima += 1
+        return resposta
+
+
+class Sessao:
+    """Uma partida jogada dentro do loop asyncio.
+
+    `saida` recebe o texto (os mesmos métodos de Terminal; se tiver um
+    `async drenar()`, ele é aguardado depois de cada entrega, o que segura a
+    partida enquanto um cliente lento não lê). `ritmo` é a função assíncrona
+    das pausas, ou None para não pausar.
+    """
+    def __init__(self, partida, entrada, saida=None, ritmo=ritmo_humano):
+        if entrada.pode_bloquear and partida.mundo is not None:
+            raise ValueError("Entradas que podem esperar precisam de partidas no mapa fixo (que podem ser desfeitas).")
+        self.entrada = entrada
+        self.terminal = TerminalSessao(entrada)
+        self.saida = saida or Terminal()
+        self.ritmo = ritmo
+        self.partida = partida
+        partida.terminal = self.terminal
+        self.resultado = None
+        self.turnos = 0
+        self._marca = None # Partida.marcar() do início do turno em andamento
+
+    async def jogar(self):
+        """Joga até o fim da partida e devolve o registro do resultado."""
+        while self.resultado is None:
+            await self.turno()
+        return self.resultado
+
+    async def turno(self):
+        """Joga um turno, aguardando as respostas que faltarem."""
+        terminal = self.terminal
+        terminal.respostas.clear()
+        marca = self.partida.marcar() if self.entrada.pode_bloquear else None
+        self._marca = marca
+        entregues = 0
+        while True:
+            terminal.recomecar()
+            falta = None
+            try:
+                self.partida.turno()
+            except _SemResposta as erro:
+                falta = erro.prompt
+            except FimDeJogo as fim:
+                self.resultado = fim.resultado
+            entregues = await self._entregar(entregues)
+            if falta is None:
+                self.turnos += 1
+                self._marca = None
+                return
+            terminal.respostas.append(await self.entrada.esperar(falta))
+            # Desfaz a tentativa e refaz o turno com a nova resposta
+            self.partida.voltar(marca)
+
+    def instantaneo(self):
+        """Bytes da partida no início do turno em andamento (ou agora, entre turnos)."""
+        if self._marca is not None:
+            # A tentativa em andamento seria desfeita de qualquer jeito antes de refazer o turno
+            self.partida.voltar(self._marca)
+        return self.partida.instantaneo()
+
+    async def _entregar(self, entregues):
+        # Só o que ainda não foi entregue numa tentativa anterior deste turno
+        saida = self.terminal.saida
+        for metodo, argumento in saida[entregues:]:
+            if metodo == "esperar":
+                if self.ritmo is not None:
+                    await self.ritmo(argumento)
+            elif metodo == "limpar":
+                self.saida.limpar()
+            else:
+                getattr(self.saida, metodo)(argumento)
+        drenar = getattr(self.saida, "drenar", None)
+        if drenar is not None and len(saida) > entregues:
+            await drenar()
+        return max(entregues, len(saida))
+
+
+async def jogar_varias(sessoes):
+    """Joga várias sessões ao mesmo tempo no loop atual e devolve os resultados, em ordem."""
+    return await asyncio.gather(*(sessao.jogar() for sessao in sessoes))
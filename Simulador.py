@@ -0,0 +1,291 @@
+# Simulador.py
+"""Motor de simulação sem interface para Jogador/Partida e execução em lote.
+
+As ações são enviadas por código, sem input(), print() ou time.sleep(), e o fim
+da partida volta como um registro (o mesmo de salvar_resultado) em vez de
+encerrar o processo. Usado para testes de balanceamento.
+"""
+import sys
+import time
+import random
+import argparse
+from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Forest import Jogador, Partida, Terminal, FimDeJogo, montar_resultado
+from Resultados import ArmazemResultados
+from PoolMapas import PoolMapas
+import GeradorMapa
+import Balanceamento
+import Instrumentacao
+
+MAX_ACOES = 5000 # Limite de ações por partida simulada, para não rodar para sempre
+
+
+def recusar(prompt):
+    """Resposta padrão para perguntas não previstas: "Não" nos eventos aleatórios."""
+    return "2"
+
+
+class TerminalSilencioso(Terminal):
+    """Terminal sem saída nem pausas, que responde com uma fila de respostas."""
+    def __init__(self, responder=recusar):
+        self.respostas = deque()
+        self.responder = responder
+
+    def escrever(self, texto=""):
+        pass
+
+    def destacar(self, texto=""):
+        pass
+
+    def ler(self, prompt=""):
+        if self.respostas:
+            return str(self.respostas.popleft())
+        return str(self.responder(prompt))
+
+    def perguntar(self, prompt):
+        pass
+
+    def desenhar(self, texto):
+        pass
+
+    def esperar(self, segundos):
+        pass
+
+    def limpar(self):
+        pass
+
+
+class Motor:
+    """Partida sem interface, controlada por chamadas a executar()."""
+    def __init__(self, seed=None, responder=recusar, mapa=None, estrategia=GeradorMapa.ESTRATEGIA_PADRAO,
+                 config=Balanceamento.PADRAO):
+        self.terminal = TerminalSilencioso(responder)
+        self.jogador = Jogador(vida=100, energia=100, fome=100)
+        self.partida = Partida(self.jogador, terminal=self.terminal, salvar=False, seed=seed, mapa=mapa,
+                               estrategia=estrategia, config=config)
+        self.seed = self.partida.seed
+        self.resultado = None
+        self.num_acoes = 0
+
+    def acoes(self):
+        """Nomes das ações disponíveis agora, na ordem do menu do hud."""
+        return [nome for nome, texto, acao in self.partida.acoes_disponiveis()]
+
+    def executar(self, acao, *respostas):
+        """Executa uma ação do menu; as respostas alimentam as perguntas da ação.
+
+        Retorna o registro do resultado quando a partida termina, senão None.
+        """
+        if self.resultado is not None:
+            raise RuntimeError("A partida já terminou.")
+        for escolha, (nome, texto, metodo) in enumerate(self.partida.acoes_disponiveis(), start=1):
+            if nome == acao:
+                break
+        else:
+            raise ValueError(f"Ação indisponível: {acao}")
+
+        # Na trilha fica a escolha como seria digitada no menu do hud
+        self.partida.trilha.append(str(escolha))
+        self.terminal.respostas.extend(respostas)
+        self.num_acoes += 1
+        try:
+            metodo()
+            # Mesma ordem do loop principal: o status é verificado antes do próximo menu
+            self.jogador.verificar_status()
+        except FimDeJogo as fim:
+            self.resultado = fim.resultado
+        finally:
+            self.terminal.respostas.clear()
+        return self.resultado
+
+
+# --- Bots ---
+
+def bot_aleatorio(motor, rng):
+    """Escolhe uma ação útil ao acaso e sorteia as respostas das perguntas."""
+    acoes = motor.acoes()
+    if "cavar" in acoes:
+        return "cavar", ()
+    # Mochila e mapa só mostram informações, não mudam o estado
+    candidatas = [acao for acao in acoes if acao not in ("abrir_mochila", "ver_mapa")]
+    acao = rng.choice(candidatas)
+    if acao == "andar":
+        return acao, (rng.randint(1, 4),)
+    if acao == "descansar":
+        return acao, (rng.randint(1, 8),)
+    if acao == "comer":
+        comida = motor.jogador.mochila.get("Comida", 0)
+        return acao, (rng.randint(1, max(1, comida)),)
+    return acao, ()
+
+
+def _direcao(posicao, alvo, rng):
+    # Resposta de andar que aproxima de `alvo`, pelo eixo mais longe (empates sorteados)
+    dx, dy = alvo[0] - posicao[0], alvo[1] - posicao[1]
+    if abs(dx) > abs(dy) or (abs(dx) == abs(dy) and rng.random() < 0.5):
+        return 3 if dx > 0 else 4
+    return 2 if dy > 0 else 1
+
+
+def bot_explorador(motor, rng):
+    """Anda até a fronteira da neblina mais próxima, explorando pelo caminho; com o mapa, vai até a saída."""
+    acoes = motor.acoes()
+    jogador = motor.jogador
+    mochila = jogador.mochila
+    if "cavar" in acoes:
+        return "cavar", ()
+    if jogador.energia < 30:
+        return "descansar", (8,)
+    if jogador.fome < 40 and mochila.get("Comida", 0):
+        return "comer", (min(mochila["Comida"], 5),)
+    if "construir_pa" in acoes and all(mochila.get(item, 0) >= custo for item, custo in motor.partida.config.custo_pa.items()):
+        return "construir_pa", ()
+
+    partida = motor.partida
+    posicao = jogador.terreno_atual.posicao
+    alvo = partida.saida_pos if jogador.tem_mapa else partida.neblina.fronteira_mais_proxima(posicao)
+    if alvo is None or alvo == posicao or rng.random() < 0.3:
+        return "explorar", ()
+    return "andar", (_direcao(posicao, alvo, rng),)
+
+
+BOTS = {"aleatorio": bot_aleatorio, "explorador": bot_explorador}
+
+
+# --- Execução em lote ---
+
+def seed_partida(seed, indice):
+    """Seed da partida de número `indice` dentro do lote de seed `seed`."""
+    return (seed << 32) + indice
+
+
+def jogar_partida(seed, bot=bot_aleatorio, max_acoes=MAX_ACOES, config=Balanceamento.PADRAO, mapa=None):
+    """Joga uma partida inteira com o bot e retorna o registro do resultado.
+
+    `mapa` é o (grade, saida_pos) da seed, já gerado (de um PoolMapas).
+    """
+    motor = Motor(seed, mapa=mapa, config=config)
+    # O bot sorteia com outro gerador, para não repetir a sequência da partida
+    rng = random.Random(f"bot:{seed}")
+    while motor.resultado is None and motor.num_acoes < max_acoes:
+        acao, respostas = bot(motor, rng)
+        motor.executar(acao, *respostas)
+
+    resultado = motor.resultado
+    if resultado is None:
+        resultado = montar_resultado(motor.jogador, motor.partida, "limite")
+    resultado["acoes"] = motor.num_acoes
+    return resultado
+
+
+def _jogar_bloco(seeds, bot, max_acoes, arquivo_resultados=None, config=Balanceamento.PADRAO, mapas=None):
+    if mapas is None:
+        mapas = [None] * len(seeds)
+    resultados = [jogar_partida(seed, bot, max_acoes, config, mapa) for seed, mapa in zip(seeds, mapas)]
+    if arquivo_resultados is not None:
+        # Um lote por bloco: poucas transações mesmo com muitos processos gravando
+        with ArmazemResultados(arquivo_resultados, tamanho_lote=len(resultados) + 1) as armazem:
+            for resultado in resultados:
+                armazem.adicionar(resultado)
+    return resultados
+
+
+def executar_lote(num_partidas, seed=0, processos=None, bot=bot_aleatorio, max_acoes=MAX_ACOES, tamanho_bloco=200,
+                  arquivo_resultados=None, config=Balanceamento.PADRAO, mapas=None):
+    """Joga `num_partidas` partidas num pool de processos, gerando os resultados em ordem.
+
+    Cada partida recebe a própria seed (seed_partida), então o resultado não
+    depende de qual processo a executou nem do número de processos. Com
+    `arquivo_resultados`, cada processo também grava seus resultados no banco.
+
+    Com `mapas` (um PoolMapas, como no Ambiente), as partidas rodam neste
+    processo com as seeds e os mapas que o pool entrega, e o pool gera os
+    próximos enquanto isso.
+    """
+    if mapas is not None:
+        if mapas.estrategia != GeradorMapa.ESTRATEGIA_PADRAO or not np.array_equal(mapas.recursos_base,
+                                                                                    config.recursos_base):
+            raise ValueError("O pool precisa gerar os mapas com a estratégia padrão e os recursos base da config.")
+        for inicio in range(0, num_partidas, tamanho_bloco):
+            prontos = [mapas.obter() for _ in range(min(tamanho_bloco, num_partidas - inicio))]
+            yield from _jogar_bloco([seed for seed, _ in prontos], bot, max_acoes, arquivo_resultados, config,
+                                    [mapa for _, mapa in prontos])
+        return
+
+    seeds = [seed_partida(seed, i) for i in range(num_partidas)]
+    blocos = [seeds[i:i + tamanho_bloco] for i in range(0, num_partidas, tamanho_bloco)]
+
+    if processos == 1:
+        for bloco in blocos:
+            yield from _jogar_bloco(bloco, bot, max_acoes, arquivo_resultados, config)
+        return
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        n = len(blocos)
+        for resultados in executor.map(_jogar_bloco, blocos, [bot] * n, [max_acoes] * n, [arquivo_resultados] * n,
+                                       [config] * n):
+            yield from resultados
+
+
+def resumir(resultados):
+    """Agrega uma sequência de resultados em contagens e médias."""
+    status = Counter()
+    motivos = Counter()
+    total_dias = 0
+    total = 0
+    for resultado in resultados:
+        total += 1
+        status[resultado["status"]] += 1
+        total_dias += resultado["dias_sobrevividos"]
+        if resultado["motivo"]:
+            motivos[resultado["motivo"]] += 1
+    return {
+        "partidas": total,
+        "status": dict(status),
+        "motivos": dict(motivos),
+        "media_dias": total_dias / total if total else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula partidas em lote, sem interface.")
+    parser.add_argument("--partidas", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bot", choices=sorted(BOTS), default="aleatorio")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--salvar", metavar="ARQUIVO", default=None, help="grava os resultados neste banco SQLite")
+    parser.add_argument("--pool", action="store_true",
+                        help="joga neste processo, com os mapas gerados em segundo plano (nos --processos) por um PoolMapas")
+    parser.add_argument("--mapas", metavar="ARQUIVO", default=None,
+                        help="com --pool, usa primeiro os mapas deste arquivo de PoolMapas.py")
+    Instrumentacao.argumento_perfil(parser)
+    args = parser.parse_args()
+    # A medição só vê o próprio processo: com --perfil as partidas rodam todas aqui
+    processos = 1 if args.perfil is not None else args.processos
+
+    mapas = None
+    if args.pool:
+        mapas = PoolMapas(seed=args.seed, processos=args.processos or 0).iniciar()
+        if args.mapas is not None:
+            mapas.carregar(args.mapas)
+
+    inicio = time.perf_counter()
+    try:
+        with Instrumentacao.perfil(args.perfil):
+            resumo = resumir(executar_lote(args.partidas, seed=args.seed, processos=processos, bot=BOTS[args.bot],
+                                           arquivo_resultados=args.salvar, mapas=mapas))
+    finally:
+        if mapas is not None:
+            mapas.parar()
+    duracao = time.perf_counter() - inicio
+
+    print(f"Partidas: {resumo['partidas']} em {duracao:.1f}s ({resumo['partidas'] / duracao * 60:.0f} por minuto)")
+    print(f"Resultados: {resumo['status']}")
+    print(f"Média de dias sobrevividos: {resumo['media_dias']:.2f}")
+    for motivo, quantidade in Counter(resumo["motivos"]).most_common():
+        print(f"  {quantidade:>6}x {motivo}")
+    sys.exit(0)
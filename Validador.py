@@ -0,0 +1,312 @@
+# Validador.py
+"""Validação dos mapas gerados e estatísticas do gerador em muitas seeds.
+
+Cada mapa passa pelas mesmas verificações: regiões conexas de cada tipo de
+terreno (componentes pelo método union-find, com os rótulos propagados em
+arrays), se a caverna e a saída podem ser alcançadas sem atravessar
+montanhas a partir da área de início, se a saída é única e fica fora da água
+e da caverna, o comprimento e a forma do rio (ligado à cachoeira, sem
+ramificações, número de curvas) e a mistura de terrenos. Os mapas são
+verificados em lotes empilhados (n, altura, largura), de uma vez.
+
+Os blocos de seeds rodam num pool de processos e os histogramas de cada
+métrica são somados à medida que os blocos terminam, com um relatório
+parcial a cada tantos mapas:
+
+    python Validador.py --mapas 1000000 --a-cada 100000
+"""
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import GeradorMapa
+from GeradorMapa import ID_TIPO, ID_MONTANHA, ID_PLANICIE, ID_FLORESTA, ID_RIO, ID_CACHOEIRA, ID_CAVERNA, FLAG_SAIDA
+from PoolMapas import gerar_mapa_com_seed
+
+TAMANHO_BLOCO = 500
+MAX_EXEMPLOS = 5 # Seeds guardadas por verificação que falhou
+PROIBIDOS_SAIDA = [ID_RIO, ID_CACHOEIRA, ID_CAVERNA]
+
+# Verificações que todo mapa deveria passar (métrica booleana -> descrição)
+VERIFICACOES = {
+    "montanha_unica": "a montanha é uma região só",
+    "planicie_unica": "a planície é uma região só",
+    "caverna_alcancavel": "a caverna é alcançável sem atravessar montanhas",
+    "saida_alcancavel": "a saída é alcançável sem atravessar montanhas",
+    "saida_valida": "uma única saída, fora da água e da caverna",
+    "tem_rio": "o mapa tem rio",
+    "rio_na_cachoeira": "o rio (se houver) começa ao lado da cachoeira",
+    "rio_sem_ramos": "o rio não se ramifica",
+}
+
+
+# --- Componentes conexos ---
+
+def rotular(mascara):
+    """Componentes conexos (4 vizinhos) das células marcadas de cada mapa.
+
+    Devolve um array (n, altura, largura) com o rótulo de cada célula: o
+    índice (y * largura + x) da menor célula do componente, ou altura *
+    largura nas células não marcadas. Cada passo une cada célula ao menor
+    rótulo vizinho e encurta os caminhos até a raiz (pulo de ponteiros), como
+    num union-find feito em todas as células ao mesmo tempo.
+    """
+    n, altura, largura = mascara.shape
+    fora = altura * largura
+    rotulos = np.where(mascara, np.arange(fora).reshape(1, altura, largura), fora)
+    while True:
+        novos = rotulos.copy()
+        np.minimum(novos[:, 1:, :], rotulos[:, :-1, :], out=novos[:, 1:, :])
+        np.minimum(novos[:, :-1, :], rotulos[:, 1:, :], out=novos[:, :-1, :])
+        np.minimum(novos[:, :, 1:], rotulos[:, :, :-1], out=novos[:, :, 1:])
+        np.minimum(novos[:, :, :-1], rotulos[:, :, 1:], out=novos[:, :, :-1])
+        novos[~mascara] = fora
+        # Pulo de ponteiros: o rótulo passa a ser o rótulo da célula apontada
+        planos = np.concatenate([novos.reshape(n, fora), np.full((n, 1), fora)], axis=1)
+        novos = np.take_along_axis(planos, novos.reshape(n, fora), axis=1).reshape(n, altura, largura)
+        if np.array_equal(novos, rotulos):
+            return rotulos
+        rotulos = novos
+
+
+def contar_componentes(mascara, rotulos=None):
+    """Número de componentes conexos das células marcadas, por mapa."""
+    if rotulos is None:
+        rotulos = rotular(mascara)
+    n, altura, largura = mascara.shape
+    raizes = rotulos == np.arange(altura * largura).reshape(1, altura, largura)
+    return (raizes & mascara).reshape(n, -1).sum(axis=1)
+
+
+def _vizinhos(mascara):
+    """Quantos dos 4 vizinhos de cada célula estão marcados."""
+    contagem = np.zeros(mascara.shape, dtype=np.int8)
+    contagem[:, 1:, :] += mascara[:, :-1, :]
+    contagem[:, :-1, :] += mascara[:, 1:, :]
+    contagem[:, :, 1:] += mascara[:, :, :-1]
+    contagem[:, :, :-1] += mascara[:, :, 1:]
+    return contagem
+
+
+# --- Métricas ---
+
+def validar_lote(tipos, flags, saidas):
+    """Métricas de n mapas empilhados: dicionário nome -> array (n,).
+
+    `tipos` e `flags` são (n, altura, largura), como os da Grade; `saidas` é
+    (n, 2) com o (x, y) da saída de cada mapa.
+    """
+    n, altura, largura = tipos.shape
+    indices = np.arange(n)
+    metricas = {}
+
+    for tipo, id_tipo in ID_TIPO.items():
+        metricas[f"celulas.{tipo}"] = (tipos == id_tipo).reshape(n, -1).sum(axis=1)
+    metricas["regioes.Montanha"] = contar_componentes(tipos == ID_MONTANHA)
+    metricas["regioes.Planície"] = contar_componentes(tipos == ID_PLANICIE)
+    metricas["regioes.Rio"] = contar_componentes(tipos == ID_RIO)
+    metricas["montanha_unica"] = metricas["regioes.Montanha"] == 1
+    metricas["planicie_unica"] = metricas["regioes.Planície"] == 1
+
+    # Alcance sem montanhas, a partir da região com mais células de início (Planície/Floresta)
+    transitavel = tipos != ID_MONTANHA
+    rotulos = rotular(transitavel).reshape(n, -1)
+    inicio = np.isin(tipos, [ID_PLANICIE, ID_FLORESTA]).reshape(n, -1)
+    fora = altura * largura
+    contagem = np.zeros((n, fora + 1), dtype=np.int64)
+    np.add.at(contagem, (np.repeat(indices, fora), rotulos.ravel()), inicio.ravel())
+    regiao_inicio = contagem[:, :fora].argmax(axis=1)
+    tem_caverna = (tipos == ID_CAVERNA).reshape(n, -1)
+    metricas["caverna_alcancavel"] = (tem_caverna & (rotulos == regiao_inicio[:, None])).any(axis=1)
+
+    saida_x, saida_y = saidas[:, 0], saidas[:, 1]
+    na_grade = (0 <= saida_x) & (saida_x < largura) & (0 <= saida_y) & (saida_y < altura)
+    sx, sy = np.clip(saida_x, 0, largura - 1), np.clip(saida_y, 0, altura - 1)
+    marcadas = (flags & FLAG_SAIDA).astype(bool)
+    metricas["saida_valida"] = (na_grade & (marcadas.reshape(n, -1).sum(axis=1) == 1) & marcadas[indices, sy, sx]
+                                & ~np.isin(tipos[indices, sy, sx], PROIBIDOS_SAIDA))
+    metricas["saida_alcancavel"] = na_grade & (rotulos[indices, sy * largura + sx] == regiao_inicio)
+
+    # Rio: comprimento, ligação com a cachoeira, ramos e curvas
+    rio = tipos == ID_RIO
+    agua = rio | (tipos == ID_CACHOEIRA)
+    vizinhos_agua = _vizinhos(agua)
+    metricas["tem_rio"] = metricas["celulas.Rio"] > 0
+    metricas["rio_na_cachoeira"] = ~metricas["tem_rio"] | (rio & (_vizinhos(tipos == ID_CACHOEIRA) > 0)).reshape(n, -1).any(axis=1)
+    metricas["rio_sem_ramos"] = ~(rio & (vizinhos_agua > 2)).reshape(n, -1).any(axis=1)
+    # Curva: célula do rio com um vizinho de água na horizontal e outro na vertical
+    horizontal = np.zeros_like(agua)
+    horizontal[:, :, 1:] |= agua[:, :, :-1]
+    horizontal[:, :, :-1] |= agua[:, :, 1:]
+    vertical = np.zeros_like(agua)
+    vertical[:, 1:, :] |= agua[:, :-1, :]
+    vertical[:, :-1, :] |= agua[:, 1:, :]
+    metricas["rio_curvas"] = (rio & horizontal & vertical & (vizinhos_agua == 2)).reshape(n, -1).sum(axis=1)
+    metricas["rio_comprimento"] = metricas["celulas.Rio"]
+    return metricas
+
+
+# --- Estatísticas acumuladas ---
+
+class Estatisticas:
+    """Histogramas das métricas de muitos mapas; somáveis entre processos."""
+    def __init__(self):
+        self.mapas = 0
+        self.erros = Counter() # Mensagem de ErroGeracao -> quantidade
+        self.histogramas = {} # métrica -> Counter(valor -> mapas)
+        self.exemplos = {} # verificação -> seeds de mapas que falharam
+
+    def adicionar(self, metricas, seeds):
+        self.mapas += len(seeds)
+        for nome, valores in metricas.items():
+            histograma = self.histogramas.setdefault(nome, Counter())
+            unicos, quantidades = np.unique(valores, return_counts=True)
+            for valor, quantidade in zip(unicos.tolist(), quantidades.tolist()):
+                histograma[valor] += quantidade
+            if nome in VERIFICACOES and not valores.all():
+                exemplos = self.exemplos.setdefault(nome, [])
+                exemplos.extend(np.asarray(seeds)[~valores][:MAX_EXEMPLOS - len(exemplos)].tolist())
+
+    def erro(self, mensagem):
+        self.mapas += 1
+        self.erros[mensagem] += 1
+
+    def juntar(self, outra):
+        self.mapas += outra.mapas
+        self.erros.update(outra.erros)
+        for nome, histograma in outra.histogramas.items():
+            self.histogramas.setdefault(nome, Counter()).update(histograma)
+        for nome, exemplos in outra.exemplos.items():
+            atuais = self.exemplos.setdefault(nome, [])
+            atuais.extend(exemplos[:MAX_EXEMPLOS - len(atuais)])
+
+    def media(self, nome):
+        histograma = self.histogramas.get(nome)
+        total = sum(histograma.values()) if histograma else 0
+        return sum(valor * quantidade for valor, quantidade in histograma.items()) / total if total else 0.0
+
+    def resumo(self):
+        return {
+            "mapas": self.mapas,
+            "erros": dict(self.erros),
+            "verificacoes": {nome: self.media(nome) for nome in VERIFICACOES if nome in self.histogramas},
+            "histogramas": {nome: {str(valor): quantidade for valor, quantidade in sorted(histograma.items())}
+                            for nome, histograma in self.histogramas.items()},
+            "exemplos": self.exemplos,
+        }
+
+    def texto(self):
+        linhas = [f"Mapas: {self.mapas} | Erros de geração: {sum(self.erros.values())}"]
+        for mensagem, quantidade in self.erros.most_common():
+            linhas.append(f"  {quantidade:>9}x {mensagem}")
+        linhas.append("Verificações (fração dos mapas que passam):")
+        for nome, descricao in VERIFICACOES.items():
+            if nome in self.histogramas:
+                exemplos = self.exemplos.get(nome)
+                sufixo = f"  ex.: {', '.join(map(str, exemplos))}" if exemplos else ""
+                linhas.append(f"  {self.media(nome):>8.2%}  {descricao}{sufixo}")
+        linhas.append("Histogramas (valor: mapas):")
+        for nome, histograma in sorted(self.histogramas.items()):
+            if nome in VERIFICACOES:
+                continue
+            valores = " ".join(f"{valor}:{quantidade}" for valor, quantidade in sorted(histograma.items()))
+            linhas.append(f"  {nome:<20} média {self.media(nome):>6.2f} | {valores}")
+        return "\n".join(linhas)
+
+
+# --- Execução em lote ---
+
+def validar_seeds(seeds, largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA,
+                  estrategia=GeradorMapa.ESTRATEGIA_PADRAO):
+    """Gera os mapas das seeds (como numa Partida) e devolve as Estatisticas deles."""
+    estatisticas = Estatisticas()
+    gerados = []
+    for seed in seeds:
+        try:
+            gerados.append(gerar_mapa_com_seed(seed, largura, altura, estrategia))
+        except GeradorMapa.ErroGeracao as erro:
+            estatisticas.erro(str(erro))
+    if gerados:
+        tipos = np.stack([grade.tipos for _, (grade, _) in gerados])
+        flags = np.stack([grade.flags for _, (grade, _) in gerados])
+        saidas = np.array([saida_pos for _, (_, saida_pos) in gerados])
+        estatisticas.adicionar(validar_lote(tipos, flags, saidas), [seed for seed, _ in gerados])
+    return estatisticas
+
+
+def validar_lote_mapas(n, largura, altura, seed):
+    """Estatísticas de n mapas do gerador em lote (GeradorMapa.gerar_mapas) com a seed."""
+    lote = GeradorMapa.gerar_mapas(n, largura, altura, seed)
+    estatisticas = Estatisticas()
+    # Sem seed por mapa: os exemplos identificam o mapa pela posição no lote
+    estatisticas.adicionar(validar_lote(lote.tipos, lote.flags, lote.saidas), np.arange(n))
+    return estatisticas
+
+
+def _validar_bloco(inicio, fim, largura, altura, em_lote, estrategia):
+    if em_lote:
+        return validar_lote_mapas(fim - inicio, largura, altura, inicio)
+    return validar_seeds(range(inicio, fim), largura, altura, estrategia)
+
+
+def executar(num_mapas, seed=0, processos=None, largura=GeradorMapa.MAPA_LARGURA, altura=GeradorMapa.MAPA_ALTURA,
+             em_lote=False, tamanho_bloco=TAMANHO_BLOCO, estrategia=GeradorMapa.ESTRATEGIA_PADRAO):
+    """Valida `num_mapas` mapas num pool de processos, gerando as Estatisticas acumuladas a cada bloco.
+
+    As seeds são as de Simulador.seed_partida(seed, i), i = 0..num_mapas-1.
+    Com `em_lote`, os mapas vêm de GeradorMapa.gerar_mapas, um lote por bloco;
+    sem ele, de gerar_mapa com a `estrategia`.
+    """
+    base = seed << 32
+    inicios = [base + inicio for inicio in range(0, num_mapas, tamanho_bloco)]
+    fins = [min(inicio + tamanho_bloco, base + num_mapas) for inicio in inicios]
+    argumentos = (inicios, fins, [largura] * len(inicios), [altura] * len(inicios), [em_lote] * len(inicios),
+                  [estrategia] * len(inicios))
+    total = Estatisticas()
+    if processos == 1:
+        for parcial in map(_validar_bloco, *argumentos):
+            total.juntar(parcial)
+            yield total
+        return
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        # Os blocos chegam em ordem, à medida que terminam: o total cresce aos poucos
+        for parcial in executor.map(_validar_bloco, *argumentos, chunksize=4):
+            total.juntar(parcial)
+            yield total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Valida os mapas do gerador em muitas seeds e resume as métricas.")
+    parser.add_argument("--mapas", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--largura", type=int, default=GeradorMapa.MAPA_LARGURA)
+    parser.add_argument("--altura", type=int, default=GeradorMapa.MAPA_ALTURA)
+    parser.add_argument("--lote", action="store_true", help="valida o gerador em lote (gerar_mapas) em vez de gerar_mapa")
+    parser.add_argument("--estrategia", choices=sorted(GeradorMapa.ESTRATEGIAS), default=GeradorMapa.ESTRATEGIA_PADRAO)
+    parser.add_argument("--a-cada", type=int, default=None, metavar="MAPAS", help="relatório parcial a cada tantos mapas")
+    parser.add_argument("--json", metavar="ARQUIVO", default=None, help="grava o resumo final em JSON")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    proximo_relatorio = args.a_cada
+    estatisticas = Estatisticas()
+    for estatisticas in executar(args.mapas, args.seed, args.processos, args.largura, args.altura, args.lote,
+                               estrategia=args.estrategia):
+        if proximo_relatorio and estatisticas.mapas >= proximo_relatorio:
+            duracao = time.perf_counter() - inicio
+            print(f"--- {estatisticas.mapas} mapas em {duracao:.1f}s ---", file=sys.stderr)
+            print(estatisticas.texto(), file=sys.stderr)
+            proximo_relatorio += args.a_cada
+    duracao = time.perf_counter() - inicio
+
+    print(estatisticas.texto())
+    print(f"{estatisticas.mapas} mapas em {duracao:.1f}s ({estatisticas.mapas / duracao:.0f} por segundo)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(estatisticas.resumo(), f, ensure_ascii=False, indent=2)